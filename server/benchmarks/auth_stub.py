@@ -0,0 +1,98 @@
+"""
+Stub Auth0 pour les benchmarks: une clé RSA locale, son JWKS servi en HTTP et des
+access tokens RS256 signés avec cette clé (mêmes claims qu'Auth0).
+
+Utilisé par benchmarks/run.py, ou seul pour un test de charge contre un serveur lancé
+avec AUTH0_DOMAIN/AUTH0_API_AUDIENCE/AUTH0_JWKS_URL pointant sur ce stub:
+
+    python benchmarks/auth_stub.py --port 8765 --sub 'bench|1'
+
+Le token est écrit sur stdout, puis le JWKS est servi jusqu'à Ctrl+C.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+DOMAIN = 'bench.auth0.local'
+AUDIENCE = 'http://localhost/api'
+KID = 'bench-key'
+
+
+class LocalAuth0:
+    """
+    Clé de signature + serveur JWKS local. `settings()` donne les réglages Django correspondants.
+    """
+
+    def __init__(self, port=0, domain=DOMAIN, audience=AUDIENCE):
+        self.domain = domain
+        self.audience = audience
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = jwt.algorithms.RSAAlgorithm.to_jwk(self.private_key.public_key(), as_dict=True)
+        body = json.dumps({'keys': [{**jwk, 'kid': KID, 'use': 'sig', 'alg': 'RS256'}]}).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.jwks_url = f'http://127.0.0.1:{self.httpd.server_port}/.well-known/jwks.json'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def settings(self):
+        return {
+            'AUTH0_DOMAIN': self.domain,
+            'AUTH0_API_AUDIENCE': self.audience,
+            'AUTH0_JWKS_URL': self.jwks_url,
+        }
+
+    def mint_token(self, sub, ttl=3600, **claims):
+        now = int(time.time())
+        payload = {
+            'sub': sub,
+            'aud': self.audience,
+            'iss': f'https://{self.domain}/',
+            'iat': now,
+            'exp': now + ttl,
+            **claims,
+        }
+        return jwt.encode(payload, self.private_key, algorithm='RS256', headers={'kid': KID})
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--sub', default='bench|1', help='Claim `sub` du token (gamers seedés: bench|<n>).')
+    parser.add_argument('--ttl', type=int, default=3600)
+    args = parser.parse_args(argv)
+
+    auth = LocalAuth0(port=args.port)
+    print(auth.mint_token(args.sub, ttl=args.ttl))
+    print(
+        f"JWKS servi sur {auth.jwks_url} (AUTH0_DOMAIN={auth.domain}, AUTH0_API_AUDIENCE={auth.audience})",
+        file=sys.stderr,
+    )
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        auth.stop()
+
+
+if __name__ == '__main__':
+    main()
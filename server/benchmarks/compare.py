@@ -0,0 +1,73 @@
+"""
+Compare des résultats de benchmarks/run.py à une baseline; code de sortie 1 en cas de régression.
+
+    python benchmarks/compare.py benchmarks/baseline.json results.json --tolerance 0.25
+
+- nombre de requêtes SQL par requête HTTP: toute augmentation est une régression
+  (indépendant de la machine) ;
+- latence p95 et débit: régression au-delà de --tolerance (relatif), avec une marge
+  absolue de --min-delta-ms pour ignorer le bruit sur les temps très courts ;
+- erreurs HTTP: toute erreur est une régression.
+"""
+import argparse
+import json
+import sys
+
+
+def compare(baseline, current, tolerance, min_delta_ms):
+    regressions = []
+    for name, base in baseline['scenarios'].items():
+        result = current['scenarios'].get(name)
+        if result is None:
+            print(f'{name}: absent des résultats, ignoré', file=sys.stderr)
+            continue
+
+        if result['errors']:
+            regressions.append(f"{name}: {result['errors']} erreurs HTTP")
+        if result['queries_per_request'] > base['queries_per_request']:
+            regressions.append(
+                f"{name}: {result['queries_per_request']} requêtes SQL (baseline {base['queries_per_request']})"
+            )
+        if base['latency_ms'] and result['latency_ms']:
+            base_p95, p95 = base['latency_ms']['p95'], result['latency_ms']['p95']
+            if p95 > base_p95 * (1 + tolerance) and p95 - base_p95 > min_delta_ms:
+                regressions.append(f'{name}: p95 {p95} ms (baseline {base_p95} ms)')
+        if result['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['throughput_rps']} req/s (baseline {base['throughput_rps']} req/s)")
+
+        latency = result['latency_ms'] or {}
+        print(
+            f"{name}: p95 {latency.get('p95')} ms, {result['throughput_rps']} req/s, "
+            f"{result['queries_per_request']} requêtes SQL",
+            file=sys.stderr,
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('baseline')
+    parser.add_argument('results')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Écart relatif toléré (défaut: 0.25).')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='Écart absolu de latence ignoré (défaut: 1 ms).')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.results) as f:
+        current = json.load(f)
+    for key in ('size', 'database', 'concurrency'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(
+                f"Attention: {key} différent de la baseline ({baseline['meta'].get(key)} / {current['meta'].get(key)})",
+                file=sys.stderr,
+            )
+
+    regressions = compare(baseline, current, args.tolerance, args.min_delta_ms)
+    for regression in regressions:
+        print(f'RÉGRESSION {regression}', file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Compare la capacité en connexions concurrentes du déploiement WSGI (gunicorn sync)
+et ASGI (gunicorn + uvicorn worker).
+
+Lancer le serveur dans l'une ou l'autre configuration, puis ce script contre lui:
+
+    # WSGI (ancien déploiement)
+    gunicorn server_config.wsgi:application --bind 0.0.0.0:8000 --workers 4
+    # ASGI
+    gunicorn server_config.asgi:application -k uvicorn_worker.UvicornWorker --bind 0.0.0.0:8000 --workers 4
+
+    python benchmarks/concurrency.py http://localhost:8000/api/gamers/ --concurrency 10 100 1000 \\
+        --duration 15 --label asgi > asgi.json
+
+Pour /api/user/, passer --token <access token>. Le script n'utilise que la stdlib
+(asyncio) afin de pouvoir ouvrir des milliers de connexions depuis un seul process.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from urllib.parse import urlsplit
+
+
+async def _worker(host, port, request, deadline, latencies, errors):
+    """
+    Une connexion keep-alive qui enchaîne les requêtes jusqu'à `deadline`.
+    """
+    writer = None
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.monotonic()
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            await reader.readexactly(int(headers.get('content-length', 0)))
+            if not status_line.startswith(b'HTTP/1.1 2') and not status_line.startswith(b'HTTP/1.1 3'):
+                errors.append(status_line.decode('latin-1').strip())
+            else:
+                latencies.append(time.monotonic() - started)
+            if headers.get('connection', '').lower() == 'close':
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+                writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run_level(url, concurrency, duration, token=None):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    lines = [f'GET {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: keep-alive']
+    if token:
+        lines.append(f'Authorization: Bearer {token}')
+    request = ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(
+        _worker(host, port, request, deadline, latencies, errors) for _ in range(concurrency)
+    ))
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput_rps': round(len(latencies) / duration, 1),
+        'latency_ms': {
+            'p50': round(_percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+            'p99': round(_percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+            'mean': round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('url')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--token', help='Access token Auth0 pour les endpoints protégés.')
+    parser.add_argument('--label', default='', help='Nom du déploiement testé (wsgi, asgi...).')
+    args = parser.parse_args(argv)
+
+    results = []
+    for concurrency in args.concurrency:
+        result = asyncio.run(run_level(args.url, concurrency, args.duration, args.token))
+        print(
+            f"{args.label} c={concurrency}: {result['throughput_rps']} req/s, "
+            f"p99={result['latency_ms']['p99']} ms, {result['errors']} erreurs",
+            file=sys.stderr,
+        )
+        results.append(result)
+    json.dump({'label': args.label, 'url': args.url, 'results': results}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
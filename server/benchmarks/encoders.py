@@ -0,0 +1,113 @@
+"""
+Micro-benchmark de l'encodage des réponses: JsonResponse (json de la stdlib) contre gameur.responses (orjson, msgpack).
+
+Mesure uniquement l'encodage d'une page du classement (mêmes champs que
+serialize_gamer), sans base de données ni requête HTTP:
+
+    python benchmarks/encoders.py --gamers 100 1000 > encoders.json
+
+- `json`: chemin historique, created_at converti par isoformat() puis JsonResponse ;
+- `orjson`: ApiResponse en JSON, datetimes encodés par orjson ;
+- `msgpack`: ApiResponse en MessagePack (Accept: application/msgpack).
+"""
+import argparse
+import datetime
+import json
+import random
+import statistics
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from django.conf import settings  # noqa: E402
+
+settings.configure()
+
+from django.http import JsonResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from gameur.responses import MSGPACK_CONTENT_TYPE, ApiResponse  # noqa: E402
+
+ENCODERS = ['json', 'orjson', 'msgpack']
+
+
+def leaderboard_page(count, seed):
+    rng = random.Random(seed)
+    created_at = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    results = []
+    for index in range(count):
+        games = [f'Bench Game {rng.randrange(200):04d}' for _ in range(3)]
+        results.append({
+            'id': index + 1,
+            'pseudo': f'bench_{index}',
+            'avatar': f'http://testserver/media/avatars/bench_{index}.png',
+            # Même forme que gameur.images.variant_urls: plus petite variante WebP, srcset par format
+            'avatar_thumb': f'http://testserver/media/avatars/variants/{index:016x}_64.webp',
+            'avatar_srcset': {
+                key: ', '.join(
+                    f'http://testserver/media/avatars/variants/{index:016x}_{size}.{key} {size}w' for size in (64, 128, 256)
+                )
+                for key in ('webp', 'jpeg')
+            },
+            'level': 1 + index % 50,
+            'points': rng.randrange(1_000_000),
+            'rank': index + 1,
+            'total_players': 100_000,
+            'created_at': created_at + datetime.timedelta(seconds=rng.randrange(10**7), microseconds=index),
+            'topGames': games,
+            'favoriteGame': games[0],
+        })
+    return {'results': results, 'next': 'eyJ2IjpbMTIzLDQ1Nl0sInIiOmZhbHNlfQ', 'previous': None, 'limit': count}
+
+
+def stdlib_response(data):
+    results = [{**gamer, 'created_at': gamer['created_at'].isoformat()} for gamer in data['results']]
+    return JsonResponse({**data, 'results': results})
+
+
+def run(encoder, data, repeat):
+    factory = RequestFactory()
+    if encoder == 'json':
+        encode = lambda: stdlib_response(data)  # noqa: E731
+    else:
+        accept = MSGPACK_CONTENT_TYPE if encoder == 'msgpack' else 'application/json'
+        request = factory.get('/api/gamers/', HTTP_ACCEPT=accept)
+        encode = lambda: ApiResponse(data, request)  # noqa: E731
+
+    timer = timeit.Timer(encode)
+    number, _ = timer.autorange()
+    timings = [elapsed / number for elapsed in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'bytes': len(encode().content),
+        'median_us': round(statistics.median(timings) * 1e6, 2),
+        'min_us': round(min(timings) * 1e6, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--gamers', type=int, nargs='+', default=[100, 1000], help='Taille(s) de page.')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for count in args.gamers:
+        data = leaderboard_page(count, args.seed)
+        results[count] = {encoder: run(encoder, data, args.repeat) for encoder in ENCODERS}
+        baseline = results[count]['json']['median_us']
+        for encoder, result in results[count].items():
+            result['speedup'] = round(baseline / result['median_us'], 2)
+            print(
+                f"{count} gamers, {encoder}: {result['median_us']} µs, {result['bytes']} octets, x{result['speedup']}",
+                file=sys.stderr,
+            )
+
+    json.dump({'meta': {'seed': args.seed, 'repeat': args.repeat}, 'pages': results}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
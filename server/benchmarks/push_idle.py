@@ -0,0 +1,132 @@
+"""
+Test de charge du push SSE: ouvre N connexions inactives sur /api/gamers/stream/ et les garde ouvertes.
+
+    # Serveur (un seul process, broker en mémoire)
+    PUSH_BROKER=gameur.push.InMemoryBroker uvicorn server_config.asgi:application --port 8000
+    # 10k connexions pendant 60 s, mémoire du serveur mesurée via /proc/<pid>
+    python benchmarks/push_idle.py --connections 10000 --hold 60 --pid <pid uvicorn>
+
+Rapporte (JSON sur stdout) les connexions établies et perdues, le temps pour recevoir
+tous les `hello`, les événements reçus pendant la période et la mémoire (RSS) du serveur.
+Prévoir `ulimit -n` au-dessus du nombre de connexions, côté client comme côté serveur.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+
+
+def _rss_kb(pid):
+    if not pid:
+        return None
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return None
+
+
+class Stats:
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.dropped = 0
+        self.events = Counter()
+
+
+async def _open(host, port, path, stats, hello):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n'.encode())
+        status = await reader.readline()
+        if b' 200 ' not in status:
+            raise ConnectionError(status.decode(errors='replace').strip())
+    except (OSError, ConnectionError) as e:
+        stats.failed += 1
+        if stats.failed == 1:
+            print(f'Première erreur de connexion: {e}', file=sys.stderr)
+        return
+    stats.connected += 1
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                stats.dropped += 1
+                return
+            if line.startswith(b'event: '):
+                event = line[7:].strip().decode()
+                stats.events[event] += 1
+                if event == 'hello':
+                    hello.release()
+            elif line.startswith(b': ping'):
+                stats.events['ping'] += 1
+    except (OSError, asyncio.CancelledError):
+        writer.close()
+
+
+async def run(args):
+    stats = Stats()
+    hello = asyncio.Semaphore(0)
+    rss_before = _rss_kb(args.pid)
+    started = time.perf_counter()
+    tasks = []
+    for index in range(args.connections):
+        tasks.append(asyncio.ensure_future(_open(args.host, args.port, args.path, stats, hello)))
+        if index % args.batch == args.batch - 1:
+            # Ouverture par paquets: évite de saturer la file d'attente du listen()
+            await asyncio.sleep(0.05)
+
+    received = 0
+    deadline = time.perf_counter() + args.timeout
+    while received < args.connections - stats.failed and time.perf_counter() < deadline:
+        try:
+            await asyncio.wait_for(hello.acquire(), timeout=max(0.01, deadline - time.perf_counter()))
+            received += 1
+        except asyncio.TimeoutError:
+            break
+    connect_seconds = time.perf_counter() - started
+    print(f'{received} connexions établies en {connect_seconds:.1f}s, maintien {args.hold}s...', file=sys.stderr)
+
+    await asyncio.sleep(args.hold)
+    rss_after = _rss_kb(args.pid)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    result = {
+        'connections': args.connections,
+        'connected': stats.connected,
+        'hello_received': received,
+        'failed': stats.failed,
+        'dropped': stats.dropped,
+        'connect_seconds': round(connect_seconds, 2),
+        'hold_seconds': args.hold,
+        'events': dict(stats.events),
+    }
+    if rss_before is not None:
+        result['server_rss_kb'] = {'before': rss_before, 'after': rss_after}
+        if stats.connected:
+            result['server_kb_per_connection'] = round((rss_after - rss_before) / stats.connected, 2)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--path', default='/api/gamers/stream/')
+    parser.add_argument('--connections', type=int, default=10000)
+    parser.add_argument('--batch', type=int, default=500, help='Connexions ouvertes par paquet de 50 ms.')
+    parser.add_argument('--hold', type=float, default=30, help='Durée de maintien des connexions (s).')
+    parser.add_argument('--timeout', type=float, default=60, help='Délai maximal pour recevoir tous les hello (s).')
+    parser.add_argument('--pid', type=int, help='PID du serveur, pour mesurer sa mémoire (Linux).')
+    args = parser.parse_args(argv)
+
+    json.dump(asyncio.run(run(args)), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Benchmarks reproductibles de l'API gameur: latence et débit de /api/gamers/, /api/user/ et /api/gamers/create/.
+
+Les requêtes passent par le client de test Django, dans le process: middlewares, ORM
+et base de données réels, sans le bruit du réseau. Les tokens sont signés par un stub
+Auth0 local (benchmarks/auth_stub.py) dont le JWKS est servi en HTTP.
+
+    # SQLite (fichier temporaire)
+    DJANGO_SETTINGS_MODULE=benchmarks.settings_sqlite python benchmarks/run.py --size 10k > results.json
+    # PostgreSQL local (settings du projet, variables POSTGRES_*)
+    python benchmarks/run.py --size 100k --concurrency 4 > results.json
+    # Comparaison avec la baseline (code de sortie 1 en cas de régression)
+    python benchmarks/compare.py benchmarks/baseline.json results.json
+
+Une base vide est remplie par `manage.py seed_gamers` (même --size et --seed: mêmes
+données). --reseed vide la base avant: n'utiliser qu'une base dédiée aux benchmarks.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVER_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server_config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from auth_stub import LocalAuth0  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from gameur.management.commands.seed_gamers import bench_sub, parse_size  # noqa: E402
+from gameur.models import Game, Gamer  # noqa: E402
+from gameur.pagination import encode_cursor  # noqa: E402
+
+SCENARIOS = ['leaderboard', 'leaderboard_deep', 'user_profile', 'create_update']
+TOKEN_POOL = 50
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Scenarios:
+    """
+    Chaque scénario retourne une fonction (client, rng) -> réponse.
+    """
+
+    def __init__(self, auth, size, seed):
+        rng = random.Random(seed)
+        self.size = size
+        self.tokens = [
+            'Bearer ' + auth.mint_token(bench_sub(index), nickname=f'bench_{index}')
+            for index in rng.sample(range(size), min(TOKEN_POOL, size))
+        ]
+        self.game_names = list(Game.objects.order_by('id').values_list('name', flat=True)[:50])
+        # Position au milieu du classement: une page profonde doit coûter autant que la première
+        middle = Gamer.objects.order_by('-points', 'id').values_list('points', 'id')[size // 2]
+        self.deep_cursor = encode_cursor(middle)
+
+    def leaderboard(self):
+        return lambda client, rng: client.get('/api/gamers/')
+
+    def leaderboard_deep(self):
+        return lambda client, rng: client.get('/api/gamers/', {'cursor': self.deep_cursor})
+
+    def user_profile(self):
+        return lambda client, rng: client.get('/api/user/', HTTP_AUTHORIZATION=rng.choice(self.tokens))
+
+    def create_update(self):
+        def request(client, rng):
+            payload = {
+                'points': rng.randrange(0, 100_000),
+                'games': [
+                    {'name': name, 'skill_level': rng.randint(1, 5), 'hours_played': rng.randrange(0, 2000)}
+                    for name in rng.sample(self.game_names, 3)
+                ],
+            }
+            return client.post(
+                '/api/gamers/create/',
+                json.dumps(payload),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=rng.choice(self.tokens),
+            )
+        return request
+
+
+def _run_worker(request, count, seed, latencies, errors):
+    client = Client()
+    rng = random.Random(seed)
+    try:
+        for _ in range(count):
+            started = time.perf_counter()
+            response = request(client, rng)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+            else:
+                latencies.append(elapsed)
+    finally:
+        connections.close_all()
+
+
+def run_scenario(name, request, requests, warmup, concurrency, seed):
+    # Échauffement: caches d'identité, de tokens et de clés JWKS, plans de requêtes
+    _run_worker(request, warmup, seed, [], [])
+
+    client = Client()
+    with CaptureQueriesContext(connection) as queries:
+        request(client, random.Random(seed))
+
+    latencies, errors = [], []
+    per_worker = max(1, requests // concurrency)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(_run_worker, request, per_worker, seed + index, latencies, errors)
+            for index in range(concurrency)
+        ]
+        # Une exception d'un worker (requête, base) fait échouer le benchmark au lieu de fausser ses chiffres
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - started
+
+    result = {
+        'requests': len(latencies) + len(errors),
+        'errors': len(errors),
+        'concurrency': concurrency,
+        'queries_per_request': len(queries.captured_queries),
+        'throughput_rps': round(len(latencies) / wall, 1),
+        'latency_ms': None,
+    }
+    if latencies:
+        result['latency_ms'] = {
+            'p50': round(_percentile(latencies, 0.50) * 1000, 3),
+            'p95': round(_percentile(latencies, 0.95) * 1000, 3),
+            'p99': round(_percentile(latencies, 0.99) * 1000, 3),
+            'mean': round(statistics.fmean(latencies) * 1000, 3),
+        }
+    return result
+
+
+def prepare_database(size, seed, reseed):
+    call_command('migrate', verbosity=0)
+    count = Gamer.objects.count()
+    if reseed or count == 0:
+        print(f'Génération de {size} gamers (seed {seed})...', file=sys.stderr)
+        call_command('seed_gamers', size=str(size), seed=seed, reset=True, stdout=sys.stderr)
+    elif count != size:
+        raise SystemExit(f'La base contient {count} gamers au lieu de {size}: relancer avec --reseed.')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', default='10k', help='Nombre de gamers: 10k, 100k, 1m ou un entier.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=200, help='Requêtes mesurées par scénario.')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=1, help='Clients en parallèle (threads).')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--reseed', action='store_true', help='Vide et régénère la base de benchmark.')
+    args = parser.parse_args(argv)
+    size = parse_size(args.size)
+
+    prepare_database(size, args.seed, args.reseed)
+    auth = LocalAuth0()
+    overrides = override_settings(
+        ALLOWED_HOSTS=['testserver'],
+        # Mesure des temps, pas de contrôle des budgets SQL (cf. gameur.middleware)
+        SQL_QUERY_BUDGET_STRICT=False,
+        **auth.settings(),
+    )
+    overrides.enable()
+    try:
+        scenarios = Scenarios(auth, size, args.seed)
+        results = {}
+        # create_update écrit en base: exécuté en dernier pour ne pas influencer les lectures
+        for name in sorted(args.scenarios, key=SCENARIOS.index):
+            results[name] = run_scenario(
+                name, getattr(scenarios, name)(), args.requests, args.warmup, args.concurrency, args.seed,
+            )
+            latency = results[name]['latency_ms'] or {}
+            print(
+                f"{name}: {results[name]['throughput_rps']} req/s, p95={latency.get('p95')} ms, "
+                f"{results[name]['queries_per_request']} requêtes SQL, {results[name]['errors']} erreurs",
+                file=sys.stderr,
+            )
+    finally:
+        overrides.disable()
+        auth.stop()
+
+    json.dump({
+        'meta': {
+            'size': size,
+            'seed': args.seed,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        },
+        'scenarios': results,
+    }, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
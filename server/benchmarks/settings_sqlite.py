@@ -0,0 +1,26 @@
+"""
+Settings des benchmarks sur SQLite (sans PostgreSQL local):
+
+    DJANGO_SETTINGS_MODULE=benchmarks.settings_sqlite python benchmarks/run.py --size 10k
+"""
+import os
+import tempfile
+
+from server_config.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django_prometheus.db.backends.sqlite3',
+        'NAME': os.getenv('BENCH_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'gameur_bench.sqlite3')),
+    }
+}
+
+# Les réplicas PostgreSQL (POSTGRES_REPLICA_HOSTS) n'existent pas ici
+DATABASE_REPLICAS = []
+if TESTING:  # noqa: F405
+    # Alias miroir attendu par les tests du routage, comme dans server_config.settings
+    DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+# Pas de RabbitMQ pour les benchmarks locaux: le push reste dans le process (sans thread
+# de publication en échec ni messages d'erreur mêlés aux résultats sur stdout)
+PUSH_BROKER = 'gameur.push.InMemoryBroker'
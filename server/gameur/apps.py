@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GameurConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gameur'
+
+    def ready(self):
+        # Connecte les receivers (invalidation des caches, etc.)
+        from . import signals  # noqa: F401
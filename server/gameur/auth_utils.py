@@ -1,65 +1,53 @@
+import time
+
 import jwt
-import requests
-from django.http import JsonResponse
 from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from django.db import transaction # Pour gérer les transactions si tu crées des utilisateurs/gamers
+from django.utils.functional import SimpleLazyObject
 
 # Assure-toi d'importer ton modèle Gamer si tu le lies directement à l'utilisateur Auth0 ID
-from .models import Gamer # Assumes Gamer model exists
+from .models import Gamer, attach_games # Assumes Gamer model exists
+from .catalog import aget_catalog, get_catalog
+from .identity import aresolve_identity, resolve_identity
+from .images import variant_urls
+from .jwks import get_key_manager
+from .metrics import AUTH0_TOKEN_VALIDATION_SECONDS, SERIALIZE_GAMER_SECONDS
+from .ranking import attach_ranks
+from .ratelimit import acheck_ip_limit, acheck_sub_limit, check_ip_limit, check_sub_limit
+from .responses import ApiResponse
+from .token_cache import verified_token_cache
 
 User = get_user_model()
 
-# Cache pour les clés JWKS pour éviter de les télécharger à chaque requête
-# En production, utilise un cache plus robuste (comme celui de Django)
-_cached_jwks = None
-
 def get_jwks(domain):
     """
-    Récupère les clés publiques JWKS d'Auth0.
+    Récupère le document JWKS d'Auth0 (dernière version valide connue).
+    Les clés sont gérées par JWKSKeyManager (rafraîchissement, rotation).
     """
-    global _cached_jwks
-    if _cached_jwks:
-        return _cached_jwks
+    manager = get_key_manager(domain)
+    if manager.document is None:
+        manager.refresh()
+    return manager.document
 
-    jwks_url = f'https://{domain}/.well-known/jwks.json'
-    try:
-        response = requests.get(jwks_url, timeout=5) # Ajoute un timeout
-        response.raise_for_status() # Lève une exception pour les codes d'erreur HTTP
-        _cached_jwks = response.json()
-        return _cached_jwks
-    except requests.exceptions.RequestException as e:
-        print(f"Erreur lors de la récupération des JWKS: {e}")
-        return None # Retourne None en cas d'erreur
-
-def validate_auth0_token(token):
+def _decode_token(token, signing_key, domain, audience):
     """
-    Valide un token JWT Auth0.
-    Retourne le payload du token si valide, None sinon.
+    Vérifie la signature et les claims du token avec la clé donnée.
+    Retourne le payload si valide (et le met en cache), None sinon.
     """
-    domain = settings.AUTH0_DOMAIN
-    audience = settings.AUTH0_API_AUDIENCE
-
-    if not domain or not audience:
-        print("Configuration Auth0 (DOMAIN ou AUDIENCE) manquante dans les settings.")
-        return None
-
-    jwks = get_jwks(domain)
-    if not jwks:
-        print("Impossible de récupérer les clés JWKS.")
-        return None
-
     try:
         # Décode et valide le token
         payload = jwt.decode(
             token,
-            jwks,
+            signing_key.key,
             algorithms=["RS256"], # L'algorithme par défaut d'Auth0 pour les tokens d'accès
             audience=audience,
             issuer=f'https://{domain}/'
         )
         # Optionnel: Vérifier d'autres claims si nécessaire (permissions, etc.)
+        if getattr(settings, 'AUTH0_TOKEN_CACHE_ENABLED', True):
+            verified_token_cache.set(token, payload)
         return payload
     except jwt.ExpiredSignatureError:
         print("Token expiré.")
@@ -77,122 +65,176 @@ def validate_auth0_token(token):
         print(f"Erreur inattendue lors de la validation du token: {e}")
         return None
 
+def _prepare_validation(token):
+    """
+    Étapes communes aux versions sync et async de la validation.
+    Retourne (payload en cache, kid du token); (None, None) si le token est inutilisable.
+    """
+    if not settings.AUTH0_DOMAIN or not settings.AUTH0_API_AUDIENCE:
+        print("Configuration Auth0 (DOMAIN ou AUDIENCE) manquante dans les settings.")
+        return None, None
+
+    # Le SPA renvoie le même token à chaque requête: on évite de revérifier la signature
+    if getattr(settings, 'AUTH0_TOKEN_CACHE_ENABLED', True):
+        payload = verified_token_cache.get(token)
+        if payload is not None:
+            return payload, None
+
+    try:
+        # Sélectionne la clé publique correspondant au `kid` du token
+        return None, jwt.get_unverified_header(token).get('kid')
+    except jwt.InvalidTokenError as e:
+        print(f"Token invalide: {e}")
+        return None, None
+
+def _observe_validation(started, payload, cached=False):
+    """
+    Enregistre la durée de la validation (métrique Prometheus) et retourne le payload.
+    """
+    outcome = 'cached' if cached else ('valid' if payload is not None else 'invalid')
+    AUTH0_TOKEN_VALIDATION_SECONDS.labels(outcome).observe(time.perf_counter() - started)
+    return payload
+
+def validate_auth0_token(token):
+    """
+    Valide un token JWT Auth0.
+    Retourne le payload du token si valide, None sinon.
+    """
+    started = time.perf_counter()
+    payload, kid = _prepare_validation(token)
+    if payload is not None or kid is None:
+        return _observe_validation(started, payload, cached=payload is not None)
+
+    signing_key = get_key_manager(settings.AUTH0_DOMAIN).get_signing_key(kid)
+    if signing_key is None:
+        print(f"Aucune clé JWKS pour le kid {kid}.")
+        return _observe_validation(started, None)
+    payload = _decode_token(token, signing_key, settings.AUTH0_DOMAIN, settings.AUTH0_API_AUDIENCE)
+    return _observe_validation(started, payload)
+
+async def avalidate_auth0_token(token):
+    """
+    Version async de validate_auth0_token: la récupération des clés JWKS
+    ne bloque pas la boucle d'événements.
+    """
+    started = time.perf_counter()
+    payload, kid = _prepare_validation(token)
+    if payload is not None or kid is None:
+        return _observe_validation(started, payload, cached=payload is not None)
+
+    signing_key = await get_key_manager(settings.AUTH0_DOMAIN).aget_signing_key(kid)
+    if signing_key is None:
+        print(f"Aucune clé JWKS pour le kid {kid}.")
+        return _observe_validation(started, None)
+    payload = _decode_token(token, signing_key, settings.AUTH0_DOMAIN, settings.AUTH0_API_AUDIENCE)
+    return _observe_validation(started, payload)
+
+def _bearer_token(request):
+    """
+    Extrait le token de l'en-tête Authorization.
+    Retourne (token, None) ou (None, réponse d'erreur).
+    """
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        print("Authorization header missing")
+        return None, ApiResponse({'detail': 'Authentication credentials were not provided.'}, request, status=401)
+
+    try:
+        token_type, token = auth_header.split(' ')
+        if token_type.lower() != 'bearer':
+             print("Invalid token type")
+             return None, ApiResponse({'detail': 'Invalid token type. Must be Bearer.'}, request, status=401)
+    except ValueError:
+         print("Invalid authorization header format")
+         return None, ApiResponse({'detail': 'Invalid authorization header format. Must be Bearer <token>.'}, request, status=401)
+    return token, None
+
+def _payload_error(request, payload):
+    """
+    Retourne une réponse d'erreur si le payload est invalide ou sans `sub`, None sinon.
+    """
+    if payload is None:
+        # validate_auth0_token a déjà loggué la raison spécifique
+        print("Token validation failed.")
+        return ApiResponse({'detail': 'Invalid or expired token.'}, request, status=401)
+
+    # Le 'sub' claim est l'identifiant unique de l'utilisateur Auth0
+    if not payload.get('sub'):
+         print("User ID (sub) not found in token payload")
+         return ApiResponse({'detail': 'User ID not found in token payload.'}, request, status=400)
+    return None
+
+def _identity_error(request, e):
+    print(f"Erreur lors de la récupération/création de l'utilisateur/gamer Django: {e}")
+    # Renvoie une erreur interne si la base de données ou la logique de création échoue
+    return ApiResponse({'detail': 'Internal server error during user processing.'}, request, status=500)
+
+def _attach_identity(request, payload, user_id, gamer_id):
+    # Les objets ne sont chargés que si la vue les utilise (une requête par clé primaire).
+    # Dans une vue async, utiliser request.gamer_id ou `await request.auser()`.
+    request.user = SimpleLazyObject(lambda: User.objects.get(pk=user_id)) # Attache l'utilisateur Django à la requête
+    request.auser = lambda: User.objects.aget(pk=user_id)
+    request.gamer_id = gamer_id
+    request.gamer_profile = SimpleLazyObject(lambda: Gamer.objects.get(pk=gamer_id)) # Profil Gamer, chargé à la demande
+    request.auth_payload = payload # Optionnel: Attache le payload Auth0
+
 def auth0_required(view_func):
     """
     Décorateur de vue pour les endpoints API protégés par Auth0.
-    Valide le token JWT, trouve ou crée l'utilisateur Django,
-    et l'attache à request.user.
+    Applique les limites de débit (par IP puis par sub, cf. gameur.ratelimit), valide le
+    token JWT, résout (ou crée) l'utilisateur Django et son Gamer,
+    et les attache à request.user / request.gamer_profile.
+    Fonctionne aussi sur les vues async (servies par ASGI).
     """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _async_wrapped_view(request, *args, **kwargs):
+            error = await acheck_ip_limit(request)
+            if error:
+                return error
+            token, error = _bearer_token(request)
+            if error:
+                return error
+            payload = await avalidate_auth0_token(token)
+            error = _payload_error(request, payload) or await acheck_sub_limit(request, payload['sub'])
+            if error:
+                return error
+            try:
+                user_id, gamer_id = await aresolve_identity(payload)
+            except Exception as e:
+                return _identity_error(request, e)
+            _attach_identity(request, payload, user_id, gamer_id)
+            return await view_func(request, *args, **kwargs)
+
+        return _async_wrapped_view
+
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
+        # 0. Limite de débit par IP (cf. gameur.ratelimit), avant tout travail sur le token
+        error = check_ip_limit(request)
+        if error:
+            return error
+
         # 1. Extraire le token de l'en-tête Authorization
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
-            print("Authorization header missing")
-            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        token, error = _bearer_token(request)
+        if error:
+            return error
 
-        try:
-            token_type, token = auth_header.split(' ')
-            if token_type.lower() != 'bearer':
-                 print("Invalid token type")
-                 return JsonResponse({'detail': 'Invalid token type. Must be Bearer.'}, status=401)
-        except ValueError:
-             print("Invalid authorization header format")
-             return JsonResponse({'detail': 'Invalid authorization header format. Must be Bearer <token>.'}, status=401)
-
-        # 2. Valider le token
+        # 2. Valider le token, 3. vérifier qu'il identifie un utilisateur Auth0,
+        # puis limite de débit par `sub`, avant toute requête SQL
         payload = validate_auth0_token(token)
+        error = _payload_error(request, payload) or check_sub_limit(request, payload['sub'])
+        if error:
+            return error
 
-        if payload is None:
-            # validate_auth0_token a déjà loggué la raison spécifique
-            print("Token validation failed.")
-            return JsonResponse({'detail': 'Invalid or expired token.'}, status=401)
-
-        # 3. Identifier l'utilisateur Django basé sur le payload Auth0
-        # Le 'sub' claim est l'identifiant unique de l'utilisateur Auth0
-        auth0_user_id = payload.get('sub')
-        if not auth0_user_id:
-             print("User ID (sub) not found in token payload")
-             return JsonResponse({'detail': 'User ID not found in token payload.'}, status=400)
-
-        # 4. Trouver ou créer l'utilisateur Django et le lier au Auth0 ID
-        # Utilise une transaction pour s'assurer que la création est atomique
+        # 4. Résoudre l'utilisateur Django et le profil Gamer liés au Auth0 ID
+        # Le mapping sub -> (user_id, gamer_id) est mis en cache (local + cache Django):
+        # pas de transaction ni de requête par appel, création uniquement au premier login
         try:
-            with transaction.atomic():
-                # Assumes your User model has an 'auth0_id' field (CharField, unique=True)
-                # Si tu n'as pas modifié le modèle User par défaut, tu devras peut-être
-                # créer un modèle Profile ou Gamer lié par OneToOneField et y stocker l'auth0_id.
-                # Pour cet exemple, je suppose que tu as ajouté un champ `auth0_id` au modèle User
-                # ou que tu utilises un modèle Profile/Gamer lié.
-
-                # Option A: Ajouter auth0_id au modèle User par défaut (nécessite une migration)
-                # user, created = User.objects.get_or_create(auth0_id=auth0_user_id)
-                # if created:
-                #     # Si l'utilisateur est nouveau, tu peux définir d'autres champs ici
-                #     # comme le username ou l'email à partir du payload si disponibles
-                #     user.username = payload.get('nickname', auth0_user_id) # Exemple
-                #     user.email = payload.get('email', '') # Exemple
-                #     user.save()
-                #     print(f"Nouvel utilisateur Django créé pour Auth0 ID: {auth0_user_id}")
-
-                # Option B: Utiliser un modèle Gamer lié par OneToOneField à User
-                # C'est probablement plus proche de ta structure actuelle si Gamer a un champ 'user'
-                # et potentiellement un champ 'auth0_id' pour la recherche initiale.
-                # Si Gamer a un OneToOneField vers User, et User a un champ auth0_id:
-                # user, user_created = User.objects.get_or_create(auth0_id=auth0_user_id)
-                # gamer, gamer_created = Gamer.objects.get_or_create(user=user)
-                # if gamer_created:
-                #     print(f"Nouveau profil Gamer créé pour utilisateur Auth0 ID: {auth0_user_id}")
-                #     # Tu peux initialiser des champs par défaut pour le nouveau Gamer ici
-
-                # Option C: Si ton modèle Gamer stocke directement l'auth0_id et n'est PAS lié à User par défaut
-                # (Moins courant, mais possible si tu n'utilises pas le système d'auth de Django pour les sessions)
-                # Dans ce cas, tu ne peux pas attacher à request.user. Tu attacherais peut-être à request.gamer_profile
-                # gamer, created = Gamer.objects.get_or_create(auth0_id=auth0_user_id)
-                # request.gamer_profile = gamer # Attache le profil Gamer à la requête
-                # print(f"Profil Gamer trouvé/créé pour Auth0 ID: {auth0_user_id}")
-
-
-                # **Assumons pour l'instant que tu as un modèle Gamer avec un champ `auth0_id` (unique=True)**
-                # **et que tu veux attacher l'objet Gamer à la requête.**
-                # **Si tu utilises le modèle User de Django, l'Option B est plus standard.**
-                # **Je vais adapter pour l'Option B, car c'est plus courant avec Auth0 et Django.**
-                # **Cela nécessite que ton modèle User par défaut ait un champ `auth0_id` ou que tu utilises un modèle User personnalisé.**
-                # **Si tu n'as pas modifié le modèle User, dis-le moi, on adaptera.**
-
-                # Option B (recommandée si tu utilises le système d'auth de Django):
-                # Nécessite un champ `auth0_id` sur ton modèle User (ou un modèle Profile/Gamer lié)
-                # Si tu utilises le modèle User par défaut, tu devras créer un modèle Profile/Gamer
-                # avec un OneToOneField vers User et y stocker l'auth0_id.
-
-                # Exemple avec un modèle Gamer lié à User par OneToOneField et User ayant un champ auth0_id
-                # (C'est une hypothèse, adapte si ta structure est différente)
-                user, user_created = User.objects.get_or_create(auth0_id=auth0_user_id)
-                if user_created:
-                     # Si l'utilisateur Django est nouveau, tu peux le peupler avec des données Auth0
-                     user.username = payload.get('nickname', auth0_user_id) # Utilise nickname si dispo, sinon auth0_id
-                     user.email = payload.get('email', '') # Utilise email si dispo
-                     user.save()
-                     print(f"Nouvel utilisateur Django créé pour Auth0 ID: {auth0_user_id}")
-
-                # Trouve ou crée le profil Gamer lié à cet utilisateur Django
-                gamer, gamer_created = Gamer.objects.get_or_create(user=user)
-                if gamer_created:
-                    print(f"Nouveau profil Gamer créé pour utilisateur Django ID: {user.id}")
-                    # Initialise les champs par défaut du Gamer si nécessaire
-                    gamer.pseudo = user.username # Exemple: pseudo par défaut = username
-                    gamer.save()
-
-
-                request.user = user # Attache l'utilisateur Django à la requête
-                request.gamer_profile = gamer # Optionnel: Attache aussi le profil Gamer pour un accès facile
-                request.auth_payload = payload # Optionnel: Attache le payload Auth0
-
+            user_id, gamer_id = resolve_identity(payload)
         except Exception as e:
-            print(f"Erreur lors de la récupération/création de l'utilisateur/gamer Django: {e}")
-            # Renvoie une erreur interne si la base de données ou la logique de création échoue
-            return JsonResponse({'detail': 'Internal server error during user processing.'}, status=500)
-
+            return _identity_error(request, e)
+        _attach_identity(request, payload, user_id, gamer_id)
 
         # 5. Si l'authentification et l'identification réussissent, appelle la vue originale
         return view_func(request, *args, **kwargs)
@@ -205,27 +247,103 @@ def auth0_required(view_func):
 def serialize_gamer(gamer, request):
     """
     Sérialise un objet Gamer en dictionnaire.
+    Pour plusieurs gamers, préférer serialize_gamers() qui évite le N+1.
     """
+    with SERIALIZE_GAMER_SECONDS.time():
+        return _serialize_gamer(gamer, request)
+
+def _serialize_gamer(gamer, request):
+    top_games = gamer.top_games
+    rank_info = getattr(gamer, 'rank_info', None)
+    if rank_info is None:
+        # Gamer isolé (hors serialize_gamers): recherche indexée dans le snapshot
+        attach_ranks([gamer])
+        rank_info = gamer.rank_info
+    # Miniature + srcset (variantes WebP/JPEG), l'original tant qu'elles ne sont pas générées
+    avatar_thumb, avatar_srcset = variant_urls(gamer.avatar, gamer.avatar_variants, request)
     return {
         'id': gamer.id,
         'pseudo': gamer.pseudo,
         'avatar': request.build_absolute_uri(gamer.avatar.url) if gamer.avatar else None,
+        'avatar_thumb': avatar_thumb,
+        'avatar_srcset': avatar_srcset,
         'level': gamer.level,
         'points': gamer.points,
-        # 'rank': gamer.rank, # Si tu as un champ rank
-        'created_at': gamer.created_at.isoformat(),
-        'topGames': [game.name for game in gamer.top_games], # Assumes top_games is a property
-        'favoriteGame': gamer.favorite_game.name if gamer.favorite_game else None, # Assumes favorite_game is a property
+        'rank': rank_info[0], # Rang dense (cf. gameur.ranking)
+        'total_players': rank_info[1],
+        'created_at': gamer.created_at, # datetime encodé par gameur.responses (orjson / msgpack), sans isoformat() ici
+        'topGames': [game.name for game in top_games], # Dénormalisé sur Gamer.top_game_ids (cf. gameur.top_games)
+        'favoriteGame': gamer.favorite_game.name if gamer.favorite_game_id else None, # Le plus joué, ou choisi par le joueur
         # Ajoute d'autres champs si nécessaire
     }
 
+# Sérialisation en lot: à utiliser pour toute liste de gamers (classement, profil...)
+def serialize_gamers(gamers, request):
+    """
+    Sérialise une liste (ou un queryset) de Gamer en un nombre constant de requêtes.
+    Les jeux (top games, favoris) viennent de l'index du catalogue en mémoire (gameur.catalog).
+    """
+    gamers = list(gamers)
+    attach_games(gamers, get_catalog().by_id)
+    attach_ranks(gamers)
+    return [serialize_gamer(gamer, request) for gamer in gamers]
+
+async def aserialize_gamers(gamers, request):
+    """
+    Version async de serialize_gamers (accepte une liste ou un queryset).
+    """
+    if hasattr(gamers, '__aiter__'):
+        gamers = [gamer async for gamer in gamers]
+    else:
+        gamers = list(gamers)
+    attach_games(gamers, (await aget_catalog()).by_id)
+    await sync_to_async(attach_ranks)(gamers)
+    return [serialize_gamer(gamer, request) for gamer in gamers]
+
 # Fonction pour sérialiser un objet Game (peut être réutilisée)
-def serialize_game(game):
+def serialize_game(game, request=None):
      """
      Sérialise un objet Game en dictionnaire.
+     Les URLs d'icône sont absolues si `request` est fourni.
      """
+     icon_thumb, icon_srcset = variant_urls(game.icon, game.icon_variants, request)
      return {
          'id': game.id,
          'name': game.name,
+         'icon': (request.build_absolute_uri(game.icon.url) if request is not None else game.icon.url) if game.icon else None,
+         'icon_thumb': icon_thumb,
+         'icon_srcset': icon_srcset,
          # Ajoute d'autres champs du modèle Game si nécessaire
-     }
\ No newline at end of file
+     }
+
+# Fonction pour sérialiser une entrée du classement d'un jeu (GamerGame + gamer préchargé)
+def serialize_game_entry(gamer_game, request):
+    """
+    Sérialise un GamerGame pour /api/games/<id>/leaderboard/.
+    Le gamer doit être chargé via select_related('gamer') (aucune requête ici).
+    """
+    gamer = gamer_game.gamer
+    return {
+        'gamer': {
+            'id': gamer.id,
+            'pseudo': gamer.pseudo,
+            'avatar': request.build_absolute_uri(gamer.avatar.url) if gamer.avatar else None,
+            'avatar_thumb': variant_urls(gamer.avatar, gamer.avatar_variants, request)[0],
+            'level': gamer.level,
+        },
+        'skill_level': gamer_game.skill_level,
+        'hours_played': gamer_game.hours_played,
+    }
+
+# Fonction pour sérialiser un résultat de recherche (projection réduite, cf. gameur.search)
+def serialize_search_result(gamer, request):
+    """
+    Sérialise un Gamer pour l'autocomplétion: uniquement les champs affichés dans la liste.
+    """
+    return {
+        'id': gamer.id,
+        'pseudo': gamer.pseudo,
+        'avatar_thumb': variant_urls(gamer.avatar, gamer.avatar_variants, request)[0],
+        'level': gamer.level,
+        'points': gamer.points,
+    }
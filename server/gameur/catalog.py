@@ -0,0 +1,70 @@
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Game
+from .versions import get_game_catalog_version
+
+# Index en mémoire du catalogue de jeux, un par process: le catalogue est petit et change
+# rarement, il est donc chargé entièrement (une requête) puis servi sans SQL (résolution
+# des noms, /api/games/, noms des top games des gamers).
+# Chaque accès compare la version partagée (cache Django, cf. gameur.versions) à celle de
+# l'instantané: une modification de Game, dans n'importe quel process, la change
+# (cf. signals.game_catalog_changed) et le prochain accès recharge le catalogue.
+
+
+class GameCatalog:
+    """
+    Instantané du catalogue (jeux triés par nom) et de ses index. Jamais modifié une fois
+    construit: un rechargement crée un nouvel instantané.
+    """
+
+    def __init__(self, version, games):
+        self.version = version
+        self.games = games
+        self.by_id = {game.id: game for game in games}
+        self.by_name = {game.name: game.id for game in games}
+        self._serialized = {}
+
+    def ids_for_names(self, names):
+        """
+        Retourne {nom: id} pour les jeux existants parmi `names`.
+        """
+        return {name: self.by_name[name] for name in names if name in self.by_name}
+
+    def serialized(self, request, serialize):
+        """
+        Jeux sérialisés par `serialize(game, request)`, calculés une fois par instantané et
+        par origine (les URLs d'icônes sont absolues).
+        """
+        origin = request.build_absolute_uri('/')
+        results = self._serialized.get(origin)
+        if results is None:
+            results = self._serialized[origin] = [serialize(game, request) for game in self.games]
+        return results
+
+
+_catalog = None
+_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    Catalogue courant, rechargé si la version partagée a changé depuis son chargement.
+    """
+    global _catalog
+    version = get_game_catalog_version()
+    catalog = _catalog
+    if catalog is None or catalog.version != version:
+        with _lock:
+            catalog = _catalog
+            if catalog is None or catalog.version != version:
+                # Toujours la base principale: un réplica en retard associerait un ancien
+                # catalogue à la nouvelle version
+                games = list(Game.objects.using(DEFAULT_DB_ALIAS).order_by('name'))
+                catalog = _catalog = GameCatalog(version, games)
+    return catalog
+
+
+aget_catalog = sync_to_async(get_catalog)
@@ -0,0 +1,154 @@
+import datetime
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import GamerChange
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+from .push import publish_gamer_changes
+
+# Flux incrémental du classement (/api/gamers/changes/?since=<curseur>):
+# chaque écriture sur un gamer (points, profil, jeux, suppression) ajoute une ligne
+# GamerChange dans la même transaction. Le flux renvoie l'état courant des gamers
+# modifiés depuis le curseur, pas l'historique: dix changements d'un gamer = une entrée.
+# - les écritures en transaction ouvrent un bloc change_log(): leurs entrées sont insérées
+#   en un seul INSERT, dernière instruction avant le commit ;
+# - seules les entrées de plus de CHANGE_FEED_SETTLE_SECONDS sont lues: created_at est
+#   fixé à l'insertion, pas au commit, c'est donc le délai entre l'insertion et le commit
+#   (et non la durée de la transaction) qui doit rester sous ce seuil. Une entrée validée
+#   plus tard a pu être dépassée par un curseur: elle est réécrite après le commit
+#   (nouvel id, nouvelle date), le gamer est alors renvoyé au prochain appel ;
+# - compact_change_log supprime les entrées remplacées par une entrée plus récente du même
+#   gamer (sans effet sur le flux) et celles de plus de CHANGE_LOG_RETENTION secondes.
+#   Un curseur plus ancien que la rétention n'est plus servi: le client doit tout recharger.
+
+
+class ResyncRequired(Exception):
+    """
+    Curseur antérieur à la rétention du journal: le client doit recharger le classement complet.
+    """
+
+
+# Entrées {(gamer_id, kind)} du bloc change_log() en cours, None hors d'un bloc
+_pending_changes = ContextVar('gameur_pending_changes', default=None)
+
+
+@contextmanager
+def change_log():
+    """
+    Regroupe les entrées journalisées dans le bloc (record_gamer_changes, signaux) et les
+    insère en un seul INSERT à sa sortie. À ouvrir juste à l'intérieur de la transaction de
+    l'écriture, `with transaction.atomic(), change_log():`, pour que l'insertion soit la
+    dernière instruction avant le commit. Un bloc imbriqué rejoint le bloc englobant.
+    """
+    if _pending_changes.get() is not None:
+        yield
+        return
+    pending = set()
+    token = _pending_changes.set(pending)
+    try:
+        yield
+    finally:
+        _pending_changes.reset(token)
+    # Pas d'insertion si le bloc a levé une exception: la transaction est annulée
+    _write_changes(pending)
+
+
+def record_gamer_changes(gamer_ids, kind):
+    """
+    Journalise une modification des gamers donnés (à appeler dans la transaction de l'écriture)
+    et la publie aux abonnés du push temps réel après commit. Dans un bloc change_log(),
+    l'insertion est différée à la sortie du bloc.
+    """
+    entries = {(gamer_id, kind) for gamer_id in gamer_ids}
+    pending = _pending_changes.get()
+    if pending is not None:
+        pending.update(entries)
+    else:
+        _write_changes(entries)
+
+
+def _write_changes(entries):
+    if not entries:
+        return
+    entries = sorted(entries)
+    GamerChange.objects.bulk_create([GamerChange(gamer_id=gamer_id, kind=kind) for gamer_id, kind in entries])
+    written = time.monotonic()
+    transaction.on_commit(lambda: _committed(entries, written))
+
+
+def _committed(entries, written):
+    # Marge de moitié pour les écarts d'horloge entre process web
+    if time.monotonic() - written > settings.CHANGE_FEED_SETTLE_SECONDS / 2:
+        print(f"Journal des changements: commit tardif ({time.monotonic() - written:.1f}s), "
+              f"{len(entries)} entrées réécrites")
+        GamerChange.objects.bulk_create([GamerChange(gamer_id=gamer_id, kind=kind) for gamer_id, kind in entries])
+    publish_gamer_changes(sorted({gamer_id for gamer_id, _ in entries}))
+
+
+def _encode(change_id, seen_until):
+    # Position dans le journal + instant avant lequel le client a tout reçu (contrôle de rétention)
+    return encode_cursor([change_id, seen_until.timestamp()])
+
+
+def _decode(cursor):
+    (change_id, seen_until), _ = decode_cursor(cursor, 2)
+    if not isinstance(change_id, int) or not isinstance(seen_until, (int, float)):
+        raise InvalidCursor('Invalid cursor.')
+    return change_id, datetime.datetime.fromtimestamp(seen_until, tz=datetime.timezone.utc)
+
+
+def _settled_before(now):
+    return now - datetime.timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+
+
+def head_cursor():
+    """
+    Curseur courant du journal, à demander avant de charger le classement complet.
+    """
+    settled = _settled_before(timezone.now())
+    last_id = GamerChange.objects.filter(created_at__lte=settled).order_by('-id').values_list('id', flat=True).first()
+    return _encode(last_id or 0, settled)
+
+
+def read_changes(cursor, limit=None):
+    """
+    Lit le journal après `cursor`. Retourne (id des gamers modifiés, curseur suivant, has_more).
+    """
+    since_id, seen_until = _decode(cursor)
+    now = timezone.now()
+    if seen_until < now - datetime.timedelta(seconds=settings.CHANGE_LOG_RETENTION):
+        raise ResyncRequired(cursor)
+
+    limit = limit or settings.CHANGE_FEED_PAGE_SIZE
+    settled = _settled_before(now)
+    changes = list(
+        GamerChange.objects.filter(id__gt=since_id, created_at__lte=settled)
+        .order_by('id')
+        .values_list('id', 'gamer_id', 'created_at')[:limit]
+    )
+    has_more = len(changes) == limit
+    if not changes:
+        next_cursor = _encode(since_id, settled)
+    elif has_more:
+        next_cursor = _encode(changes[-1][0], changes[-1][2])
+    else:
+        next_cursor = _encode(changes[-1][0], settled)
+    return [gamer_id for _, gamer_id, _ in changes], next_cursor, has_more
+
+
+def compact_change_log():
+    """
+    Supprime les entrées remplacées et celles hors rétention. Retourne (remplacées, expirées).
+    """
+    superseded, _ = GamerChange.objects.filter(
+        Exists(GamerChange.objects.filter(gamer_id=OuterRef('gamer_id'), id__gt=OuterRef('id')))
+    ).delete()
+    limit = timezone.now() - datetime.timedelta(seconds=settings.CHANGE_LOG_RETENTION)
+    expired, _ = GamerChange.objects.filter(created_at__lt=limit).delete()
+    return superseded, expired
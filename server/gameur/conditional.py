@@ -0,0 +1,46 @@
+import datetime
+from functools import wraps
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+# GET conditionnel (ETag / Last-Modified) pour les vues async.
+# django.views.decorators.http.condition appelle etag_func et last_modified_func de façon
+# synchrone, dans la boucle d'événements: nos ETag lisent une version dans le cache partagé,
+# un aller-retour réseau (Redis, Memcached) qui bloquerait tous les clients du worker.
+# acondition attend des coroutines à la place, avec le même comportement (304, 412, en-têtes).
+
+
+def acondition(etag_func=None, last_modified_func=None):
+    """
+    Comme django.views.decorators.http.condition, pour une vue async dont etag_func et
+    last_modified_func sont des coroutines.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        async def inner(request, *args, **kwargs):
+            res_last_modified = None
+            if last_modified_func:
+                if dt := await last_modified_func(request, *args, **kwargs):
+                    if not timezone.is_aware(dt):
+                        dt = timezone.make_aware(dt, datetime.timezone.utc)
+                    res_last_modified = int(dt.timestamp())
+            res_etag = await etag_func(request, *args, **kwargs) if etag_func else None
+            res_etag = quote_etag(res_etag) if res_etag is not None else None
+
+            response = get_conditional_response(request, etag=res_etag, last_modified=res_last_modified)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+
+            if request.method in ('GET', 'HEAD'):
+                if res_last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(res_last_modified)
+                if res_etag:
+                    response.headers.setdefault('ETag', res_etag)
+            return response
+
+        return inner
+
+    return decorator
@@ -0,0 +1,164 @@
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.dispatch import receiver
+
+from .metrics import REPLICA_LAG_SECONDS
+
+# Routage des lectures vers les réplicas (DATABASE_REPLICAS, cf. settings):
+# - seules les vues marquées @read_replica lisent sur un réplica, et seulement en GET/HEAD ;
+# - après une écriture, un client lit sur la base principale pendant REPLICA_STICKY_SECONDS
+#   (cookie posé par ReplicaRoutingMiddleware), pour relire ses propres écritures ;
+# - un réplica en retard de plus de REPLICA_MAX_LAG_SECONDS, ou injoignable, est écarté
+#   (retard mesuré au plus toutes les REPLICA_LAG_CHECK_INTERVAL secondes par process).
+# Hors requête HTTP (tâches celery, commandes), tout passe par la base principale.
+
+PIN_COOKIE = 'gameur_db_pin'
+
+# Retard de réplication en secondes: 0 si tout le WAL reçu est rejoué (réplica à jour
+# même sans écriture récente), NULL -> 0 sur un serveur qui n'est pas un standby
+REPLICA_LAG_SQL = """
+    SELECT COALESCE(
+        CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END,
+        0
+    )
+"""
+
+_routing = ContextVar('gameur_db_routing', default=None)
+_health = {}  # alias -> (instant de la mesure, réplica utilisable)
+
+
+class RoutingState:
+    """
+    État de routage d'une requête HTTP, partagé par la vue et les threads sync_to_async.
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned  # écriture récente du client (cookie)
+        self.use_replica = False
+        self.wrote = False
+        self.replica = None  # réplica choisi pour toute la requête
+
+
+def read_replica(view_func):
+    """
+    Décorateur de vue: les lectures de la vue peuvent être servies par un réplica.
+    """
+    view_func.read_replica = True
+    return view_func
+
+
+def replica_lag(alias):
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(REPLICA_LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+def replica_is_healthy(alias):
+    """
+    Le réplica est-il joignable et à moins de REPLICA_MAX_LAG_SECONDS de la base principale ?
+    """
+    now = time.monotonic()
+    checked = _health.get(alias)
+    if checked and now - checked[0] < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return checked[1]
+    try:
+        lag = replica_lag(alias)
+    except DatabaseError as e:
+        print(f"Réplica {alias} injoignable, lectures sur la base principale: {e}")
+        healthy = False
+    else:
+        REPLICA_LAG_SECONDS.labels(alias).set(lag)
+        healthy = lag <= settings.REPLICA_MAX_LAG_SECONDS
+        if not healthy:
+            print(f"Réplica {alias} en retard de {lag:.1f}s, lectures sur la base principale.")
+    _health[alias] = (now, healthy)
+    return healthy
+
+
+def choose_replica():
+    replicas = [alias for alias in settings.DATABASE_REPLICAS if replica_is_healthy(alias)]
+    return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.use_replica or state.pinned or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = choose_replica()
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les réplicas contiennent les mêmes données que la base principale
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Initialise l'état de routage de chaque requête et pose le cookie PIN_COOKIE
+    après une écriture (lectures suivantes du client sur la base principale).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = self.start(request)
+        return self.finish(state, self.get_response(request))
+
+    async def __acall__(self, request):
+        state = self.start(request)
+        return self.finish(state, await self.get_response(request))
+
+    def start(self, request):
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        request.db_routing = state
+        _routing.set(state)
+        return state
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.db_routing.use_replica = (
+            getattr(view_func, 'read_replica', False) and request.method in ('GET', 'HEAD')
+        )
+
+    def finish(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+@receiver(request_finished)
+def clear_routing(sender, **kwargs):
+    # Fin de la réponse (y compris en flux): les requêtes ORM suivantes du thread,
+    # hors requête HTTP, reviennent sur la base principale
+    _routing.set(None)
@@ -0,0 +1,79 @@
+import csv
+import io
+import zlib
+
+from django.conf import settings
+
+from .auth_utils import aserialize_gamers
+from .responses import encode
+
+# Export complet du classement (/api/gamers/export/), en flux:
+# les gamers sont lus par lots via un curseur serveur (aiterator), chaque lot est
+# sérialisé en un nombre constant de requêtes (top games, rangs) puis écrit et oublié.
+# La mémoire du worker reste donc bornée par la taille d'un lot.
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+CSV_COLUMNS = [
+    'id', 'pseudo', 'avatar', 'avatar_thumb', 'level', 'points', 'rank', 'total_players',
+    'created_at', 'topGames', 'favoriteGame',
+]
+
+
+async def _chunks(queryset, chunk_size):
+    chunk = []
+    async for gamer in queryset.aiterator(chunk_size=chunk_size):
+        chunk.append(gamer)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _ndjson_lines(gamers_data):
+    return b''.join(encode(gamer_data) + b'\n' for gamer_data in gamers_data)
+
+
+def _csv_lines(gamers_data, header=False):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    if header:
+        writer.writeheader()
+    for gamer_data in gamers_data:
+        writer.writerow({
+            **gamer_data,
+            'created_at': gamer_data['created_at'].isoformat(),
+            'topGames': '|'.join(gamer_data['topGames']),
+        })
+    return buffer.getvalue().encode()
+
+
+async def export_gamers(queryset, request, export_format='ndjson', chunk_size=None):
+    """
+    Générateur async des lignes de l'export (bytes), un morceau par lot de gamers.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    if export_format == 'csv':
+        yield _csv_lines([], header=True)
+    async for chunk in _chunks(queryset, chunk_size):
+        gamers_data = await aserialize_gamers(chunk, request)
+        if export_format == 'csv':
+            yield _csv_lines(gamers_data)
+        else:
+            yield _ndjson_lines(gamers_data)
+
+
+async def gzip_stream(parts):
+    """
+    Compresse à la volée (format gzip) un flux de morceaux bytes.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    async for part in parts:
+        data = compressor.compress(part)
+        if data:
+            yield data
+    yield compressor.flush()
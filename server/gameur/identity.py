@@ -0,0 +1,157 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import Gamer
+
+User = get_user_model()
+
+# Résolution identité Auth0 (`sub`) -> (user_id, gamer_id).
+# 1. cache local au process (pas de réseau), TTL court car il n'est pas invalidé
+#    par les autres process ;
+# 2. cache Django partagé entre workers ;
+# 3. une seule requête indexée sur Gamer.auth0_id ;
+# 4. création User + Gamer, uniquement au premier login.
+
+
+def _cache_key(sub):
+    return 'gameur:identity:' + hashlib.sha256(sub.encode()).hexdigest()
+
+
+class _LocalIdentityCache:
+    """
+    Petit cache LRU borné, avec expiration, protégé par un verrou.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sub):
+        with self._lock:
+            entry = self._entries.get(sub)
+            if entry is None:
+                return None
+            expires_at, ids = entry
+            if expires_at <= time.monotonic():
+                del self._entries[sub]
+                return None
+            self._entries.move_to_end(sub)
+            return ids
+
+    def set(self, sub, ids):
+        ttl = getattr(settings, 'IDENTITY_LOCAL_CACHE_TTL', 60)
+        maxsize = getattr(settings, 'IDENTITY_LOCAL_CACHE_SIZE', 4096)
+        with self._lock:
+            self._entries[sub] = (time.monotonic() + ttl, ids)
+            self._entries.move_to_end(sub)
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, sub):
+        with self._lock:
+            self._entries.pop(sub, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for sub in [sub for sub, (_, ids) in self._entries.items() if ids[0] == user_id]:
+                del self._entries[sub]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_identity_cache = _LocalIdentityCache()
+
+
+def _default_pseudo(payload, sub):
+    """
+    Pseudo initial: nickname Auth0 si libre, sinon suffixé pour rester unique.
+    """
+    pseudo = (payload.get('nickname') or sub)[:50]
+    if Gamer.objects.filter(pseudo=pseudo).exists():
+        suffix = hashlib.sha256(sub.encode()).hexdigest()[:8]
+        pseudo = f'{pseudo[:41]}_{suffix}'
+    return pseudo
+
+
+def _lookup(sub):
+    row = Gamer.objects.filter(auth0_id=sub).values_list('user_id', 'id').first()
+    return tuple(row) if row else None
+
+
+def _create(sub, payload):
+    """
+    Premier login: crée le User Django et son profil Gamer.
+    """
+    try:
+        with transaction.atomic():
+            user = User.objects.create(username=sub[:150], email=payload.get('email', ''))
+            gamer = Gamer.objects.create(user=user, auth0_id=sub, pseudo=_default_pseudo(payload, sub))
+        print(f"Nouveau profil Gamer créé pour Auth0 ID: {sub}")
+        return (user.id, gamer.id)
+    except IntegrityError:
+        # Une requête concurrente a créé le profil entre notre lookup et notre insert
+        ids = _lookup(sub)
+        if ids is None:
+            raise
+        return ids
+
+
+def resolve_identity(payload):
+    """
+    Retourne (user_id, gamer_id) pour le `sub` du payload, en créant le profil si besoin.
+    """
+    sub = payload['sub']
+    ids = local_identity_cache.get(sub)
+    if ids is not None:
+        return ids
+
+    key = _cache_key(sub)
+    ids = cache.get(key)
+    if ids is None:
+        ids = _lookup(sub) or _create(sub, payload)
+        cache.set(key, ids, getattr(settings, 'IDENTITY_CACHE_TTL', 3600))
+    ids = tuple(ids)
+    local_identity_cache.set(sub, ids)
+    return ids
+
+
+async def aresolve_identity(payload):
+    """
+    Version async de resolve_identity (ORM et cache async de Django).
+    """
+    sub = payload['sub']
+    ids = local_identity_cache.get(sub)
+    if ids is not None:
+        return ids
+
+    key = _cache_key(sub)
+    ids = await cache.aget(key)
+    if ids is None:
+        row = await Gamer.objects.filter(auth0_id=sub).values_list('user_id', 'id').afirst()
+        ids = tuple(row) if row else await sync_to_async(_create)(sub, payload)
+        await cache.aset(key, ids, getattr(settings, 'IDENTITY_CACHE_TTL', 3600))
+    ids = tuple(ids)
+    local_identity_cache.set(sub, ids)
+    return ids
+
+
+def invalidate_identity(sub=None, user_id=None):
+    """
+    Supprime le mapping d'une identité des caches (appelé à la suppression d'un Gamer/User).
+    Le cache partagé n'est indexé que par `sub`: `user_id` seul ne vide que le cache local.
+    """
+    if sub:
+        local_identity_cache.delete(sub)
+        cache.delete(_cache_key(sub))
+    if user_id is not None:
+        local_identity_cache.delete_user(user_id)
@@ -0,0 +1,87 @@
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Variantes redimensionnées des images envoyées (Gamer.avatar, Game.icon).
+# Chaque variante est nommée d'après le hash de son contenu: une URL ne désigne
+# jamais deux images différentes, elle peut donc être mise en cache indéfiniment.
+# Les noms générés sont stockés dans un JSONField du modèle:
+# {'source': <nom de l'original>, 'webp': {taille: nom}, 'jpeg': {taille: nom}}
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_sizes():
+    return sorted(getattr(settings, 'IMAGE_VARIANT_SIZES', (64, 128, 256)))
+
+
+def _render(image, size, image_format, options):
+    variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    buffer = io.BytesIO()
+    variant.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(field_file):
+    """
+    Génère les variantes WebP/JPEG carrées d'un ImageField et retourne leur description.
+    """
+    directory = field_file.field.upload_to.rstrip('/') + '/variants'
+    with field_file.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    variants = {'source': field_file.name}
+    for key, (image_format, options) in VARIANT_FORMATS.items():
+        variants[key] = {}
+        for size in variant_sizes():
+            content = _render(image, size, image_format, options)
+            digest = hashlib.sha256(content).hexdigest()[:16]
+            name = f'{directory}/{digest}_{size}.{key}'
+            # Même contenu -> même nom: une variante déjà générée n'est pas réécrite
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(content))
+            variants[key][str(size)] = name
+    return variants
+
+
+def variants_are_current(field_file, variants):
+    return bool(field_file) and bool(variants) and variants.get('source') == field_file.name
+
+
+def variant_urls(field_file, variants, request=None):
+    """
+    Retourne (thumb, srcset) pour un ImageField: URL de la plus petite variante WebP et
+    {'webp': "url 64w, url 128w, ...", 'jpeg': ...}.
+    Tant que les variantes ne correspondent pas à l'image actuelle, l'original est renvoyé.
+    """
+    if not field_file:
+        return None, None
+
+    def absolute(url):
+        return request.build_absolute_uri(url) if request is not None else url
+
+    if not variants_are_current(field_file, variants):
+        original = absolute(field_file.url)
+        return original, None
+    srcset = {
+        key: ', '.join(
+            f'{absolute(default_storage.url(name))} {size}w'
+            for size, name in sorted(variants[key].items(), key=lambda item: int(item[0]))
+        )
+        for key in VARIANT_FORMATS
+    }
+    smallest = min(variants['webp'], key=int)
+    return absolute(default_storage.url(variants['webp'][smallest])), srcset
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+
+import jwt
+import requests
+from django.conf import settings
+
+from .metrics import JWKS_FETCH_SECONDS
+
+
+class JWKSKeyManager:
+    """
+    Gestionnaire des clés publiques JWKS d'Auth0, indexées par `kid`.
+
+    - les clés sont rafraîchies en arrière-plan une fois le TTL écoulé
+      (les requêtes continuent d'utiliser les clés courantes pendant ce temps) ;
+    - un `kid` inconnu (rotation de clé) déclenche un seul refetch forcé,
+      partagé par tous les threads qui attendent (single-flight) et limité
+      à un par `min_refresh_interval` ;
+    - si le refetch échoue, on continue à servir les dernières clés valides.
+    """
+
+    def __init__(self, jwks_url, ttl=600, min_refresh_interval=30, timeout=5):
+        self.jwks_url = jwks_url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.document = None
+        self._keys = {}
+        self._fetched_at = None
+        self._last_attempt = None
+        self._last_forced = None
+        self._attempts = 0
+        self._refresh_lock = threading.Lock()
+        self._background_refresh = None
+
+    def _fetch(self):
+        """
+        Télécharge le document JWKS et retourne (document, {kid: PyJWK}).
+        La durée et le résultat sont exposés sur /metrics (gameur_jwks_fetch_seconds).
+        """
+        started = time.perf_counter()
+        try:
+            document, keys = self._download()
+        except Exception:
+            JWKS_FETCH_SECONDS.labels('error').observe(time.perf_counter() - started)
+            raise
+        JWKS_FETCH_SECONDS.labels('success').observe(time.perf_counter() - started)
+        return document, keys
+
+    def _download(self):
+        response = requests.get(self.jwks_url, timeout=self.timeout)
+        response.raise_for_status()
+        document = response.json()
+        keys = {}
+        for key_data in document.get('keys', []):
+            if key_data.get('use', 'sig') != 'sig' or not key_data.get('kid'):
+                continue
+            try:
+                keys[key_data['kid']] = jwt.PyJWK(key_data)
+            except jwt.PyJWKError as e:
+                print(f"Clé JWKS ignorée ({key_data.get('kid')}): {e}")
+        if not keys:
+            raise ValueError('Aucune clé de signature utilisable dans le JWKS.')
+        return document, keys
+
+    def _recently_attempted(self):
+        return (
+            self._last_attempt is not None
+            and time.monotonic() - self._last_attempt < self.min_refresh_interval
+        )
+
+    def refresh(self, forced=False):
+        """
+        Recharge les clés. Un seul thread télécharge à la fois: ceux qui attendaient
+        réutilisent son résultat au lieu de relancer une requête (single-flight).
+        `forced` (kid inconnu) est limité à un refetch par `min_refresh_interval`.
+        Retourne True si ce thread a rechargé les clés avec succès.
+        """
+        seen_attempts = self._attempts
+        with self._refresh_lock:
+            if self._attempts != seen_attempts:
+                # Un autre thread vient de rafraîchir pendant qu'on attendait
+                return False
+            now = time.monotonic()
+            if forced:
+                if self._last_forced is not None and now - self._last_forced < self.min_refresh_interval:
+                    return False
+                self._last_forced = now
+            elif self._recently_attempted():
+                return False
+            self._attempts += 1
+            self._last_attempt = now
+            try:
+                document, keys = self._fetch()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Erreur lors de la récupération des JWKS: {e}")
+                # On garde les dernières clés valides
+                return False
+            self.document = document
+            self._keys = keys
+            self._fetched_at = now
+            return True
+
+    def _is_stale(self):
+        return self._fetched_at is None or time.monotonic() - self._fetched_at >= self.ttl
+
+    def _refresh_in_background(self):
+        thread = self._background_refresh
+        if (thread is not None and thread.is_alive()) or self._recently_attempted():
+            return
+        self._background_refresh = threading.Thread(target=self.refresh, daemon=True)
+        self._background_refresh.start()
+
+    def get_signing_key(self, kid):
+        """
+        Retourne la clé (PyJWK) correspondant à `kid`, ou None si elle reste inconnue.
+        """
+        if not self._keys:
+            # Premier appel (ou jamais réussi): on doit attendre le téléchargement
+            self.refresh()
+        elif self._is_stale():
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is None and self._keys:
+            # kid inconnu: probablement une rotation de clé chez Auth0
+            self.refresh(forced=True)
+            key = self._keys.get(kid)
+        return key
+
+    async def aget_signing_key(self, kid):
+        """
+        Version async: une clé connue est servie sans bloquer la boucle d'événements,
+        un éventuel téléchargement (premier appel, kid inconnu) est fait dans un thread.
+        """
+        key = self._keys.get(kid)
+        if key is not None:
+            if self._is_stale():
+                self._refresh_in_background()
+            return key
+        return await asyncio.to_thread(self.get_signing_key, kid)
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_key_manager(domain):
+    """
+    Retourne le gestionnaire de clés (un par URL JWKS et par process).
+    """
+    jwks_url = getattr(settings, 'AUTH0_JWKS_URL', None) or f'https://{domain}/.well-known/jwks.json'
+    with _managers_lock:
+        manager = _managers.get(jwks_url)
+        if manager is None:
+            manager = JWKSKeyManager(
+                jwks_url,
+                ttl=getattr(settings, 'AUTH0_JWKS_TTL', 600),
+                min_refresh_interval=getattr(settings, 'AUTH0_JWKS_MIN_REFRESH_INTERVAL', 30),
+            )
+            _managers[jwks_url] = manager
+        return manager
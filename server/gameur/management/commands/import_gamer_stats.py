@@ -0,0 +1,364 @@
+import csv
+import io
+import json
+import multiprocessing
+import sys
+import time
+import zlib
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+
+from gameur.changes import change_log, record_gamer_changes
+from gameur.models import Game, Gamer, GamerChange, GamerGame
+from gameur.top_games import refresh_top_games
+from gameur.versions import bump_game_leaderboard_versions_on_commit, bump_leaderboard_version
+
+# Colonnes attendues (CSV avec en-tête, ou un objet JSON par ligne):
+#   pseudo (obligatoire), points, level, game, skill_level, hours_played
+# Une ligne met à jour les points/level du Gamer et/ou ses stats sur un jeu.
+# Les gamers sont identifiés par leur pseudo: ils ne sont jamais créés ici
+# (un Gamer a besoin d'un User), les lignes inconnues sont comptées "unmatched".
+
+STAGING_TABLE = 'gameur_stats_staging'
+
+
+def read_rows(stream, fmt):
+    """
+    Lit les lignes une par une (mémoire constante).
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _to_int(value, field):
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f'{field} must be an integer')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be an integer')
+
+
+def validate_row(raw, seq):
+    """
+    Retourne le tuple (seq, pseudo, points, level, game, skill_level, hours_played)
+    prêt pour le staging, ou lève ValueError.
+    """
+    pseudo = (raw.get('pseudo') or '').strip()
+    if not pseudo or len(pseudo) > 50:
+        raise ValueError('pseudo is required (50 characters max)')
+    points = _to_int(raw.get('points'), 'points')
+    level = _to_int(raw.get('level'), 'level')
+    game = (raw.get('game') or '').strip() or None
+    skill_level = _to_int(raw.get('skill_level'), 'skill_level')
+    hours_played = _to_int(raw.get('hours_played'), 'hours_played')
+    if game:
+        if skill_level is None or not 1 <= skill_level <= 5:
+            raise ValueError('skill_level must be between 1 and 5')
+        if hours_played is None:
+            hours_played = 0
+        if hours_played < 0:
+            raise ValueError('hours_played must be positive')
+    elif points is None and level is None:
+        raise ValueError('row has nothing to import')
+    return (seq, pseudo, points, level, game, skill_level, hours_played)
+
+
+class OrmStatsLoader:
+    """
+    Chargement par lot via l'ORM (SQLite et autres bases sans COPY).
+    """
+
+    def load(self, chunk):
+        pseudos = {row[1] for row in chunk}
+        names = {row[4] for row in chunk if row[4]}
+        gamer_ids = dict(Gamer.objects.filter(pseudo__in=pseudos).values_list('pseudo', 'id'))
+        game_ids = dict(Game.objects.filter(name__in=names).values_list('name', 'id'))
+
+        points, levels, gamer_games = {}, {}, {}
+        unmatched = 0
+        # Les lignes sont triées par seq: la dernière occurrence gagne
+        for seq, pseudo, row_points, row_level, game, skill_level, hours_played in chunk:
+            gamer_id = gamer_ids.get(pseudo)
+            if gamer_id is None or (game and game not in game_ids):
+                unmatched += 1
+                continue
+            if row_points is not None:
+                points[gamer_id] = row_points
+            if row_level is not None:
+                levels[gamer_id] = row_level
+            if game:
+                gamer_games[(gamer_id, game_ids[game])] = (skill_level, hours_played)
+
+        with transaction.atomic(), change_log():
+            transaction.on_commit(bump_leaderboard_version)
+            bump_game_leaderboard_versions_on_commit(game_id for _, game_id in gamer_games)
+            record_gamer_changes(points.keys() | levels.keys(), GamerChange.PROFILE)
+            record_gamer_changes({gamer_id for gamer_id, _ in gamer_games}, GamerChange.GAMES)
+            Gamer.objects.bulk_update([Gamer(id=pk, points=value) for pk, value in points.items()], ['points'])
+            Gamer.objects.bulk_update([Gamer(id=pk, level=value) for pk, value in levels.items()], ['level'])
+            GamerGame.objects.bulk_create(
+                [
+                    GamerGame(gamer_id=gamer_id, game_id=game_id, skill_level=skill_level, hours_played=hours_played)
+                    for (gamer_id, game_id), (skill_level, hours_played) in gamer_games.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['gamer', 'game'],
+                update_fields=['skill_level', 'hours_played'],
+            )
+            refresh_top_games(gamer_id for gamer_id, _ in gamer_games)
+        return {
+            'gamers_updated': len(points.keys() | levels.keys()),
+            'gamer_games_upserted': len(gamer_games),
+            'unmatched': unmatched,
+        }
+
+
+class PostgresStatsLoader:
+    """
+    Chargement PostgreSQL: COPY du lot dans une table temporaire, puis merge ensembliste.
+    """
+
+    def __init__(self):
+        self.gamer_table = Gamer._meta.db_table
+        self.game_table = Game._meta.db_table
+        self.gamer_game_table = GamerGame._meta.db_table
+
+    def _copy(self, cursor, chunk):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in chunk:
+            writer.writerow(['' if value is None else value for value in row])
+        buffer.seek(0)
+        sql = f'COPY {STAGING_TABLE} (seq, pseudo, points, level, game, skill_level, hours_played) FROM STDIN WITH (FORMAT csv)'
+        if hasattr(cursor, 'copy_expert'):
+            cursor.copy_expert(sql, buffer)  # psycopg2
+        else:
+            with cursor.copy(sql) as copy:  # psycopg 3
+                copy.write(buffer.getvalue())
+
+    def load(self, chunk):
+        with transaction.atomic(), change_log(), connection.cursor() as cursor:
+            # Les bulk updates ne déclenchent pas les signaux: invalide les ETag du classement
+            transaction.on_commit(bump_leaderboard_version)
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ('
+                'seq bigint, pseudo text, points integer, level integer, '
+                'game text, skill_level integer, hours_played integer'
+                ') ON COMMIT DELETE ROWS'
+            )
+            # Transaction englobante (tests, appel depuis un autre atomic): pas de commit entre deux lots
+            cursor.execute(f'DELETE FROM {STAGING_TABLE}')
+            self._copy(cursor, chunk)
+
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {STAGING_TABLE} s '
+                f'WHERE NOT EXISTS (SELECT 1 FROM {self.gamer_table} g WHERE g.pseudo = s.pseudo) '
+                f'OR (s.game IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {self.game_table} gm WHERE gm.name = s.game))'
+            )
+            unmatched = cursor.fetchone()[0]
+
+            cursor.execute(
+                f'UPDATE {self.gamer_table} AS g '
+                'SET points = COALESCE(s.points, g.points), level = COALESCE(s.level, g.level) '
+                'FROM ('
+                # Dernière valeur non nulle de chaque colonne, séparément: points et level
+                # peuvent arriver sur des lignes différentes (comme avec OrmStatsLoader)
+                '  SELECT pseudo, '
+                '  (array_agg(points ORDER BY seq DESC) FILTER (WHERE points IS NOT NULL))[1] AS points, '
+                '  (array_agg(level ORDER BY seq DESC) FILTER (WHERE level IS NOT NULL))[1] AS level '
+                f'  FROM {STAGING_TABLE} st '
+                '  WHERE (points IS NOT NULL OR level IS NOT NULL) '
+                # Jeu inconnu: ligne entière ignorée (comptée unmatched), comme avec OrmStatsLoader
+                f'  AND (st.game IS NULL OR EXISTS (SELECT 1 FROM {self.game_table} gm WHERE gm.name = st.game)) '
+                '  GROUP BY pseudo'
+                ') AS s '
+                'WHERE g.pseudo = s.pseudo '
+                'RETURNING g.id'
+            )
+            changed_gamer_ids = {row[0] for row in cursor.fetchall()}
+            gamers_updated = len(changed_gamer_ids)
+
+            cursor.execute(
+                f'INSERT INTO {self.gamer_game_table} (gamer_id, game_id, skill_level, hours_played) '
+                'SELECT DISTINCT ON (g.id, gm.id) g.id, gm.id, s.skill_level, s.hours_played '
+                f'FROM {STAGING_TABLE} s '
+                f'JOIN {self.gamer_table} g ON g.pseudo = s.pseudo '
+                f'JOIN {self.game_table} gm ON gm.name = s.game '
+                'ORDER BY g.id, gm.id, s.seq DESC '
+                'ON CONFLICT (gamer_id, game_id) DO UPDATE '
+                'SET skill_level = EXCLUDED.skill_level, hours_played = EXCLUDED.hours_played '
+                'RETURNING gamer_id, game_id'
+            )
+            upserted = cursor.fetchall()
+            gamer_games_upserted = len(upserted)
+            bump_game_leaderboard_versions_on_commit(game_id for _, game_id in upserted)
+            # Flux /api/gamers/changes/: les écritures SQL brutes ne passent pas par les signaux
+            record_gamer_changes(changed_gamer_ids, GamerChange.PROFILE)
+            record_gamer_changes({gamer_id for gamer_id, _ in upserted}, GamerChange.GAMES)
+            # Top games dénormalisés (bulk_update par paquets de UPDATE_BATCH_SIZE)
+            refresh_top_games(gamer_id for gamer_id, _ in upserted)
+        return {
+            'gamers_updated': gamers_updated,
+            'gamer_games_upserted': gamer_games_upserted,
+            'unmatched': unmatched,
+        }
+
+
+def get_loader():
+    if connection.vendor == 'postgresql':
+        return PostgresStatsLoader()
+    return OrmStatsLoader()
+
+
+def _worker(queue, results):
+    """
+    Process worker: charge les lots reçus dans l'ordre, avec sa propre connexion.
+    """
+    totals = Counter()
+    try:
+        loader = get_loader()
+        while True:
+            chunk = queue.get()
+            if chunk is None:
+                break
+            totals.update(loader.load(chunk))
+    except Exception as e:
+        totals['errors'] += 1
+        print(f"Erreur dans le worker d'import: {e}", file=sys.stderr)
+        # Vide la file pour ne pas bloquer le process principal
+        while queue.get() is not None:
+            pass
+    finally:
+        connection.close()
+        results.put(dict(totals))
+
+
+class Command(BaseCommand):
+    help = 'Importe en masse des stats de gamers (CSV ou NDJSON) dans Gamer/GamerGame.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier CSV/NDJSON à importer ('-' pour stdin).")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Déduit de l'extension par défaut.")
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Lignes par lot (défaut: 10000).')
+        parser.add_argument('--workers', type=int, default=1, help='Nombre de process de chargement (PostgreSQL).')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        if chunk_size < 1 or workers < 1:
+            raise CommandError('--chunk-size and --workers must be positive.')
+        if workers > 1 and connection.vendor != 'postgresql':
+            self.stderr.write('--workers est ignoré hors PostgreSQL, import sur un seul process.')
+            workers = 1
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            if workers == 1:
+                totals = self._import_serial(stream, fmt, chunk_size)
+            else:
+                totals = self._import_parallel(stream, fmt, chunk_size, workers)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Import terminé: {totals['read']} lignes lues, {totals['rejected']} rejetées, "
+            f"{totals['unmatched']} sans gamer/jeu correspondant, "
+            f"{totals['gamers_updated']} gamers mis à jour, "
+            f"{totals['gamer_games_upserted']} stats de jeu importées."
+        ))
+        if totals['errors']:
+            raise CommandError(f"{totals['errors']} worker(s) en erreur, import partiel.")
+
+    def _validated_rows(self, stream, fmt, totals):
+        """
+        Valide les lignes au fil de l'eau; les lignes invalides sont comptées et signalées.
+        """
+        try:
+            for seq, raw in enumerate(read_rows(stream, fmt), start=1):
+                totals['read'] += 1
+                try:
+                    yield validate_row(raw, seq)
+                except (ValueError, AttributeError) as e:
+                    totals['rejected'] += 1
+                    if totals['rejected'] <= 10:
+                        self.stderr.write(f'Ligne {seq} rejetée: {e}')
+        except (csv.Error, json.JSONDecodeError) as e:
+            raise CommandError(f'Fichier illisible après {totals["read"]} lignes: {e}')
+
+    def _progress(self, totals, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f"{totals['read']} lignes lues, {totals['rejected']} rejetées "
+            f"({totals['read'] / elapsed:.0f} lignes/s)"
+        )
+
+    def _import_serial(self, stream, fmt, chunk_size):
+        totals = Counter()
+        started = time.monotonic()
+        loader = get_loader()
+        chunk = []
+        for row in self._validated_rows(stream, fmt, totals):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                totals.update(loader.load(chunk))
+                chunk = []
+                self._progress(totals, started)
+        if chunk:
+            totals.update(loader.load(chunk))
+        self._progress(totals, started)
+        return totals
+
+    def _import_parallel(self, stream, fmt, chunk_size, workers):
+        """
+        Répartit les lignes entre les workers par hash du pseudo: toutes les lignes
+        d'un même gamer vont au même worker, dans l'ordre, donc "la dernière gagne"
+        reste vrai. Les files sont bornées: la mémoire ne dépend pas de la taille du fichier.
+        """
+        context = multiprocessing.get_context('fork')
+        # Les connexions ne doivent pas être partagées entre process
+        connections.close_all()
+        queues = [context.Queue(maxsize=2) for _ in range(workers)]
+        results = context.Queue()
+        processes = [context.Process(target=_worker, args=(queue, results)) for queue in queues]
+        for process in processes:
+            process.start()
+
+        totals = Counter()
+        started = time.monotonic()
+        buckets = [[] for _ in range(workers)]
+        sent = 0
+        try:
+            for row in self._validated_rows(stream, fmt, totals):
+                index = zlib.crc32(row[1].encode()) % workers
+                buckets[index].append(row)
+                if len(buckets[index]) >= chunk_size:
+                    queues[index].put(buckets[index])
+                    buckets[index] = []
+                    sent += 1
+                    if sent % workers == 0:
+                        self._progress(totals, started)
+            for queue, bucket in zip(queues, buckets):
+                if bucket:
+                    queue.put(bucket)
+        finally:
+            for queue in queues:
+                queue.put(None)
+            for _ in processes:
+                totals.update(results.get())
+            for process in processes:
+                process.join()
+        self._progress(totals, started)
+        return totals
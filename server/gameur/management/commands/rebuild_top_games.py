@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from gameur.models import Gamer
+from gameur.top_games import update_top_games
+from gameur.versions import bump_leaderboard_version
+
+# Recalcule Gamer.top_game_ids / favorite_game depuis GamerGame pour tous les gamers
+# (après un import SQL hors de l'application, un changement de TOP_GAMES_COUNT...).
+# Parcours par id croissant (keyset), un lot par transaction: les écritures concurrentes
+# ne sont bloquées que le temps d'un lot, et seuls les gamers modifiés sont réécrits.
+
+
+class Command(BaseCommand):
+    help = 'Recalcule en masse les top games et jeux favoris dénormalisés sur Gamer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Gamers par lot (défaut: 2000).')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        started = time.monotonic()
+        last_id, scanned, updated = 0, 0, 0
+        while True:
+            with transaction.atomic():
+                gamers = list(
+                    Gamer.objects.filter(id__gt=last_id).order_by('id')
+                    .only('id', 'top_game_ids', 'favorite_game', 'favorite_game_pinned')
+                    .select_for_update()[:batch_size]
+                )
+                if not gamers:
+                    break
+                updated += update_top_games(gamers)
+            scanned += len(gamers)
+            last_id = gamers[-1].id
+            self.stdout.write(f'{scanned} gamers parcourus, {updated} mis à jour')
+
+        if updated:
+            # bulk_update ne déclenche pas les signaux: invalide les ETag du classement
+            bump_leaderboard_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'{scanned} gamers parcourus, {updated} mis à jour en {time.monotonic() - started:.1f}s.'
+        ))
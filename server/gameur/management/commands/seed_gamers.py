@@ -0,0 +1,135 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from gameur.models import Game, Gamer, GamerGame
+from gameur.ranking import build_rank_snapshot
+from gameur.top_games import rank_top_games
+
+User = get_user_model()
+
+# Jeu de données déterministe pour les benchmarks (benchmarks/run.py):
+# même --size et même --seed donnent exactement les mêmes gamers, jeux et stats.
+# - points: loi de Pareto (quelques gros scores, une longue traîne) ;
+# - nombre de jeux par gamer: 1 + loi exponentielle (moyenne ~3,5, max 12) ;
+# - popularité des jeux: loi de Zipf (quelques jeux très joués) ;
+# - heures: loi log-normale, niveau corrélé aux heures.
+# Les gamers sont identifiables par leur auth0_id `bench|<n>` (tokens du stub d'auth).
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+CATEGORIES = ['FPS', 'MOBA', 'RPG', 'Sport', 'Course', 'Stratégie', 'Combat', 'Battle Royale']
+BATCH_SIZE = 5000
+
+
+def parse_size(value):
+    size = SIZES.get(value.lower())
+    if size is None:
+        try:
+            size = int(value)
+        except ValueError:
+            raise CommandError(f"Taille invalide: {value} (10k, 100k, 1m ou un entier).")
+    if size < 1:
+        raise CommandError('--size must be positive.')
+    return size
+
+
+def bench_sub(index):
+    return f'bench|{index}'
+
+
+class Generator:
+    def __init__(self, seed, game_ids):
+        self.rng = random.Random(seed)
+        self.game_ids = game_ids
+        # Zipf: le jeu de rang r est choisi avec un poids 1/r
+        self.weights = [1 / rank for rank in range(1, len(game_ids) + 1)]
+
+    def points(self):
+        return min(int(self.rng.paretovariate(1.16) * 50) - 50, 1_000_000)
+
+    def games(self):
+        count = min(1 + int(self.rng.expovariate(1 / 2.5)), 12, len(self.game_ids))
+        chosen = set()
+        while len(chosen) < count:
+            chosen.update(self.rng.choices(self.game_ids, weights=self.weights, k=count - len(chosen)))
+        stats = []
+        for game_id in sorted(chosen):
+            hours = int(self.rng.lognormvariate(3.0, 1.3))
+            skill_level = max(1, min(5, 1 + int(hours / 60) + self.rng.choice((-1, 0, 0, 1))))
+            stats.append((game_id, skill_level, hours))
+        return stats
+
+
+class Command(BaseCommand):
+    help = 'Génère un jeu de données reproductible de gamers pour les benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', default='10k', help='Nombre de gamers: 10k, 100k, 1m ou un entier (défaut: 10k).')
+        parser.add_argument('--seed', type=int, default=42, help='Graine du générateur (défaut: 42).')
+        parser.add_argument('--games', type=int, default=200, help='Nombre de jeux (défaut: 200).')
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Vide toute la base avant (à n’utiliser que sur une base dédiée aux benchmarks).',
+        )
+
+    def handle(self, *args, **options):
+        size = parse_size(options['size'])
+        if options['games'] < 1:
+            raise CommandError('--games must be positive.')
+        if options['reset']:
+            call_command('flush', interactive=False, verbosity=0)
+        if Gamer.objects.exists():
+            raise CommandError('La base contient déjà des gamers: relancer avec --reset sur une base de benchmark.')
+
+        started = time.monotonic()
+        games = Game.objects.bulk_create([
+            Game(name=f'Bench Game {i:04d}', category=CATEGORIES[i % len(CATEGORIES)])
+            for i in range(options['games'])
+        ])
+        generator = Generator(options['seed'], [game.id for game in games])
+
+        gamer_games = 0
+        for start in range(0, size, BATCH_SIZE):
+            gamer_games += self._create_batch(generator, range(start, min(start + BATCH_SIZE, size)))
+            self.stdout.write(f'{min(start + BATCH_SIZE, size)}/{size} gamers créés')
+
+        snapshot = build_rank_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"{size} gamers, {gamer_games} stats de jeu et {len(games)} jeux générés "
+            f"(seed {options['seed']}, snapshot {snapshot.id if snapshot else '-'}) "
+            f"en {time.monotonic() - started:.1f}s."
+        ))
+
+    def _create_batch(self, generator, indexes):
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=f'bench_{index}', password='!') for index in indexes
+            ])
+            # Tirages dans le même ordre qu'avant (mêmes données pour une seed): les points, puis les jeux
+            # de chaque gamer; top games et favori calculés ici plutôt que relus après insertion
+            points = [generator.points() for _ in indexes]
+            stats = [generator.games() for _ in indexes]
+            top_game_ids = [rank_top_games((game_id, hours) for game_id, _, hours in games) for games in stats]
+            gamers = Gamer.objects.bulk_create([
+                Gamer(
+                    user=user,
+                    auth0_id=bench_sub(index),
+                    pseudo=f'bench_{index}',
+                    level=1 + index % 50,
+                    points=gamer_points,
+                    top_game_ids=top_ids,
+                    favorite_game_id=top_ids[0] if top_ids else None,
+                )
+                for index, user, gamer_points, top_ids in zip(indexes, users, points, top_game_ids)
+            ])
+            rows = [
+                GamerGame(gamer=gamer, game_id=game_id, skill_level=skill_level, hours_played=hours)
+                for gamer, games in zip(gamers, stats)
+                for game_id, skill_level, hours in games
+            ]
+            GamerGame.objects.bulk_create(rows)
+        return len(rows)
@@ -0,0 +1,104 @@
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+# Métriques applicatives exposées sur /metrics (avec celles de django_prometheus).
+
+AUTH0_TOKEN_VALIDATION_SECONDS = Histogram(
+    'gameur_auth0_token_validation_seconds',
+    "Durée de validate_auth0_token, par résultat (cached, valid, invalid)",
+    ['outcome'],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+JWKS_FETCH_SECONDS = Histogram(
+    'gameur_jwks_fetch_seconds',
+    "Durée des téléchargements du JWKS Auth0, par résultat (success, error)",
+    ['outcome'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+SERIALIZE_GAMER_SECONDS = Histogram(
+    'gameur_serialize_gamer_seconds',
+    "Durée de serialize_gamer (un gamer, données préchargées ou non)",
+    buckets=(0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05),
+)
+
+VIEW_QUERY_COUNT = Histogram(
+    'gameur_view_sql_queries',
+    "Nombre de requêtes SQL exécutées par requête HTTP, par vue",
+    ['view'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+
+REPLICA_LAG_SECONDS = Gauge(
+    'gameur_replica_lag_seconds',
+    "Dernier retard de réplication mesuré, par réplica (cf. gameur.db_router)",
+    ['alias'],
+)
+
+PUSH_CONNECTIONS = Gauge(
+    'gameur_push_connections',
+    "Connexions SSE ouvertes sur /api/gamers/stream/ (cf. gameur.push)",
+    multiprocess_mode='livesum',
+)
+
+PUSH_CLIENT_RESYNCS = Counter(
+    'gameur_push_client_resyncs_total',
+    "Clients push trop lents, dont les messages en retard ont été remplacés par un resync",
+)
+
+RATE_LIMITED = Counter(
+    'gameur_rate_limited_total',
+    "Requêtes refusées (429) par la limitation de débit, par portée (ip, sub) et seau (cf. gameur.ratelimit)",
+    ['scope', 'bucket'],
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    'gameur_requests_in_flight',
+    "Requêtes HTTP en cours de traitement (cf. AdmissionControlMiddleware)",
+    multiprocess_mode='livesum',
+)
+
+REQUESTS_SHED = Counter(
+    'gameur_requests_shed_total',
+    "Requêtes refusées (503) par le délestage, au-delà de ADMISSION_MAX_IN_FLIGHT requêtes en cours",
+)
+
+
+class PointBufferCollector:
+    """
+    Retard du buffer de points (cf. gameur.points.buffer_lag), mesuré en base à chaque
+    scrape: une seule requête pour les deux jauges, quel que soit le process scrapé.
+    """
+
+    def describe(self):
+        # Sans describe(), REGISTRY.register appellerait collect() (et la base) dès l'import
+        return self._families()
+
+    def collect(self):
+        from .points import buffer_lag  # Import différé: points importe les modèles
+
+        try:
+            lag = buffer_lag()
+        except Exception as e:
+            print(f"Retard du buffer de points indisponible: {e}")
+            return []
+        pending, lag_seconds = self._families()
+        pending.add_metric([], lag['pending'])
+        lag_seconds.add_metric([], lag['lag_seconds'])
+        return [pending, lag_seconds]
+
+    def _families(self):
+        return [
+            GaugeMetricFamily(
+                'gameur_point_buffer_pending',
+                "Incréments de points en attente d'application (cf. flush_point_increments)",
+            ),
+            GaugeMetricFamily(
+                'gameur_point_buffer_lag_seconds',
+                "Âge du plus ancien incrément de points en attente (0 si aucun)",
+            ),
+        ]
+
+
+REGISTRY.register(PointBufferCollector())
@@ -0,0 +1,255 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import REQUESTS_IN_FLIGHT, REQUESTS_SHED, VIEW_QUERY_COUNT
+from .responses import ApiResponse
+
+# Comptage des requêtes SQL par requête HTTP: un execute_wrapper permanent sur chaque
+# connexion (posé à son ouverture, cf. signals) compte dans le compteur de la requête
+# courante, lu dans une contextvar. En ASGI les requêtes ORM d'une vue async s'exécutent
+# dans le thread de sync_to_async, sur une autre connexion: la contextvar y est recopiée.
+# - nombre et durée cumulée exposés dans l'en-tête Server-Timing et sur /metrics ;
+# - budget par vue (décorateur @query_budget): un dépassement fait échouer les tests
+#   (SQL_QUERY_BUDGET_STRICT) et n'est qu'un avertissement en production, avec les
+#   requêtes les plus fréquentes / coûteuses sous forme normalisée.
+
+# Les instructions de contrôle de transaction (savepoints) ne comptent pas dans le budget
+TRANSACTION_CONTROL_RE = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\?')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES_RE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Levée (en mode strict) quand une vue dépasse son budget de requêtes SQL.
+    """
+
+
+def normalize_sql(sql):
+    """
+    Forme normalisée d'une requête: littéraux et paramètres remplacés par ?,
+    listes IN (?, ?, ...) réduites, pour regrouper les requêtes identiques (N+1).
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _SPACES_RE.sub(' ', sql).strip()
+
+
+def query_budget(max_queries):
+    """
+    Décorateur de vue: nombre maximal de requêtes SQL par requête HTTP.
+    Peut être placé sous d'autres décorateurs: functools.wraps recopie l'attribut.
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+class QueryCounter:
+    """
+    Wrapper d'exécution SQL qui compte les requêtes et leur durée, par requête normalisée.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if TRANSACTION_CONTROL_RE.match(sql):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            stats = self.statements.setdefault(normalize_sql(sql), [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+
+    def worst_offenders(self, limit=5):
+        """
+        Requêtes normalisées les plus répétées puis les plus lentes: [(sql, nombre, durée)].
+        """
+        ranked = sorted(self.statements.items(), key=lambda item: (item[1][0], item[1][1]), reverse=True)
+        return [(sql, count, duration) for sql, (count, duration) in ranked[:limit]]
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+def _view_budget(request):
+    match = getattr(request, 'resolver_match', None)
+    budget = getattr(match.func, 'query_budget', None) if match else None
+    if budget is None:
+        budget = getattr(settings, 'SQL_QUERY_BUDGET_DEFAULT', None)
+    return budget
+
+
+_current_counter = ContextVar('gameur_query_counter', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _current_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def install_query_counter(connection):
+    """
+    Pose le wrapper de comptage sur une connexion (idempotent). En tête de liste: les
+    wrappers temporaires de connection.execute_wrapper() sont retirés par pop().
+    """
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _count_query)
+
+
+@contextmanager
+def count_queries(counter):
+    """
+    Compte dans `counter` les requêtes exécutées dans ce contexte, quel que soit le
+    thread et la base (principale et réplicas, cf. gameur.db_router).
+    """
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+
+class QueryCountMiddleware:
+    """
+    Compte les requêtes SQL de chaque requête HTTP, les enregistre par vue
+    (histogramme gameur_view_sql_queries), ajoute l'en-tête Server-Timing et vérifie
+    le budget de la vue. Fonctionne en WSGI comme en ASGI: les requêtes ORM des vues
+    async, exécutées dans un autre thread, sont comptées via la contextvar.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        counter = QueryCounter()
+        with count_queries(counter):
+            response = self.get_response(request)
+        return self.process_counter(request, response, counter)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        with count_queries(counter):
+            response = await self.get_response(request)
+        return self.process_counter(request, response, counter)
+
+    def process_counter(self, request, response, counter):
+        view_name = _view_name(request)
+        VIEW_QUERY_COUNT.labels(view_name).observe(counter.count)
+
+        timing = f'db;dur={counter.duration * 1000:.1f};desc="{counter.count} SQL queries"'
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+
+        budget = _view_budget(request)
+        if budget is not None and counter.count > budget:
+            offenders = '\n'.join(
+                f'  {count}x {duration * 1000:.1f}ms {sql}' for sql, count, duration in counter.worst_offenders()
+            )
+            message = f"Budget SQL dépassé pour {view_name}: {counter.count} requêtes (budget {budget})\n{offenders}"
+            if getattr(settings, 'SQL_QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            print(message)
+        return response
+
+
+class AdmissionControlMiddleware:
+    """
+    Délestage: au-delà de ADMISSION_MAX_IN_FLIGHT requêtes en cours dans le process, répond
+    tout de suite 503 (Retry-After) au lieu d'empiler des requêtes qui expireraient toutes
+    côté client. Les chemins ADMISSION_EXEMPT_PATHS (/metrics...) ne sont ni comptés ni refusés.
+    Une réponse en flux (export) n'est plus comptée une fois ses en-têtes renvoyés.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def admit(self, request):
+        """
+        True si la requête est admise (et comptée jusqu'à release()), False si elle est délestée,
+        None si elle n'est pas soumise au délestage.
+        """
+        limit = settings.ADMISSION_MAX_IN_FLIGHT
+        if not limit or request.path.startswith(tuple(settings.ADMISSION_EXEMPT_PATHS)):
+            return None
+        with self._lock:
+            if self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+        REQUESTS_IN_FLIGHT.inc()
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        REQUESTS_IN_FLIGHT.dec()
+
+    def shed(self, request):
+        REQUESTS_SHED.inc()
+        response = ApiResponse({'detail': 'Server overloaded, retry later.'}, request, status=503)
+        response['Retry-After'] = str(settings.ADMISSION_RETRY_AFTER)
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        admitted = self.admit(request)
+        if admitted is False:
+            return self.shed(request)
+        try:
+            return self.get_response(request)
+        finally:
+            if admitted:
+                self.release()
+
+    async def __acall__(self, request):
+        admitted = self.admit(request)
+        if admitted is False:
+            return self.shed(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            if admitted:
+                self.release()
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameur', '0002_gamer_auth0_id_alter_game_icon_alter_game_name_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gamer',
+            index=models.Index(fields=['-points', 'id'], include=('pseudo', 'avatar', 'level', 'created_at'), name='gamer_points_id_idx'),
+        ),
+    ]
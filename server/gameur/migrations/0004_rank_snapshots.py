@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameur', '0003_gamer_points_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('total_players', models.IntegerField(default=0)),
+                ('is_active', models.BooleanField(default=False)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='rank_snapshot_single_active')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GamerRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.IntegerField()),
+                ('points', models.IntegerField()),
+                ('gamer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gameur.gamer')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ranks', to='gameur.ranksnapshot')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('snapshot', 'gamer'), name='gamer_rank_snapshot_gamer_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameur', '0004_rank_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointIncrement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=255)),
+                ('delta', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('applied_at', models.DateTimeField(blank=True, null=True)),
+                ('gamer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gameur.gamer')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('applied_at__isnull', True)), fields=['id'], name='point_increment_pending_idx')],
+                'constraints': [models.UniqueConstraint(fields=('gamer', 'idempotency_key'), name='point_increment_key_uniq')],
+            },
+        ),
+    ]
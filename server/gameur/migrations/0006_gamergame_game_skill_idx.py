@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameur', '0005_point_increments'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gamergame',
+            index=models.Index(fields=['game', '-skill_level', '-hours_played', 'id'], name='gamergame_game_skill_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameur', '0006_gamergame_game_skill_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='icon_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='gamer',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
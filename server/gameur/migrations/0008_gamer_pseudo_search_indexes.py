@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Index de recherche sur Gamer.pseudo (/api/gamers/search/), PostgreSQL uniquement:
+# - GIN pg_trgm sur lower(pseudo): recherche approchée (opérateurs % et %>) ;
+# - btree text_pattern_ops sur lower(pseudo): préfixes courts (LIKE 'ab%'),
+#   pour lesquels les trigrammes sont peu sélectifs.
+# Sur les autres bases la vue se rabat sur un icontains, sans index dédié.
+
+CREATE_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS gamer_pseudo_trgm_idx ON gameur_gamer USING gin (lower(pseudo) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS gamer_pseudo_prefix_idx ON gameur_gamer (lower(pseudo) text_pattern_ops)',
+]
+
+DROP_SQL = [
+    'DROP INDEX IF EXISTS gamer_pseudo_prefix_idx',
+    'DROP INDEX IF EXISTS gamer_pseudo_trgm_idx',
+]
+
+
+def _run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameur', '0007_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
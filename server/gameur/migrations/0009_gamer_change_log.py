@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameur', '0008_gamer_pseudo_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GamerChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('points', 'Points'), ('profile', 'Profil'), ('games', 'Jeux'), ('deleted', 'Suppression')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('gamer', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='gameur.gamer')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['gamer', 'id'], name='gamer_change_gamer_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Top games et favori dénormalisés sur Gamer (cf. gameur.top_games), remplis ici pour les
+# gamers existants. Logique recopiée (modèles historiques): pour un recalcul ultérieur,
+# utiliser `manage.py rebuild_top_games`.
+
+TOP_GAMES_COUNT = 3
+BATCH_SIZE = 2000
+
+
+def fill_top_games(apps, schema_editor):
+    Gamer = apps.get_model('gameur', 'Gamer')
+    GamerGame = apps.get_model('gameur', 'GamerGame')
+    last_id = 0
+    while True:
+        gamers = list(Gamer.objects.filter(id__gt=last_id).order_by('id').only('id')[:BATCH_SIZE])
+        if not gamers:
+            break
+        last_id = gamers[-1].id
+        stats = {gamer.id: [] for gamer in gamers}
+        rows = GamerGame.objects.filter(gamer_id__in=stats).values_list('gamer_id', 'game_id', 'hours_played')
+        for gamer_id, game_id, hours_played in rows:
+            stats[gamer_id].append((game_id, hours_played))
+        for gamer in gamers:
+            ranked = sorted(stats[gamer.id], key=lambda s: (-s[1], s[0]))[:TOP_GAMES_COUNT]
+            gamer.top_game_ids = [game_id for game_id, _ in ranked]
+            gamer.favorite_game_id = gamer.top_game_ids[0] if ranked else None
+        Gamer.objects.bulk_update(gamers, ['top_game_ids', 'favorite_game'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameur', '0009_gamer_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamer',
+            name='favorite_game',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gameur.game'),
+        ),
+        migrations.AddField(
+            model_name='gamer',
+            name='favorite_game_pinned',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='gamer',
+            name='top_game_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(fill_top_games, migrations.RunPython.noop),
+    ]
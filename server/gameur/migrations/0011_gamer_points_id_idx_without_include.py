@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameur', '0010_gamer_top_games'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='gamer',
+            name='gamer_points_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='gamer',
+            index=models.Index(fields=['-points', 'id'], name='gamer_points_id_idx'),
+        ),
+    ]
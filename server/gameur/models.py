@@ -4,10 +4,15 @@ from django.conf import settings # Importe settings pour référence future si b
 
 # Create your models here.
 
+# Nombre de jeux renvoyés par Gamer.top_games
+TOP_GAMES_COUNT = 3
+
 class Game(models.Model):
     name = models.CharField(max_length=100, unique=True) # Assure l'unicité du nom du jeu
     category = models.CharField(max_length=50)
     icon = models.ImageField(upload_to='games/', blank=True, null=True) # Rendre l'icône optionnelle
+    # Variantes WebP/JPEG de l'icône, générées par la tâche generate_image_variants (cf. gameur.images)
+    icon_variants = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return self.name
@@ -23,31 +28,42 @@ class Gamer(models.Model):
 
     pseudo = models.CharField(max_length=50, unique=True) # Assure l'unicité du pseudo
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True) # Rendre l'avatar optionnel
+    # Variantes WebP/JPEG de l'avatar, générées par la tâche generate_image_variants (cf. gameur.images)
+    avatar_variants = models.JSONField(default=dict, blank=True)
     level = models.IntegerField(default=1)
     points = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    # Tu peux ajouter un champ pour le rang si tu le stockes directement
-    # rank = models.IntegerField(default=0)
+    # Dénormalisés depuis GamerGame (cf. gameur.top_games), lus sans requête supplémentaire:
+    # id des TOP_GAMES_COUNT jeux les plus joués, et jeu favori (le plus joué, sauf s'il a
+    # été choisi par le joueur: favorite_game_pinned)
+    top_game_ids = models.JSONField(default=list, blank=True)
+    favorite_game = models.ForeignKey(Game, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    favorite_game_pinned = models.BooleanField(default=False)
+
+    # Le rang n'est pas stocké ici: il est matérialisé périodiquement dans GamerRank
+    # (voir gameur.ranking), ce qui évite d'écrire toute la table à chaque changement de points
+
+    class Meta:
+        indexes = [
+            # Classement paginé par curseur (points DESC, id): parcours de l'index puis lecture
+            # des lignes de la page. Pas d'INCLUDE: la sérialisation lit aussi les colonnes JSON
+            # (variantes, top games), un index couvrant dupliquerait presque toute la table
+            models.Index(fields=['-points', 'id'], name='gamer_points_id_idx'),
+        ]
 
     def __str__(self):
         return self.pseudo
 
-    # Propriété pour obtenir les jeux préférés (basé sur GamerGame)
-    # Tu peux définir la logique ici (ex: les 3 jeux avec le plus d'heures jouées)
+    # Jeux les plus joués (objets Game), dans l'ordre de top_game_ids.
+    # Renseignés par attach_games() pour une page de gamers: aucune requête
     @property
     def top_games(self):
-        # Exemple: retourne les 3 jeux avec le plus d'heures jouées
-        gamer_games = self.gamergame_set.order_by('-hours_played')[:3]
-        return [gg.game for gg in gamer_games] # Retourne les objets Game
-
-    # Propriété pour obtenir le jeu favori (basé sur GamerGame)
-    # Tu peux définir la logique ici (ex: le jeu avec le plus d'heures jouées ou le niveau de compétence le plus élevé)
-    @property
-    def favorite_game(self):
-        # Exemple: retourne le jeu avec le plus d'heures jouées
-        gamer_game = self.gamergame_set.order_by('-hours_played').first()
-        return gamer_game.game if gamer_game else None # Retourne l'objet Game ou None
+        games = getattr(self, '_top_games', None)
+        if games is None:
+            by_id = Game.objects.in_bulk(self.top_game_ids)
+            games = [by_id[game_id] for game_id in self.top_game_ids if game_id in by_id]
+        return games
 
 
 class GamerGame(models.Model):
@@ -64,6 +80,121 @@ class GamerGame(models.Model):
 
     class Meta:
         unique_together = ['gamer', 'game']
+        indexes = [
+            # Classement par jeu (/api/games/<id>/leaderboard/), id pour départager en keyset
+            models.Index(
+                fields=['game', '-skill_level', '-hours_played', 'id'],
+                name='gamergame_game_skill_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.gamer.pseudo} - {self.game.name}"
+
+
+def attach_games(gamers, games_by_id):
+    """
+    Renseigne top_games et favorite_game à partir de {id: Game} (index du catalogue,
+    cf. gameur.catalog), sans requête.
+    """
+    for gamer in gamers:
+        gamer._top_games = [games_by_id[game_id] for game_id in gamer.top_game_ids if game_id in games_by_id]
+        favorite = games_by_id.get(gamer.favorite_game_id)
+        if favorite is not None:
+            gamer.favorite_game = favorite
+
+
+class RankSnapshot(models.Model):
+    """
+    Classement matérialisé à un instant donné. Un seul snapshot est actif à la fois.
+    """
+    created_at = models.DateTimeField(auto_now_add=True)
+    total_players = models.IntegerField(default=0)
+    is_active = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['is_active'],
+                condition=models.Q(is_active=True),
+                name='rank_snapshot_single_active',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Snapshot {self.id} ({self.created_at:%Y-%m-%d %H:%M})"
+
+
+class GamerRank(models.Model):
+    """
+    Rang dense d'un gamer dans un snapshot (recherche indexée par (snapshot, gamer)).
+    """
+    snapshot = models.ForeignKey(RankSnapshot, on_delete=models.CASCADE, related_name='ranks')
+    gamer = models.ForeignKey(Gamer, on_delete=models.CASCADE, related_name='+')
+    rank = models.IntegerField()
+    points = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['snapshot', 'gamer'], name='gamer_rank_snapshot_gamer_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.gamer_id} #{self.rank}"
+
+
+class PointIncrement(models.Model):
+    """
+    Incrément de points en attente (write-behind), appliqué par lot par la tâche flush_point_increments.
+    La clé d'idempotence est conservée après application pour ignorer les rejeux du client.
+    """
+    gamer = models.ForeignKey(Gamer, on_delete=models.CASCADE, related_name='+')
+    idempotency_key = models.CharField(max_length=255)
+    delta = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    applied_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['gamer', 'idempotency_key'], name='point_increment_key_uniq'),
+        ]
+        indexes = [
+            # Seuls les incréments en attente sont parcourus par le flush
+            models.Index(fields=['id'], name='point_increment_pending_idx', condition=models.Q(applied_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.gamer_id} {self.delta:+d} ({self.idempotency_key})"
+
+
+class GamerChange(models.Model):
+    """
+    Journal (append-only) des modifications des gamers, lu par le flux /api/gamers/changes/.
+    Écrit dans la même transaction que la modification (signaux et chemins d'écriture en lot).
+    Pas de contrainte de clé étrangère: la suppression d'un gamer est elle-même journalisée.
+    """
+    POINTS = 'points'
+    PROFILE = 'profile'
+    GAMES = 'games'
+    DELETED = 'deleted'
+    KIND_CHOICES = [
+        (POINTS, 'Points'),
+        (PROFILE, 'Profil'),
+        (GAMES, 'Jeux'),
+        (DELETED, 'Suppression'),
+    ]
+
+    gamer = models.ForeignKey(
+        Gamer, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Compaction: entrées remplacées par une entrée plus récente du même gamer
+            models.Index(fields=['gamer', 'id'], name='gamer_change_gamer_id_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.gamer.pseudo} - {self.game.name}"
\ No newline at end of file
+        return f"#{self.id} {self.gamer_id} {self.kind}"
@@ -0,0 +1,133 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# Pagination par curseur (keyset) : au lieu d'un OFFSET qui oblige la base à
+# parcourir toutes les lignes précédentes, on filtre sur la dernière position
+# vue. Une page profonde coûte donc autant que la première, à condition qu'un
+# index corresponde à l'ordre de tri.
+
+class InvalidCursor(ValueError):
+    """
+    Levée quand un curseur ou une limite fournis par le client sont invalides.
+    """
+
+
+def parse_limit(request, default, maximum):
+    """
+    Lit le paramètre `limit` de la requête et le borne à `maximum`.
+    """
+    raw_limit = request.GET.get('limit')
+    if raw_limit in (None, ''):
+        return default
+    try:
+        limit = int(raw_limit)
+    except ValueError:
+        raise InvalidCursor('limit must be an integer.')
+    if limit < 1:
+        raise InvalidCursor('limit must be positive.')
+    return min(limit, maximum)
+
+
+def encode_cursor(values, reverse=False):
+    """
+    Encode une position (valeurs des champs de tri) en curseur opaque.
+    """
+    raw = json.dumps({'v': list(values), 'r': reverse}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """
+    Décode un curseur opaque. Retourne (valeurs, reverse).
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = data['v']
+        reverse = bool(data.get('r', False))
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor.')
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor('Invalid cursor.')
+    # Curseur fabriqué par le client: seules des valeurs scalaires peuvent être des positions
+    if any(isinstance(value, (bool, list, dict)) or value is None for value in values):
+        raise InvalidCursor('Invalid cursor.')
+    return values, reverse
+
+
+def _keyset_filter(ordering, values, reverse):
+    """
+    Construit le filtre "strictement après la position `values`" pour l'ordre donné.
+    Ex: ('-points', 'id') -> points < p OR (points = p AND id > i)
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        # En sens inverse (page précédente), toutes les comparaisons s'inversent
+        lookup = 'lt' if descending != reverse else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+def _page_queryset(queryset, ordering, cursor, limit):
+    """
+    Applique curseur, tri et limite (+1 ligne pour savoir s'il existe une page au-delà).
+    """
+    reverse = False
+    if cursor:
+        values, reverse = decode_cursor(cursor, len(ordering))
+        try:
+            queryset = queryset.filter(_keyset_filter(ordering, values, reverse))
+        except (ValueError, TypeError, ValidationError):
+            # Valeur d'un type incompatible avec le champ de tri (ex: 'abc' pour points)
+            raise InvalidCursor('Invalid cursor.')
+    queryset = queryset.order_by(*(_reverse_ordering(ordering) if reverse else ordering))
+    return queryset[:limit + 1], reverse
+
+
+def _page_result(items, ordering, cursor, limit, reverse):
+    names = [field.lstrip('-') for field in ordering]
+    has_more = len(items) > limit
+    items = items[:limit]
+    if reverse:
+        items.reverse()
+
+    def position(obj):
+        return [getattr(obj, name) for name in names]
+
+    next_cursor = prev_cursor = None
+    if items:
+        if has_more or reverse:
+            next_cursor = encode_cursor(position(items[-1]))
+        if cursor and (has_more or not reverse):
+            prev_cursor = encode_cursor(position(items[0]), reverse=True)
+    return items, next_cursor, prev_cursor
+
+
+def paginate_keyset(queryset, ordering, cursor=None, limit=50):
+    """
+    Retourne (objets de la page, curseur suivant, curseur précédent).
+    `ordering` doit désigner une clé unique (terminer par 'id' par exemple).
+    """
+    page, reverse = _page_queryset(queryset, ordering, cursor, limit)
+    return _page_result(list(page), ordering, cursor, limit, reverse)
+
+
+async def apaginate_keyset(queryset, ordering, cursor=None, limit=50):
+    """
+    Version async de paginate_keyset (ORM async de Django).
+    """
+    page, reverse = _page_queryset(queryset, ordering, cursor, limit)
+    return _page_result([obj async for obj in page], ordering, cursor, limit, reverse)
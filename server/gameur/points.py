@@ -0,0 +1,90 @@
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Min, Value, When
+from django.utils import timezone
+
+from .changes import change_log, record_gamer_changes
+from .models import Gamer, GamerChange, PointIncrement
+from .versions import bump_leaderboard_version_on_commit
+
+# Buffer write-behind des incréments de points.
+# L'API n'écrit qu'une ligne PointIncrement (insertion sans contention sur la ligne du
+# Gamer); la tâche flush_point_increments regroupe les deltas par gamer et les applique
+# en un seul UPDATE ... SET points = points + delta. L'application et le marquage des
+# incréments se font dans la même transaction: chaque incrément est appliqué une seule fois.
+
+
+class IdempotencyConflict(ValueError):
+    """
+    Clé d'idempotence déjà utilisée pour un delta différent.
+    """
+
+
+def record_increment(gamer_id, delta, idempotency_key):
+    """
+    Enregistre un incrément. Retourne (incrément, created); created vaut False pour un rejeu.
+    """
+    increment, created = PointIncrement.objects.get_or_create(
+        gamer_id=gamer_id,
+        idempotency_key=idempotency_key,
+        defaults={'delta': delta},
+    )
+    if not created and increment.delta != delta:
+        raise IdempotencyConflict(idempotency_key)
+    return increment, created
+
+
+def flush_point_increments(batch_size=None):
+    """
+    Applique un lot d'incréments en attente. Retourne le nombre d'incréments appliqués.
+    """
+    batch_size = batch_size or getattr(settings, 'POINTS_FLUSH_BATCH_SIZE', 1000)
+    with transaction.atomic(), change_log():
+        # skip_locked: deux flush concurrents se partagent les lignes au lieu de s'attendre
+        pending = list(
+            PointIncrement.objects.select_for_update(skip_locked=True)
+            .filter(applied_at__isnull=True)
+            .order_by('id')
+            .values_list('id', 'gamer_id', 'delta')[:batch_size]
+        )
+        if not pending:
+            return 0
+
+        totals = {}
+        for _, gamer_id, delta in pending:
+            totals[gamer_id] = totals.get(gamer_id, 0) + delta
+        totals = {gamer_id: delta for gamer_id, delta in totals.items() if delta}
+        if totals:
+            # Un seul UPDATE pour tout le lot, les gamers étant verrouillés dans l'ordre des id
+            Gamer.objects.filter(id__in=sorted(totals)).update(points=F('points') + Case(
+                *[When(id=gamer_id, then=Value(delta)) for gamer_id, delta in totals.items()],
+                default=Value(0),
+            ))
+            record_gamer_changes(totals, GamerChange.POINTS)
+            bump_leaderboard_version_on_commit()
+        PointIncrement.objects.filter(id__in=[row[0] for row in pending]).update(applied_at=timezone.now())
+    return len(pending)
+
+
+def purge_applied_increments():
+    """
+    Supprime les incréments appliqués dont la clé d'idempotence a expiré.
+    """
+    ttl = getattr(settings, 'POINTS_IDEMPOTENCY_TTL', 86400)
+    limit = timezone.now() - datetime.timedelta(seconds=ttl)
+    deleted, _ = PointIncrement.objects.filter(applied_at__lt=limit).delete()
+    return deleted
+
+
+def buffer_lag():
+    """
+    Retard du buffer: nombre d'incréments en attente et âge (secondes) du plus ancien.
+    """
+    stats = PointIncrement.objects.filter(applied_at__isnull=True).aggregate(
+        pending=Count('id'),
+        oldest=Min('created_at'),
+    )
+    lag = (timezone.now() - stats['oldest']).total_seconds() if stats['oldest'] else 0.0
+    return {'pending': stats['pending'], 'lag_seconds': lag}
@@ -0,0 +1,375 @@
+import asyncio
+import queue
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+from kombu import Connection, Exchange, Queue
+
+from .metrics import PUSH_CLIENT_RESYNCS, PUSH_CONNECTIONS
+from .models import Gamer
+from .ranking import get_ranks
+from .responses import encode
+
+# Push du classement en temps réel (Server-Sent Events sur PUSH_PATH), servi par
+# server_config/asgi.py hors de la pile Django: une connexion inactive ne coûte qu'une
+# coroutine et un petit tampon, ce qui permet des dizaines de milliers d'abonnés par process.
+# - après commit, les écritures publient les id des gamers modifiés sur un broker ;
+# - chaque process regroupe les changements reçus pendant PUSH_TICK_SECONDS, charge une seule
+#   fois l'état des gamers concernés et envoie le même message à tous ses abonnés ;
+# - un client lent (plus de PUSH_CLIENT_BUFFER messages en attente) perd ses messages en
+#   retard et reçoit `resync`: il recharge le classement au lieu de freiner les autres.
+# Événements: hello (à la connexion: charger le classement), changes (gamers modifiés,
+# rangs du snapshot), ranks (nouveau snapshot: recharger la page affichée), resync.
+
+PUSH_PATH = '/api/gamers/stream/'
+PUSH_FIELDS = ('id', 'pseudo', 'level', 'points')
+OUTBOX_SIZE = 10000
+
+
+def sse_frame(event, data):
+    return b'event: ' + event.encode() + b'\ndata: ' + encode(data) + b'\n\n'
+
+
+HELLO_FRAME = b'retry: 3000\n' + sse_frame('hello', {})
+RANKS_FRAME = sse_frame('ranks', {})
+RESYNC_FRAME = sse_frame('resync', {})
+HEARTBEAT_FRAME = b': ping\n\n'
+
+
+class InMemoryBroker:
+    """
+    Broker local au process (tests, développement): pas de partage entre workers.
+    """
+
+    def __init__(self, url=None):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def publish(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for entry in subscribers:
+            loop, callback = entry
+            try:
+                loop.call_soon_threadsafe(callback, message)
+            except RuntimeError:
+                # Boucle fermée: abonné disparu sans se désabonner
+                self._remove(entry)
+
+    def subscribe(self, callback):
+        """
+        À appeler depuis une boucle asyncio: `callback(message)` y sera exécuté.
+        Retourne la fonction de désabonnement.
+        """
+        entry = (asyncio.get_running_loop(), callback)
+        with self._lock:
+            self._subscribers.append(entry)
+        return lambda: self._remove(entry)
+
+    def _remove(self, entry):
+        with self._lock:
+            if entry in self._subscribers:
+                self._subscribers.remove(entry)
+
+
+class KombuBroker:
+    """
+    Exchange fanout sur le broker de celery (RabbitMQ), partagé par les process web et les
+    workers celery. Chaque hub consomme sa propre file exclusive (supprimée à la déconnexion).
+    Les publications partent d'un thread dédié: une écriture n'attend jamais le broker.
+    """
+
+    def __init__(self, url=None):
+        self.url = url or settings.CELERY_BROKER_URL
+        self.exchange = Exchange('gameur.leaderboard', type='fanout', durable=False)
+        self._outbox = queue.Queue(maxsize=OUTBOX_SIZE)
+        self._publisher = None
+        self._lock = threading.Lock()
+
+    def publish(self, message):
+        with self._lock:
+            if self._publisher is None:
+                self._publisher = threading.Thread(target=self._publish_loop, daemon=True, name='gameur-push-publisher')
+                self._publisher.start()
+        try:
+            self._outbox.put_nowait(message)
+        except queue.Full:
+            print("Push: file de publication pleine, message ignoré")
+
+    def _publish_loop(self):
+        message = self._outbox.get()
+        while True:
+            try:
+                with Connection(self.url, connect_timeout=2) as connection:
+                    producer = connection.Producer(serializer='json')
+                    while True:
+                        producer.publish(message, exchange=self.exchange, declare=[self.exchange])
+                        message = self._outbox.get()
+            except Exception as e:
+                # Message perdu: les abonnés le rattraperont au prochain changement ou resync
+                print(f"Push: publication impossible sur le broker: {e}")
+                time.sleep(1)
+                message = self._outbox.get()
+
+    def subscribe(self, callback):
+        loop = asyncio.get_running_loop()
+        stop = threading.Event()
+        threading.Thread(
+            target=self._consume, args=(loop, callback, stop), daemon=True, name='gameur-push-consumer',
+        ).start()
+        return stop.set
+
+    def _consume(self, loop, callback, stop):
+        queue_ = Queue(
+            f'gameur.leaderboard.{uuid.uuid4().hex}', exchange=self.exchange,
+            exclusive=True, auto_delete=True, durable=False,
+        )
+
+        def forward(body, message):
+            try:
+                loop.call_soon_threadsafe(callback, body)
+            except RuntimeError:
+                stop.set()
+
+        reconnecting = False
+        while not stop.is_set():
+            try:
+                with Connection(self.url, connect_timeout=2) as connection, \
+                        connection.Consumer(queue_, callbacks=[forward], no_ack=True):
+                    if reconnecting:
+                        # Messages perdus pendant la coupure: les clients rechargent le classement
+                        forward({'resync': True}, None)
+                        reconnecting = False
+                    while not stop.is_set():
+                        try:
+                            connection.drain_events(timeout=1)
+                        except socket.timeout:
+                            pass
+            except Exception as e:
+                if stop.is_set():
+                    break
+                print(f"Push: broker injoignable, nouvel essai: {e}")
+                reconnecting = True
+                stop.wait(2)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.PUSH_BROKER)(settings.PUSH_BROKER_URL)
+
+
+def _publish(message):
+    try:
+        get_broker().publish(message)
+    except Exception as e:
+        # Le push ne doit jamais faire échouer une écriture
+        print(f"Push: publication impossible: {e}")
+
+
+def publish_gamer_changes(gamer_ids):
+    _publish({'gamers': sorted(gamer_ids)})
+
+
+def publish_ranks_changed():
+    _publish({'ranks': True})
+
+
+def load_changes(gamer_ids):
+    """
+    État courant des gamers modifiés (rangs du snapshot actif) et id des gamers supprimés.
+    """
+    gamers = list(Gamer.objects.filter(id__in=gamer_ids).only(*PUSH_FIELDS).order_by('-points', 'id'))
+    ranks, total_players = get_ranks(gamers)
+    return {
+        'gamers': [
+            {
+                'id': gamer.id,
+                'pseudo': gamer.pseudo,
+                'level': gamer.level,
+                'points': gamer.points,
+                'rank': ranks.get(gamer.id),
+                'total_players': total_players,
+            }
+            for gamer in gamers
+        ],
+        'removed': sorted(set(gamer_ids) - {gamer.id for gamer in gamers}),
+    }
+
+
+def _load_changes(gamer_ids):
+    # La boucle du hub vit hors du cycle requête/réponse: sans request_started/finished,
+    # une connexion coupée (redémarrage de la base, CONN_MAX_AGE dépassé) ne serait jamais
+    # remplacée et chaque tick suivant échouerait
+    close_old_connections()
+    try:
+        return load_changes(gamer_ids)
+    finally:
+        close_old_connections()
+
+
+class Subscriber:
+    __slots__ = ('frames', 'wakeup', 'closed')
+
+    def __init__(self):
+        self.frames = deque()
+        self.wakeup = asyncio.Event()
+        self.closed = False
+
+    def offer(self, frame, limit):
+        if len(self.frames) >= limit:
+            # Client trop lent: ses messages en retard sont inutiles, il rechargera le classement
+            self.frames.clear()
+            self.frames.append(RESYNC_FRAME)
+            PUSH_CLIENT_RESYNCS.inc()
+        else:
+            self.frames.append(frame)
+        self.wakeup.set()
+
+
+class LeaderboardHub:
+    """
+    Abonnés d'un process et boucle de diffusion (démarrée avec le premier abonné,
+    arrêtée avec le dernier).
+    """
+
+    def __init__(self, broker=None):
+        self.broker = broker
+        self.subscribers = set()
+        self.pending = set()
+        self.ranks_changed = False
+        self._task = None
+
+    def connect(self):
+        subscriber = Subscriber()
+        self.subscribers.add(subscriber)
+        PUSH_CONNECTIONS.inc()
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return subscriber
+
+    def disconnect(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+            PUSH_CONNECTIONS.dec()
+
+    def receive(self, message):
+        # Exécuté dans la boucle du hub: le broker y renvoie ses messages
+        self.pending.update(message.get('gamers', ()))
+        if message.get('ranks'):
+            self.ranks_changed = True
+        if message.get('resync'):
+            self.broadcast(RESYNC_FRAME)
+
+    def broadcast(self, frame):
+        limit = settings.PUSH_CLIENT_BUFFER
+        for subscriber in self.subscribers:
+            subscriber.offer(frame, limit)
+
+    async def run(self):
+        unsubscribe = (self.broker or get_broker()).subscribe(self.receive)
+        last_sent = time.monotonic()
+        try:
+            while self.subscribers:
+                await asyncio.sleep(settings.PUSH_TICK_SECONDS)
+                frames = []
+                if self.pending:
+                    gamer_ids, self.pending = self.pending, set()
+                    frames.append(await self.changes_frame(gamer_ids))
+                if self.ranks_changed:
+                    self.ranks_changed = False
+                    frames.append(RANKS_FRAME)
+                if not frames and time.monotonic() - last_sent >= settings.PUSH_HEARTBEAT_SECONDS:
+                    # Garde les connexions ouvertes à travers les proxys
+                    frames.append(HEARTBEAT_FRAME)
+                if frames:
+                    last_sent = time.monotonic()
+                    self.broadcast(b''.join(frames))
+        finally:
+            unsubscribe()
+            self._task = None
+
+    async def changes_frame(self, gamer_ids):
+        try:
+            return sse_frame('changes', await sync_to_async(_load_changes)(gamer_ids))
+        except Exception as e:
+            print(f"Push: chargement des changements impossible, resync des clients: {e}")
+            return RESYNC_FRAME
+
+
+class LeaderboardStreamApp:
+    """
+    Application ASGI: sert PUSH_PATH en SSE et délègue tout le reste à `application` (Django).
+    """
+
+    def __init__(self, application, hub=None):
+        self.application = application
+        self.hub = hub or LeaderboardHub()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != PUSH_PATH:
+            return await self.application(scope, receive, send)
+        if scope['method'] != 'GET':
+            return await self.reject(send, 405, 'Method not allowed.', [(b'allow', b'GET')])
+        if len(self.hub.subscribers) >= settings.PUSH_MAX_CONNECTIONS:
+            return await self.reject(send, 503, 'Too many connections.', [(b'retry-after', b'5')])
+        await self.stream(scope, receive, send)
+
+    async def reject(self, send, status, detail, headers):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), *headers],
+        })
+        await send({'type': 'http.response.body', 'body': encode({'detail': detail})})
+
+    def headers(self, scope):
+        headers = [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache, no-transform'),
+            (b'x-accel-buffering', b'no'),
+        ]
+        # La pile Django (django-cors-headers) n'est pas traversée
+        origin = dict(scope['headers']).get(b'origin', b'').decode('latin-1')
+        if origin in settings.CORS_ALLOWED_ORIGINS:
+            headers += [
+                (b'access-control-allow-origin', origin.encode('latin-1')),
+                (b'access-control-allow-credentials', b'true'),
+                (b'vary', b'Origin'),
+            ]
+        return headers
+
+    async def stream(self, scope, receive, send):
+        subscriber = self.hub.connect()
+        listener = asyncio.ensure_future(self.wait_disconnect(receive, subscriber))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': self.headers(scope)})
+            await send({'type': 'http.response.body', 'body': HELLO_FRAME, 'more_body': True})
+            while True:
+                await subscriber.wakeup.wait()
+                if subscriber.closed:
+                    break
+                subscriber.wakeup.clear()
+                body = b''.join(subscriber.frames)
+                subscriber.frames.clear()
+                # Attend que le client lise (contrôle de flux du serveur ASGI): pendant ce
+                # temps son tampon se remplit, jusqu'au resync
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        except OSError:
+            pass  # Client parti pendant un envoi
+        finally:
+            self.hub.disconnect(subscriber)
+            listener.cancel()
+
+    async def wait_disconnect(self, receive, subscriber):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscriber.closed = True
+        subscriber.wakeup.set()
@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from .models import Gamer, GamerRank, RankSnapshot
+from .versions import bump_leaderboard_version_on_commit
+
+# Rangs denses (DENSE_RANK: deux gamers à égalité de points ont le même rang).
+# Un snapshot est construit hors ligne par la tâche Celery refresh_rank_snapshot;
+# les vues ne font ensuite qu'une recherche indexée sur (snapshot, gamer).
+
+SNAPSHOT_LOCK_KEY = 'gameur:rank-snapshot:lock'
+
+
+def build_rank_snapshot():
+    """
+    Matérialise le classement courant dans un nouveau snapshot, puis l'active
+    atomiquement. Retourne le snapshot, ou None si une construction est déjà en cours.
+    """
+    # Évite deux constructions concurrentes (beat + lancement manuel par exemple)
+    if not cache.add(SNAPSHOT_LOCK_KEY, 1, 30 * 60):
+        return None
+    try:
+        snapshot = RankSnapshot.objects.create()
+        with connection.cursor() as cursor:
+            # Une seule requête ensembliste, quel que soit le nombre de gamers
+            cursor.execute(
+                f'INSERT INTO {GamerRank._meta.db_table} (snapshot_id, gamer_id, rank, points) '
+                f'SELECT %s, id, DENSE_RANK() OVER (ORDER BY points DESC), points FROM {Gamer._meta.db_table}',
+                [snapshot.id],
+            )
+            total_players = cursor.rowcount
+
+        with transaction.atomic():
+            previous = list(RankSnapshot.objects.select_for_update().filter(is_active=True).values_list('id', flat=True))
+            RankSnapshot.objects.filter(id__in=previous).update(is_active=False)
+            RankSnapshot.objects.filter(id=snapshot.id).update(is_active=True, total_players=total_players)
+            # Les rangs font partie des réponses: les ETag doivent changer avec le snapshot
+            bump_leaderboard_version_on_commit()
+
+        # Les anciens snapshots (et les builds abandonnés) sont supprimés après la bascule
+        RankSnapshot.objects.filter(is_active=False).delete()
+        snapshot.is_active = True
+        snapshot.total_players = total_players
+        return snapshot
+    finally:
+        cache.delete(SNAPSHOT_LOCK_KEY)
+
+
+def _live_ranks(gamers):
+    """
+    Fallback sans snapshot: rang = nombre de scores distincts strictement supérieurs + 1.
+    Un seul agrégat pour toute la page (le filtre `points > min` s'appuie sur l'index).
+    """
+    points = {gamer.points for gamer in gamers}
+    counts = Gamer.objects.filter(points__gt=min(points)).aggregate(**{
+        f'above_{index}': Count('points', distinct=True, filter=Q(points__gt=value))
+        for index, value in enumerate(points)
+    })
+    above = {value: counts[f'above_{index}'] for index, value in enumerate(points)}
+    return {gamer.id: above[gamer.points] + 1 for gamer in gamers}
+
+
+def get_ranks(gamers):
+    """
+    Retourne ({gamer_id: rang}, total_players) pour une liste de gamers,
+    en un nombre constant de requêtes.
+    """
+    gamers = list(gamers)
+    if not gamers:
+        return {}, 0
+    rows = GamerRank.objects.filter(
+        snapshot__is_active=True,
+        gamer_id__in=[gamer.id for gamer in gamers],
+    ).values_list('gamer_id', 'rank', 'snapshot__total_players')
+    ranks = {}
+    total_players = None
+    for gamer_id, rank, snapshot_total in rows:
+        ranks[gamer_id] = rank
+        total_players = snapshot_total
+
+    # Gamers absents du snapshot (pas encore de snapshot, ou inscrits depuis)
+    missing = [gamer for gamer in gamers if gamer.id not in ranks]
+    if missing:
+        ranks.update(_live_ranks(missing))
+        total_players = Gamer.objects.count()
+    return ranks, total_players
+
+
+def attach_ranks(gamers):
+    """
+    Renseigne gamer.rank_info = (rang, total_players) pour la sérialisation.
+    """
+    ranks, total_players = get_ranks(gamers)
+    for gamer in gamers:
+        gamer.rank_info = (ranks.get(gamer.id), total_players)
@@ -0,0 +1,153 @@
+import hashlib
+import ipaddress
+import math
+import time
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import RATE_LIMITED
+from .responses import ApiResponse
+
+# Limitation de débit des vues authentifiées (auth0_required), état partagé entre workers
+# dans le cache Django RATELIMIT_CACHE (LocMem par défaut: limites par process seulement).
+# - seau de N jetons rempli en une période ('120/m'), par IP puis par `sub` Auth0 ;
+# - l'IP est vérifiée avant toute lecture du token, le `sub` juste après sa validation
+#   (gratuite pour un token déjà vu) et avant la moindre requête SQL ;
+# - GCRA: un seau = un entier (instant théorique d'arrivée, en ms) avancé par incr(),
+#   atomique sur les backends partagés; une requête refusée rend son jeton ;
+# - RATELIMIT_SUB_RATE / RATELIMIT_IP_RATE sont partagées par toutes les vues,
+#   @rate_limit(sub=..., ip=...) donne à une vue ses propres seaux ;
+# - cache injoignable: la requête passe, la limitation ne doit pas couper l'API.
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    '120/m' -> (120, 60): capacité du seau et période (s) pour le remplir. Vide: pas de limite.
+    """
+    if not rate:
+        return None
+    count, _, period = rate.partition('/')
+    if period not in PERIODS or not count.isdigit() or int(count) < 1:
+        raise ValueError(f'Invalid rate {rate!r}, expected "<count>/<s|m|h|d>".')
+    return int(count), PERIODS[period]
+
+
+def rate_limit(sub=None, ip=None):
+    """
+    Décorateur de vue: limites propres à la vue, à la place des limites par défaut.
+    Peut être placé au-dessus de auth0_required: functools.wraps recopie l'attribut.
+    """
+    parse_rate(sub), parse_rate(ip)  # Erreur de syntaxe dès l'import du module de vues
+
+    def decorator(view_func):
+        view_func.rate_limits = {'sub': sub, 'ip': ip}
+        return view_func
+    return decorator
+
+
+@lru_cache(maxsize=None)
+def _trusted_networks(proxies):
+    return tuple(ipaddress.ip_network(proxy, strict=False) for proxy in proxies)
+
+
+def _is_trusted_proxy(address):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks(tuple(settings.RATELIMIT_TRUSTED_PROXIES)))
+
+
+def client_ip(request):
+    """
+    IP du client. Derrière nginx, REMOTE_ADDR est celle du proxy (cf. proxy_set_header
+    X-Real-IP): l'en-tête RATELIMIT_CLIENT_IP_HEADER n'est lu que si la requête vient
+    d'un proxy de RATELIMIT_TRUSTED_PROXIES, sinon n'importe quel client pourrait le
+    falsifier pour changer de seau à chaque requête.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR', '')
+    header = settings.RATELIMIT_CLIENT_IP_HEADER
+    if header and _is_trusted_proxy(remote_addr):
+        return request.META.get(header) or remote_addr
+    return remote_addr
+
+
+def _view_limit(request, scope):
+    """
+    ((capacité, période), nom du seau) pour la vue de la requête.
+    """
+    match = getattr(request, 'resolver_match', None)
+    rate = getattr(match.func, 'rate_limits', {}).get(scope) if match else None
+    if rate:
+        return parse_rate(rate), match.view_name
+    return parse_rate(getattr(settings, f'RATELIMIT_{scope.upper()}_RATE')), 'default'
+
+
+def acquire(key, capacity, period):
+    """
+    Prend un jeton du seau `key`. Retourne 0 si la requête passe, sinon le délai (s)
+    avant le prochain jeton.
+    """
+    cache = caches[settings.RATELIMIT_CACHE]
+    interval = max(1, period * 1000 // capacity)
+    # Une période sans requête remplit le seau: sa clé peut alors expirer
+    timeout = period + 1
+    now = int(time.time() * 1000)
+    try:
+        arrival = cache.incr(key, interval)
+    except ValueError:
+        arrival = None
+    if arrival is None or arrival - interval < now:
+        # Seau plein (inactif ou absent): repart de maintenant
+        arrival = now + interval
+        cache.set(key, arrival, timeout)
+    else:
+        cache.touch(key, timeout)
+    excess = arrival - now - capacity * interval
+    if excess > 0:
+        cache.decr(key, interval)
+        return excess / 1000
+    return 0
+
+
+def _check(request, scope, identity):
+    """
+    Réponse 429 (avec Retry-After) si la limite `scope` de la vue est atteinte, None sinon.
+    """
+    if not settings.RATELIMIT_ENABLED:
+        return None
+    limit, bucket = _view_limit(request, scope)
+    if limit is None:
+        return None
+    key = f'gameur:ratelimit:{scope}:{bucket}:' + hashlib.sha256(identity.encode()).hexdigest()[:32]
+    try:
+        retry_after = acquire(key, *limit)
+    except Exception as e:
+        print(f"Limitation de débit indisponible, requête acceptée: {e}")
+        return None
+    if not retry_after:
+        return None
+    RATE_LIMITED.labels(scope, bucket).inc()
+    response = ApiResponse({'detail': 'Too many requests.'}, request, status=429)
+    response['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+
+def check_ip_limit(request):
+    return _check(request, 'ip', client_ip(request))
+
+
+def check_sub_limit(request, sub):
+    return _check(request, 'sub', sub)
+
+
+# Versions async: l'aller-retour vers le cache (réseau) ne bloque pas la boucle d'événements,
+# et sans thread_sensitive n'attend pas le thread des vues sync
+acheck_ip_limit = sync_to_async(check_ip_limit, thread_sensitive=False)
+acheck_sub_limit = sync_to_async(check_sub_limit, thread_sensitive=False)
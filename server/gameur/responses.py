@@ -0,0 +1,42 @@
+import msgpack
+import orjson
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+# Réponses des vues de l'API (remplace JsonResponse):
+# - JSON encodé par orjson (en C): datetimes, UUID, etc. sérialisés nativement, sans
+#   passer par isoformat() en Python ni par DjangoJSONEncoder ;
+# - MessagePack si le client le préfère dans son en-tête Accept (datetimes en
+#   extension Timestamp). Les clés int (variantes d'images...) sont acceptées.
+
+JSON_CONTENT_TYPE = 'application/json'
+MSGPACK_CONTENT_TYPE = 'application/msgpack'
+MEDIA_TYPES = [JSON_CONTENT_TYPE, MSGPACK_CONTENT_TYPE]
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def negotiate(request):
+    """
+    Type de réponse demandé par le client: JSON par défaut (Accept absent, */* ou inconnu).
+    """
+    return request.get_preferred_type(MEDIA_TYPES) or JSON_CONTENT_TYPE
+
+
+def encode(data, media_type=JSON_CONTENT_TYPE):
+    if media_type == MSGPACK_CONTENT_TYPE:
+        return msgpack.packb(data, datetime=True)
+    return orjson.dumps(data, option=ORJSON_OPTIONS)
+
+
+class ApiResponse(HttpResponse):
+    """
+    Réponse encodée selon `negotiate(request)`. Sans `request`, toujours en JSON.
+    """
+
+    def __init__(self, data, request=None, **kwargs):
+        media_type = negotiate(request) if request is not None else JSON_CONTENT_TYPE
+        kwargs.setdefault('content_type', media_type)
+        super().__init__(encode(data, media_type), **kwargs)
+        if request is not None:
+            patch_vary_headers(self, ('Accept',))
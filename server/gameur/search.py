@@ -0,0 +1,42 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Lower
+
+from .models import Gamer
+
+# Recherche de gamers par pseudo (autocomplétion):
+# les pseudos qui commencent par la saisie d'abord, puis (PostgreSQL, saisie de
+# 3 caractères ou plus) les pseudos approchants au sens des trigrammes (pg_trgm).
+# Les index sont créés par la migration 0008_gamer_pseudo_search_indexes.
+
+SEARCH_FIELDS = ('id', 'pseudo', 'avatar', 'avatar_variants', 'level', 'points')
+TRIGRAM_MIN_LENGTH = 3
+
+
+def normalize_query(q):
+    return ' '.join((q or '').split()).lower()[:50]
+
+
+def search_gamers(q, limit):
+    """
+    Retourne au plus `limit` gamers (champs de SEARCH_FIELDS uniquement) pour la saisie `q` normalisée.
+    """
+    queryset = Gamer.objects.only(*SEARCH_FIELDS).annotate(
+        pseudo_lower=Lower('pseudo'),
+        is_prefix=Case(When(pseudo__istartswith=q, then=Value(1)), default=Value(0), output_field=IntegerField()),
+    )
+    if connection.vendor == 'postgresql' and len(q) >= TRIGRAM_MIN_LENGTH:
+        # `lower(pseudo) %> q` utilise l'index GIN gamer_pseudo_trgm_idx
+        matches = queryset.filter(pseudo_lower__startswith=q) | queryset.filter(pseudo_lower__trigram_word_similar=q)
+        ordering = ('-is_prefix', '-similarity', '-points', 'id')
+        matches = matches.annotate(similarity=TrigramWordSimilarity(q, 'pseudo_lower'))
+    elif connection.vendor == 'postgresql':
+        # Préfixe court: LIKE 'q%' sur lower(pseudo), servi par gamer_pseudo_prefix_idx
+        matches = queryset.filter(pseudo_lower__startswith=q)
+        ordering = ('-points', 'id')
+    else:
+        # Autres bases (SQLite en développement): simple icontains
+        matches = queryset.filter(pseudo__icontains=q)
+        ordering = ('-is_prefix', '-points', 'id')
+    return list(matches.order_by(*ordering)[:limit])
@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .changes import record_gamer_changes
+from .identity import invalidate_identity
+from .images import variants_are_current
+from .middleware import install_query_counter
+from .models import Game, Gamer, GamerChange, GamerGame
+from .tasks import generate_image_variants
+from .top_games import refresh_top_games
+from .versions import (
+    bump_game_catalog_version,
+    bump_game_leaderboard_versions_on_commit,
+    bump_leaderboard_version_on_commit,
+)
+
+User = get_user_model()
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    # Comptage des requêtes SQL par requête HTTP (QueryCountMiddleware), dans tous les threads
+    install_query_counter(connection)
+
+
+@receiver(post_delete, sender=Gamer)
+def gamer_deleted(sender, instance, **kwargs):
+    # Le mapping sub -> (user_id, gamer_id) ne doit plus pointer vers ce profil
+    invalidate_identity(sub=instance.auth0_id, user_id=instance.user_id)
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    # Le cache partagé est indexé par sub: le lire tant que le Gamer existe (la cascade
+    # le supprime avant le User)
+    instance._identity_sub = Gamer.objects.filter(user_id=instance.pk).values_list('auth0_id', flat=True).first()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_identity(sub=getattr(instance, '_identity_sub', None), user_id=instance.pk)
+
+
+@receiver(post_save, sender=Gamer)
+@receiver(post_delete, sender=Gamer)
+@receiver(post_save, sender=GamerGame)
+@receiver(post_delete, sender=GamerGame)
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def leaderboard_changed(sender, **kwargs):
+    # Invalide les ETag du classement et des profils (un renommage de jeu change topGames)
+    bump_leaderboard_version_on_commit()
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def game_catalog_changed(sender, **kwargs):
+    # Recharge l'index du catalogue dans chaque process (gameur.catalog): tout de suite, puis
+    # après commit pour qu'un rechargement pendant la transaction ne reste pas en place
+    bump_game_catalog_version()
+    transaction.on_commit(bump_game_catalog_version)
+
+
+@receiver(post_save, sender=GamerGame)
+@receiver(post_delete, sender=GamerGame)
+def game_leaderboard_changed(sender, instance, **kwargs):
+    # Invalide la première page en cache du classement de ce jeu
+    bump_game_leaderboard_versions_on_commit([instance.game_id])
+
+
+@receiver(post_save, sender=Gamer)
+@receiver(post_delete, sender=Gamer)
+@receiver(post_save, sender=GamerGame)
+@receiver(post_delete, sender=GamerGame)
+def gamer_changed(sender, instance, **kwargs):
+    # Journal du flux /api/gamers/changes/, écrit dans la transaction de la modification
+    if sender is GamerGame:
+        record_gamer_changes([instance.gamer_id], GamerChange.GAMES)
+    elif 'created' in kwargs:
+        record_gamer_changes([instance.pk], GamerChange.PROFILE)
+    else:
+        record_gamer_changes([instance.pk], GamerChange.DELETED)
+
+
+@receiver(post_save, sender=GamerGame)
+@receiver(post_delete, sender=GamerGame)
+def top_games_changed(sender, instance, **kwargs):
+    # Maintient Gamer.top_game_ids / favorite_game (les écritures en lot appellent update_top_games)
+    refresh_top_games([instance.gamer_id])
+
+
+@receiver(post_save, sender=Gamer)
+@receiver(post_save, sender=Game)
+def image_uploaded(sender, instance, **kwargs):
+    # Nouvelle image (avatar ou icône): génération des variantes en tâche de fond
+    field_name = 'avatar' if sender is Gamer else 'icon'
+    field_file = getattr(instance, field_name)
+    if field_file and not variants_are_current(field_file, getattr(instance, f'{field_name}_variants')):
+        model_name = sender._meta.model_name
+        transaction.on_commit(lambda: generate_image_variants.delay(model_name, instance.pk, field_name))
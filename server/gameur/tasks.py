@@ -0,0 +1,75 @@
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+
+from .changes import compact_change_log
+from .images import generate_variants
+from .models import Game
+from .points import buffer_lag, flush_point_increments, purge_applied_increments
+from .push import publish_ranks_changed
+from .ranking import build_rank_snapshot
+from .versions import bump_game_catalog_version, bump_leaderboard_version_on_commit
+
+
+@shared_task(ignore_result=True)
+def refresh_rank_snapshot():
+    """
+    Tâche périodique (celery beat): recalcule le snapshot des rangs.
+    """
+    snapshot = build_rank_snapshot()
+    if snapshot is None:
+        print("Snapshot des rangs déjà en cours de construction, tâche ignorée")
+    else:
+        # Les rangs de tous les gamers ont pu changer: les pages affichées sont rechargées
+        publish_ranks_changed()
+        print(f"Snapshot des rangs {snapshot.id} activé ({snapshot.total_players} joueurs)")
+
+
+@shared_task(ignore_result=True)
+def flush_point_increments_task():
+    """
+    Tâche périodique: applique les incréments de points en attente, lot par lot.
+    """
+    batch_size = getattr(settings, 'POINTS_FLUSH_BATCH_SIZE', 1000)
+    applied = 0
+    while True:
+        count = flush_point_increments(batch_size)
+        applied += count
+        if count < batch_size:
+            break
+    purged = purge_applied_increments()
+    lag = buffer_lag()
+    print(f"Flush des points: {applied} incréments appliqués, {purged} clés expirées supprimées, "
+          f"{lag['pending']} en attente (retard {lag['lag_seconds']:.1f}s)")
+
+
+@shared_task(ignore_result=True)
+def compact_change_log_task():
+    """
+    Tâche périodique: compacte le journal du flux /api/gamers/changes/.
+    """
+    superseded, expired = compact_change_log()
+    print(f"Journal des changements compacté: {superseded} entrées remplacées, {expired} expirées supprimées")
+
+
+@shared_task(ignore_result=True)
+def generate_image_variants(model_name, pk, field_name):
+    """
+    Génère les variantes d'une image envoyée (ex: ('gamer', 1, 'avatar')) et les enregistre.
+    """
+    model = apps.get_model('gameur', model_name)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not getattr(instance, field_name):
+        return
+    field_file = getattr(instance, field_name)
+    variants = generate_variants(field_file)
+    with transaction.atomic():
+        # N'écrit que si l'image n'a pas changé pendant la génération (update() ne déclenche pas post_save)
+        updated = model.objects.filter(pk=pk, **{field_name: field_file.name}).update(**{f'{field_name}_variants': variants})
+        if updated:
+            bump_leaderboard_version_on_commit()
+            if model is Game:
+                # Icônes servies par l'index du catalogue (gameur.catalog)
+                transaction.on_commit(bump_game_catalog_version)
+    print(f"Variantes générées pour {model_name} {pk} ({field_name}): {len(variants['webp'])} tailles")
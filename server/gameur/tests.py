@@ -1,3 +1,1291 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import jwt
+import msgpack
+from asgiref.sync import async_to_sync, sync_to_async
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections
+from django.db.models.signals import post_delete
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+from PIL import Image
+from prometheus_client import REGISTRY
+
+from .auth_utils import serialize_gamers, validate_auth0_token
+from . import db_router, signals
+from .export import CSV_COLUMNS
+from .identity import _cache_key as _identity_cache_key, local_identity_cache
+from .jwks import JWKSKeyManager
+from .middleware import AdmissionControlMiddleware, QueryBudgetExceeded, normalize_sql, query_budget
+from .catalog import get_catalog
+from .changes import compact_change_log, record_gamer_changes
+from .management.commands.import_gamer_stats import OrmStatsLoader, PostgresStatsLoader
+from .models import Game, Gamer, GamerChange, GamerGame, PointIncrement, RankSnapshot
+from .pagination import encode_cursor
+from .push import PUSH_PATH, RESYNC_FRAME, LeaderboardHub, LeaderboardStreamApp, Subscriber, load_changes
+from .points import buffer_lag, flush_point_increments
+from .ranking import build_rank_snapshot, get_ranks
+from .ratelimit import client_ip
+from .tasks import generate_image_variants
+from .token_cache import VerifiedTokenCache
+
+User = get_user_model()
+
+
+def create_gamer(index, points=0, games=()):
+    """
+    Crée un User + Gamer, avec des GamerGame pour les (jeu, heures) donnés.
+    """
+    user = User.objects.create(username=f'user{index}')
+    gamer = Gamer.objects.create(user=user, pseudo=f'gamer{index}', points=points)
+    for game, hours in games:
+        GamerGame.objects.create(gamer=gamer, game=game, skill_level=1, hours_played=hours)
+    return gamer
+
+
+class SerializeGamersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.games = [Game.objects.create(name=f'Game {i}', category='FPS') for i in range(5)]
+
+    def setUp(self):
+        self.request = RequestFactory().get('/api/gamers/')
+
+    def add_gamers(self, start, count):
+        for i in range(start, start + count):
+            create_gamer(i, points=i, games=[(game, i + h) for h, game in enumerate(self.games)])
+
+    def count_queries(self):
+        get_catalog()  # Index des jeux chargé une fois par process, hors mesure
+        with CaptureQueriesContext(connection) as ctx:
+            serialize_gamers(Gamer.objects.order_by('-points'), self.request)
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_constant(self):
+        self.add_gamers(0, 2)
+        build_rank_snapshot()
+        small = self.count_queries()
+        self.add_gamers(2, 20)
+        build_rank_snapshot()
+        self.assertEqual(self.count_queries(), small)
+        self.assertEqual(small, 2)
+
+    def test_top_games_match_properties(self):
+        self.add_gamers(0, 3)
+        data = serialize_gamers(Gamer.objects.order_by('id'), self.request)
+        for gamer, gamer_data in zip(Gamer.objects.order_by('id'), data):
+            self.assertEqual(gamer_data['topGames'], [game.name for game in gamer.top_games])
+            self.assertEqual(gamer_data['favoriteGame'], gamer.favorite_game.name)
+        self.assertEqual(data[0]['topGames'], ['Game 4', 'Game 3', 'Game 2'])
+
+    def test_gamer_without_games(self):
+        create_gamer(0)
+        data = serialize_gamers(Gamer.objects.all(), self.request)
+        self.assertEqual(data[0]['topGames'], [])
+        self.assertIsNone(data[0]['favoriteGame'])
+
+
+class RankingTests(TestCase):
+    def setUp(self):
+        self.gamers = [create_gamer(i, points=points) for i, points in enumerate([50, 30, 30, 10])]
+
+    def test_snapshot_dense_ranks(self):
+        snapshot = build_rank_snapshot()
+        self.assertEqual(snapshot.total_players, 4)
+        ranks, total = get_ranks(self.gamers)
+        self.assertEqual([ranks[gamer.id] for gamer in self.gamers], [1, 2, 2, 3])
+        self.assertEqual(total, 4)
+
+        # Nouveau snapshot: l'ancien est désactivé puis supprimé
+        build_rank_snapshot()
+        self.assertEqual(list(RankSnapshot.objects.values_list('is_active', flat=True)), [True])
+
+    def test_live_fallback_matches_snapshot(self):
+        live = get_ranks(self.gamers)
+        build_rank_snapshot()
+        self.assertEqual(get_ranks(self.gamers), live)
+
+        # Un gamer inscrit après le snapshot est classé en direct
+        late = create_gamer(9, points=40)
+        ranks, total = get_ranks([late])
+        self.assertEqual(ranks[late.id], 2)
+        self.assertEqual(total, 5)
+
+
+class VerifiedTokenCacheTests(SimpleTestCase):
+    def test_hit_and_miss_counters(self):
+        cache = VerifiedTokenCache(maxsize=10)
+        self.assertIsNone(cache.get('token'))
+        cache.set('token', {'sub': 'auth0|1', 'exp': time.time() + 60})
+        self.assertEqual(cache.get('token')['sub'], 'auth0|1')
+        self.assertEqual(cache.stats(), {'size': 1, 'hits': 1, 'misses': 1})
+
+    def test_entry_expires_with_token(self):
+        cache = VerifiedTokenCache(maxsize=10)
+        cache.set('expired', {'sub': 'auth0|1', 'exp': time.time() - 1})
+        cache.set('no-exp', {'sub': 'auth0|1'})
+        self.assertIsNone(cache.get('expired'))
+        self.assertIsNone(cache.get('no-exp'))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = VerifiedTokenCache(maxsize=2)
+        exp = time.time() + 60
+        cache.set('a', {'exp': exp})
+        cache.set('b', {'exp': exp})
+        cache.get('a')
+        cache.set('c', {'exp': exp})
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+
+class StubJWKSServer:
+    """
+    Serveur JWKS local: sert les clés publiques de `self.keys` et compte les requêtes.
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self.hits = 0
+        self.failing = False
+        self.delay = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits += 1
+                time.sleep(stub.delay)
+                if stub.failing:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                jwks = []
+                for kid, private_key in stub.keys.items():
+                    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+                    jwks.append({**jwk, 'kid': kid, 'use': 'sig', 'alg': 'RS256'})
+                body = json.dumps({'keys': jwks}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/.well-known/jwks.json'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def add_key(self, kid):
+        self.keys[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        return self.keys[kid]
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def mint_token(self, kid, sub='auth0|test', ttl=3600, **claims):
+        """
+        Signe un access token RS256 comme le ferait Auth0 (voir settings de test).
+        """
+        now = int(time.time())
+        payload = {
+            'sub': sub,
+            'aud': 'http://localhost/api',
+            'iss': 'https://example.auth0.com/',
+            'iat': now,
+            'exp': now + ttl,
+            **claims,
+        }
+        return jwt.encode(payload, self.keys[kid], algorithm='RS256', headers={'kid': kid})
+
+
+class JWKSKeyManagerTests(SimpleTestCase):
+    def setUp(self):
+        self.server = StubJWKSServer()
+        self.addCleanup(self.server.stop)
+        self.server.add_key('key-1')
+        self.manager = JWKSKeyManager(self.server.url, ttl=600, min_refresh_interval=30)
+
+    def test_keys_are_indexed_by_kid(self):
+        self.assertIsNotNone(self.manager.get_signing_key('key-1'))
+        self.assertIsNotNone(self.manager.get_signing_key('key-1'))
+        self.assertEqual(self.server.hits, 1)
+
+    def test_rotation_triggers_a_single_forced_refetch(self):
+        self.manager.get_signing_key('key-1')
+        self.server.add_key('key-2')
+        self.server.delay = 0.2
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.manager.get_signing_key('key-2')))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.server.hits, 2)
+        self.assertTrue(all(key is not None for key in results))
+        # Un kid toujours inconnu ne relance pas de requête avant min_refresh_interval
+        self.assertIsNone(self.manager.get_signing_key('unknown'))
+        self.assertEqual(self.server.hits, 2)
+
+    def test_failed_refresh_keeps_last_good_keys(self):
+        self.manager.get_signing_key('key-1')
+        self.server.failing = True
+        self.manager.min_refresh_interval = 0
+        self.assertFalse(self.manager.refresh())
+        self.assertIsNotNone(self.manager.get_signing_key('key-1'))
+
+    def test_stale_keys_are_refreshed_in_background(self):
+        self.manager.ttl = 0
+        self.manager.min_refresh_interval = 0
+        self.manager.get_signing_key('key-1')
+        self.assertIsNotNone(self.manager.get_signing_key('key-1'))
+        self.manager._background_refresh.join()
+        self.assertEqual(self.server.hits, 2)
+
+    def test_validate_auth0_token_with_rotated_key(self):
+        with override_settings(
+            AUTH0_DOMAIN='example.auth0.com',
+            AUTH0_API_AUDIENCE='http://localhost/api',
+            AUTH0_JWKS_URL=self.server.url,
+            AUTH0_TOKEN_CACHE_ENABLED=False,
+        ):
+            self.assertEqual(validate_auth0_token(self.server.mint_token('key-1'))['sub'], 'auth0|test')
+            self.server.add_key('key-2')
+            self.assertEqual(validate_auth0_token(self.server.mint_token('key-2'))['sub'], 'auth0|test')
+            self.assertIsNone(validate_auth0_token(self.server.mint_token('key-2', ttl=-60)))
+
+
+class Auth0StubMixin:
+    """
+    Configure un JWKS local et un token signé pour les vues protégées par @auth0_required.
+    """
+
+    def setUp(self):
+        self.server = StubJWKSServer()
+        self.addCleanup(self.server.stop)
+        self.server.add_key('key-1')
+        settings_override = override_settings(
+            AUTH0_DOMAIN='example.auth0.com',
+            AUTH0_API_AUDIENCE='http://localhost/api',
+            AUTH0_JWKS_URL=self.server.url,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(cache.clear)
+        self.addCleanup(local_identity_cache.clear)
+        self.auth = {'HTTP_AUTHORIZATION': 'Bearer ' + self.server.mint_token('key-1', nickname='neo')}
+        # AsyncClient: en-têtes passés par `headers` (les clés HTTP_* sont ignorées)
+        self.headers = {'Authorization': self.auth['HTTP_AUTHORIZATION']}
+
+
+class Auth0RequiredTests(Auth0StubMixin, TestCase):
+    def test_first_login_creates_profile_then_uses_cache(self):
+        response = self.client.get('/api/user/', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['pseudo'], 'neo')
+        gamer = Gamer.objects.get(auth0_id='auth0|test')
+        build_rank_snapshot()
+
+        # Identité en cache: seulement le chargement du Gamer et de son rang (pas de jeux)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/user/', **self.auth)
+        self.assertEqual(response.json()['id'], gamer.id)
+
+    def test_delete_invalidates_identity(self):
+        self.client.get('/api/user/', **self.auth)
+        first = Gamer.objects.get(auth0_id='auth0|test')
+        first.user.delete()
+        response = self.client.get('/api/user/', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['id'], first.id)
+
+    def test_user_delete_clears_shared_cache(self):
+        self.client.get('/api/user/', **self.auth)
+        key = _identity_cache_key('auth0|test')
+        self.assertIsNotNone(cache.get(key))
+        # Sans le signal du Gamer: la suppression du User suffit à vider le cache partagé
+        post_delete.disconnect(signals.gamer_deleted, sender=Gamer)
+        self.addCleanup(post_delete.connect, signals.gamer_deleted, sender=Gamer)
+        Gamer.objects.get(auth0_id='auth0|test').user.delete()
+        self.assertIsNone(cache.get(key))
+
+    def test_stale_local_identity_after_delete_elsewhere(self):
+        self.client.get('/api/user/', **self.auth)
+        gamer = Gamer.objects.get(auth0_id='auth0|test')
+        stale = (gamer.user_id, gamer.id)
+        gamer.user.delete()
+        # Cache local d'un autre process, pas encore expiré
+        local_identity_cache.set('auth0|test', stale)
+        response = self.client.post('/api/gamers/create/', '{}', content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(local_identity_cache.get('auth0|test'))
+        response = self.client.post('/api/gamers/create/', '{}', content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['id'], gamer.id)
+
+        local_identity_cache.set('auth0|test', stale)
+        self.assertEqual(self.client.get('/api/user/', **self.auth).status_code, 404)
+        self.assertIsNone(local_identity_cache.get('auth0|test'))
+
+    async def test_async_client(self):
+        # Chaîne ASGI complète: auth0_required async, validation du token hors de la boucle
+        response = await self.async_client.get('/api/user/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/user/', headers={'Authorization': 'Bearer not-a-jwt'})
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.async_client.get('/api/user/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['pseudo'], 'neo')
+        gamer = await Gamer.objects.aget(auth0_id='auth0|test')
+        response = await self.async_client.get('/api/user/', headers=self.headers)
+        self.assertEqual(response.json()['id'], gamer.id)
+
+
+class GamerCreateUpdateTests(Auth0StubMixin, TestCase):
+    def post(self, payload):
+        return self.client.post('/api/gamers/create/', json.dumps(payload), content_type='application/json', **self.auth)
+
+    def count_queries(self, games):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post({'points': 10, 'games': games})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_games_are_upserted_in_constant_queries(self):
+        games = [Game.objects.create(name=f'Game {i}', category='FPS') for i in range(20)]
+        self.client.get('/api/user/', **self.auth)  # premier login: création du profil
+
+        small = self.count_queries([{'name': 'Game 0', 'skill_level': 1, 'hours_played': 1}])
+        payload = [{'name': game.name, 'skill_level': 2, 'hours_played': 5} for game in games]
+        self.assertEqual(self.count_queries(payload), small)
+
+        gamer = Gamer.objects.get(auth0_id='auth0|test')
+        self.assertEqual(gamer.points, 10)
+        self.assertEqual(gamer.gamergame_set.count(), 20)
+        self.assertEqual(set(gamer.gamergame_set.values_list('skill_level', 'hours_played')), {(2, 5)})
+
+    def test_change_log_is_one_final_insert(self):
+        Game.objects.create(name='Known', category='FPS')
+        self.client.get('/api/user/', **self.auth)
+        gamer = Gamer.objects.get(auth0_id='auth0|test')
+        with CaptureQueriesContext(connection) as ctx:
+            self.post({'points': 10, 'games': [{'name': 'Known', 'skill_level': 3, 'hours_played': 2}]})
+        # Profil et jeux: deux entrées, un seul INSERT, dernière instruction de la transaction
+        inserts = [i for i, query in enumerate(ctx.captured_queries) if 'INSERT INTO "gameur_gamerchange"' in query['sql']]
+        statements = [i for i, query in enumerate(ctx.captured_queries) if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(inserts, statements[-1:])
+        self.assertEqual(
+            set(GamerChange.objects.filter(gamer=gamer).values_list('kind', flat=True)),
+            {GamerChange.PROFILE, GamerChange.GAMES},
+        )
+
+    def test_unknown_games_are_reported(self):
+        Game.objects.create(name='Known', category='FPS')
+        response = self.post({'games': [
+            {'name': 'Known', 'skill_level': 3, 'hours_played': 2},
+            {'name': 'Missing', 'skill_level': 3, 'hours_played': 2},
+        ], 'favoriteGameName': 'Other'})
+        self.assertEqual(response.json()['unknown_games'], ['Missing', 'Other'])
+        self.assertEqual(GamerGame.objects.count(), 1)
+
+
+class TopGamesTests(Auth0StubMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.games = [Game.objects.create(name=f'Game {i}', category='FPS') for i in range(4)]
+
+    def test_maintained_on_gamer_game_writes(self):
+        gamer = create_gamer(0, games=[(self.games[0], 5), (self.games[1], 10)])
+        gamer.refresh_from_db()
+        self.assertEqual(gamer.top_game_ids, [self.games[1].id, self.games[0].id])
+        self.assertEqual(gamer.favorite_game, self.games[1])
+
+        GamerGame.objects.filter(gamer=gamer, game=self.games[1]).get().delete()
+        gamer.refresh_from_db()
+        self.assertEqual(gamer.top_game_ids, [self.games[0].id])
+        self.assertEqual(gamer.favorite_game, self.games[0])
+
+    def test_pinned_favorite_survives_game_updates(self):
+        self.client.get('/api/user/', **self.auth)  # premier login: création du profil
+        post = lambda payload: self.client.post(  # noqa: E731
+            '/api/gamers/create/', json.dumps(payload), content_type='application/json', **self.auth,
+        )
+        post({'favoriteGameName': 'Game 3', 'games': [{'name': 'Game 0', 'skill_level': 1, 'hours_played': 9}]})
+        gamer = Gamer.objects.get(auth0_id='auth0|test')
+        self.assertEqual((gamer.top_game_ids, gamer.favorite_game_id), ([self.games[0].id], self.games[3].id))
+
+        post({'games': [{'name': 'Game 1', 'skill_level': 1, 'hours_played': 20}]})
+        gamer.refresh_from_db()
+        self.assertEqual(gamer.top_game_ids, [self.games[1].id, self.games[0].id])
+        self.assertEqual(gamer.favorite_game_id, self.games[3].id)
+
+        # Nom vide: le favori redevient le jeu le plus joué
+        post({'favoriteGameName': ''})
+        gamer.refresh_from_db()
+        self.assertEqual((gamer.favorite_game_id, gamer.favorite_game_pinned), (self.games[1].id, False))
+        data = serialize_gamers([gamer], RequestFactory().get('/api/user/'))[0]
+        self.assertEqual((data['topGames'], data['favoriteGame']), (['Game 1', 'Game 0'], 'Game 1'))
+
+    def test_rebuild_command(self):
+        gamer = create_gamer(0, games=[(game, hours) for hours, game in enumerate(self.games)])
+        Gamer.objects.filter(pk=gamer.pk).update(top_game_ids=[], favorite_game=None)
+        out = StringIO()
+        call_command('rebuild_top_games', batch_size=1, stdout=out)
+        gamer.refresh_from_db()
+        self.assertEqual(gamer.top_game_ids, [self.games[3].id, self.games[2].id, self.games[1].id])
+        self.assertEqual(gamer.favorite_game_id, self.games[3].id)
+        self.assertIn('1 gamers parcourus, 1 mis à jour', out.getvalue())
+
+
+class RateLimitTests(Auth0StubMixin, TestCase):
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    @override_settings(RATELIMIT_SUB_RATE='2/m')
+    def test_sub_limit_returns_429_with_retry_after(self):
+        before = self.sample('gameur_rate_limited_total', scope='sub', bucket='default')
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/user/', **self.auth).status_code, 200)
+        response = self.client.get('/api/user/', **self.auth)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.sample('gameur_rate_limited_total', scope='sub', bucket='default'), before + 1)
+
+        # La vue de création a son propre seau (@rate_limit)
+        response = self.client.post('/api/gamers/create/', '{}', content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(RATELIMIT_IP_RATE='1/m')
+    def test_ip_limit_applies_before_token_validation(self):
+        bad_token = {'HTTP_AUTHORIZATION': 'Bearer not-a-jwt'}
+        self.assertEqual(self.client.get('/api/user/', **bad_token).status_code, 401)
+        with mock.patch('gameur.auth_utils.avalidate_auth0_token') as validate:
+            response = self.client.get('/api/user/', **bad_token)
+        self.assertEqual(response.status_code, 429)
+        validate.assert_not_called()
+        # Sans proxy de confiance configuré, l'en-tête ne permet pas de changer de seau
+        response = self.client.get('/api/user/', HTTP_X_REAL_IP='203.0.113.7', **self.auth)
+        self.assertEqual(response.status_code, 429)
+        # IP client transmise par nginx (REMOTE_ADDR du client de test: 127.0.0.1)
+        with self.settings(RATELIMIT_CLIENT_IP_HEADER='HTTP_X_REAL_IP', RATELIMIT_TRUSTED_PROXIES=['127.0.0.0/8']):
+            response = self.client.get('/api/user/', HTTP_X_REAL_IP='203.0.113.7', **self.auth)
+        self.assertEqual(response.status_code, 200)
+
+    def test_client_ip_header_requires_trusted_proxy(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='198.51.100.1', HTTP_X_REAL_IP='203.0.113.7')
+        self.assertEqual(client_ip(request), '198.51.100.1')
+        with self.settings(RATELIMIT_CLIENT_IP_HEADER='HTTP_X_REAL_IP', RATELIMIT_TRUSTED_PROXIES=['10.0.0.0/8']):
+            self.assertEqual(client_ip(request), '198.51.100.1')
+        with self.settings(RATELIMIT_CLIENT_IP_HEADER='HTTP_X_REAL_IP', RATELIMIT_TRUSTED_PROXIES=['198.51.100.1']):
+            self.assertEqual(client_ip(request), '203.0.113.7')
+
+    @override_settings(RATELIMIT_SUB_RATE='1/m')
+    def test_cache_errors_fail_open(self):
+        with mock.patch('gameur.ratelimit.acquire', side_effect=ConnectionError('cache down')):
+            for _ in range(3):
+                self.assertEqual(self.client.get('/api/user/', **self.auth).status_code, 200)
+
+
+class AdmissionControlTests(SimpleTestCase):
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    @override_settings(ADMISSION_MAX_IN_FLIGHT=1)
+    def test_sheds_requests_over_in_flight_limit(self):
+        factory = RequestFactory()
+        nested = {}
+
+        def get_response(request):
+            if request.path == '/api/user/':
+                # Requêtes reçues pendant le traitement de la première
+                nested['api'] = middleware(factory.get('/api/gamers/'))
+                nested['metrics'] = middleware(factory.get('/metrics'))
+            return JsonResponse({})
+
+        middleware = AdmissionControlMiddleware(get_response)
+        before = self.sample('gameur_requests_shed_total')
+        self.assertEqual(middleware(factory.get('/api/user/')).status_code, 200)
+        self.assertEqual(nested['api'].status_code, 503)
+        self.assertEqual(nested['api']['Retry-After'], '1')
+        self.assertEqual(nested['metrics'].status_code, 200)
+        self.assertEqual(middleware.in_flight, 0)
+        self.assertEqual(self.sample('gameur_requests_shed_total'), before + 1)
+
+
+class GameCatalogTests(Auth0StubMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.games = [Game.objects.create(name=name, category='FPS') for name in ('Zelda', 'Chess')]
+
+    def test_served_from_memory_with_etag(self):
+        response = self.client.get('/api/games/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([game['name'] for game in response.json()['results']], ['Chess', 'Zelda'])
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/games/').status_code, 200)
+            self.assertEqual(self.client.get('/api/games/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Toute modification d'un Game invalide l'index et l'ETag
+        self.games[0].name = 'Zelda II'
+        self.games[0].save()
+        response = self.client.get('/api/games/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([game['name'] for game in response.json()['results']], ['Chess', 'Zelda II'])
+
+    def test_name_lookups_use_the_index(self):
+        self.client.get('/api/user/', **self.auth)  # premier login: création du profil
+        get_catalog()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/gamers/create/', json.dumps({
+                'games': [{'name': 'Chess', 'skill_level': 2, 'hours_played': 3}], 'favoriteGameName': 'Zelda',
+            }), content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in ctx.captured_queries if 'FROM "gameur_game"' in query['sql']])
+        gamer = Gamer.objects.get(auth0_id='auth0|test')
+        self.assertEqual((gamer.top_game_ids, gamer.favorite_game_id), ([self.games[1].id], self.games[0].id))
+
+        self.assertEqual(self.client.get(f'/api/games/{self.games[0].id + 100}/leaderboard/').status_code, 404)
+
+
+class PointIncrementTests(Auth0StubMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.get('/api/user/', **self.auth)  # premier login: création du profil
+        self.gamer = Gamer.objects.get(auth0_id='auth0|test')
+
+    def post(self, delta, key, gamer_id=None):
+        return self.client.post(
+            f'/api/gamers/{gamer_id or self.gamer.id}/points/',
+            json.dumps({'delta': delta}),
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=key,
+            **self.auth,
+        )
+
+    def test_replayed_key_is_applied_once(self):
+        self.assertEqual(self.post(5, 'k1').status_code, 202)
+        response = self.post(5, 'k1')
+        self.assertTrue(response.json()['duplicate'])
+        self.assertEqual(self.post(7, 'k1').status_code, 409)
+        self.assertEqual(buffer_lag()['pending'], 1)
+
+        self.assertEqual(flush_point_increments(), 1)
+        self.assertEqual(self.post(5, 'k1').json()['applied'], True)
+        self.assertEqual(flush_point_increments(), 0)
+        self.gamer.refresh_from_db()
+        self.assertEqual(self.gamer.points, 5)
+
+    def test_flush_coalesces_deltas(self):
+        other = create_gamer(1, points=100)
+        for i in range(10):
+            self.post(1, f'k{i}')
+        PointIncrement.objects.create(gamer=other, idempotency_key='o1', delta=-30)
+        PointIncrement.objects.create(gamer=other, idempotency_key='o2', delta=5)
+
+        # Savepoint, sélection, UPDATE coalescé, journal, marquage, release: indépendant de la taille du lot
+        with self.assertNumQueries(6):
+            self.assertEqual(flush_point_increments(), 12)
+        self.gamer.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.gamer.points, other.points), (10, 75))
+        self.assertEqual(buffer_lag(), {'pending': 0, 'lag_seconds': 0.0})
+
+    def test_invalid_requests(self):
+        other = create_gamer(1)
+        self.assertEqual(self.post(1, 'k1', gamer_id=other.id).status_code, 403)
+        self.assertEqual(self.post('1', 'k1').status_code, 400)
+        self.assertEqual(self.post(1, '').status_code, 400)
+
+
+class LeaderboardPaginationTests(TestCase):
+    def setUp(self):
+        self.gamers = [create_gamer(i, points=points) for i, points in enumerate([30, 50, 30, 10, 30])]
+
+    def get(self, **params):
+        return self.client.get('/api/gamers/', params)
+
+    def pseudos(self, data):
+        return [gamer['pseudo'] for gamer in data['results']]
+
+    def test_next_and_previous_walk_with_ties(self):
+        # Égalités de points départagées par id: ordre stable d'une page à l'autre
+        expected = ['gamer1', 'gamer0', 'gamer2', 'gamer4', 'gamer3']
+        pages = [self.get(limit=2).json()]
+        while pages[-1]['next']:
+            pages.append(self.get(limit=2, cursor=pages[-1]['next']).json())
+        self.assertEqual([self.pseudos(page) for page in pages], [expected[0:2], expected[2:4], expected[4:]])
+        self.assertIsNone(pages[0]['previous'])
+
+        back = self.get(limit=2, cursor=pages[-1]['previous']).json()
+        self.assertEqual(self.pseudos(back), expected[2:4])
+        back = self.get(limit=2, cursor=back['previous']).json()
+        self.assertEqual(self.pseudos(back), expected[0:2])
+
+    def test_limit_is_capped_and_validated(self):
+        self.assertEqual(self.get(limit=500).json()['limit'], 100)
+        self.assertEqual(self.get(limit='abc').status_code, 400)
+        self.assertEqual(self.get(limit=0).status_code, 400)
+
+    def test_malformed_cursors_are_rejected(self):
+        for cursor in ['garbage', encode_cursor(['abc', 1]), encode_cursor([{}, 1]), encode_cursor([None, 1]),
+                       encode_cursor([[1], 1]), encode_cursor([1])]:
+            with self.subTest(cursor=cursor):
+                response = self.get(cursor=cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'detail': 'Invalid cursor.'})
+        game = Game.objects.create(name='Chess', category='Board')
+        response = self.client.get(f'/api/games/{game.id}/leaderboard/', {'cursor': encode_cursor(['x', 1, 2])})
+        self.assertEqual(response.status_code, 400)
+
+
+class GameLeaderboardTests(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.game = Game.objects.create(name='Chess', category='Board')
+        self.other = Game.objects.create(name='Go', category='Board')
+        for i, (skill_level, hours) in enumerate([(3, 10), (5, 1), (3, 50), (1, 100)]):
+            gamer = create_gamer(i, games=[(self.game, hours)])
+            GamerGame.objects.filter(gamer=gamer).update(skill_level=skill_level)
+        create_gamer(9, games=[(self.other, 1000)])
+
+    def get(self, game_id, **params):
+        return self.client.get(f'/api/games/{game_id}/leaderboard/', params)
+
+    def test_ordering_and_pagination(self):
+        first = self.get(self.game.id, limit=3).json()
+        self.assertEqual([entry['gamer']['pseudo'] for entry in first['results']], ['gamer1', 'gamer2', 'gamer0'])
+        # Page suivante: une seule requête (GamerGame + Gamer via select_related)
+        with self.assertNumQueries(1):
+            second = self.get(self.game.id, limit=3, cursor=first['next']).json()
+        self.assertEqual([entry['gamer']['pseudo'] for entry in second['results']], ['gamer3'])
+        self.assertEqual(self.get(999).status_code, 404)
+
+    def test_first_page_is_cached_until_game_changes(self):
+        self.get(self.game.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(self.game.id).json()['results'][0]['skill_level'], 5)
+
+        # Un changement sur un autre jeu ne touche pas ce cache
+        with self.captureOnCommitCallbacks(execute=True):
+            GamerGame.objects.filter(game=self.other).get().save()
+        with self.assertNumQueries(0):
+            self.get(self.game.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            gamer_game = GamerGame.objects.get(game=self.game, gamer__pseudo='gamer3')
+            gamer_game.skill_level = 5
+            gamer_game.save()
+        self.assertEqual(self.get(self.game.id).json()['results'][0]['gamer']['pseudo'], 'gamer3')
+
+
+class GamerSearchTests(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        for index, (pseudo, points) in enumerate([('Ninja', 10), ('ninjago', 50), ('TheNinja', 100), ('Zelda', 5)]):
+            create_gamer(index, points=points)
+            Gamer.objects.filter(pseudo=f'gamer{index}').update(pseudo=pseudo)
+
+    def search(self, **params):
+        return self.client.get('/api/gamers/search/', params)
+
+    def test_prefix_matches_come_first(self):
+        response = self.search(q='  NINJA ')
+        self.assertEqual(response.json()['q'], 'ninja')
+        results = response.json()['results']
+        self.assertEqual([result['pseudo'] for result in results], ['ninjago', 'Ninja', 'TheNinja'])
+        self.assertEqual(set(results[0]), {'id', 'pseudo', 'avatar_thumb', 'level', 'points'})
+        self.assertEqual(len(self.search(q='ninja', limit=1).json()['results']), 1)
+        self.assertEqual(self.search(q=' ').status_code, 400)
+        self.assertEqual(self.search(q='ninja', limit='x').status_code, 400)
+
+    def test_short_prefixes_are_cached(self):
+        self.search(q='ze')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.search(q='ZE').json()['results'][0]['pseudo'], 'Zelda')
+        # Les saisies plus longues ne sont pas mises en cache
+        self.search(q='zelda')
+        with self.assertNumQueries(1):
+            self.search(q='zelda')
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.game = Game.objects.create(name='Chess', category='Board')
+        self.gamers = [create_gamer(i, points=i * 10) for i in range(3)]
+
+    def changes(self, since=None):
+        response = self.client.get('/api/gamers/changes/', {'since': since} if since else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_returns_only_changed_gamers(self):
+        cursor = self.changes()['cursor']
+        self.assertEqual(self.changes(cursor)['results'], [])
+
+        GamerGame.objects.create(gamer=self.gamers[0], game=self.game, skill_level=2, hours_played=5)
+        self.gamers[0].points = 500
+        self.gamers[0].save()
+        deleted_id = self.gamers[2].id
+        self.gamers[2].delete()
+        data = self.changes(cursor)
+        self.assertEqual([gamer['id'] for gamer in data['results']], [self.gamers[0].id])
+        self.assertEqual(data['results'][0]['points'], 500)
+        self.assertEqual(data['removed'], [deleted_id])
+
+        cursor = data['cursor']
+        PointIncrement.objects.create(gamer=self.gamers[1], idempotency_key='k', delta=5)
+        flush_point_increments()
+        data = self.changes(cursor)
+        self.assertEqual([(gamer['id'], gamer['points']) for gamer in data['results']], [(self.gamers[1].id, 15)])
+        self.assertEqual(self.changes(data['cursor'])['results'], [])
+
+    @override_settings(CHANGE_FEED_SETTLE_SECONDS=1)
+    def test_late_commit_is_logged_again(self):
+        with mock.patch('gameur.changes.time') as clock:
+            clock.monotonic.side_effect = [100.0, 100.2]
+            with self.captureOnCommitCallbacks(execute=True):
+                record_gamer_changes([self.gamers[0].id], GamerChange.POINTS)
+        self.assertEqual(GamerChange.objects.filter(gamer=self.gamers[0], kind=GamerChange.POINTS).count(), 1)
+
+        # Commit 2s après l'insertion: des lecteurs ont pu dépasser l'entrée
+        with mock.patch('gameur.changes.time') as clock:
+            clock.monotonic.side_effect = [100.0, 102.0, 102.0]
+            with self.captureOnCommitCallbacks(execute=True):
+                record_gamer_changes([self.gamers[1].id], GamerChange.POINTS)
+        first, second = GamerChange.objects.filter(gamer=self.gamers[1], kind=GamerChange.POINTS).order_by('id')
+        self.assertGreater(second.id, first.id)
+
+    def test_compaction_and_resync(self):
+        cursor = self.changes()['cursor']
+        for points in (1, 2, 3):
+            self.gamers[0].points = points
+            self.gamers[0].save()
+        # Création + trois mises à jour: seule la dernière entrée reste
+        self.assertEqual(compact_change_log(), (3, 0))
+        self.assertEqual(GamerChange.objects.filter(gamer=self.gamers[0]).count(), 1)
+        self.assertEqual(self.changes(cursor)['results'][0]['points'], 3)
+
+        remaining = GamerChange.objects.count()
+        with override_settings(CHANGE_LOG_RETENTION=0):
+            self.assertEqual(compact_change_log(), (0, remaining))
+        old = encode_cursor([0, time.time() - 2 * 86400])
+        response = self.client.get('/api/gamers/changes/', {'since': old})
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.json()['resync_required'])
+        self.assertEqual(self.client.get('/api/gamers/changes/', {'since': 'nope'}).status_code, 400)
+
+
+# TransactionTestCase: le hub ferme les connexions obsolètes, ce qui romprait la
+# transaction d'un TestCase
+@override_settings(PUSH_TICK_SECONDS=0.01, PUSH_HEARTBEAT_SECONDS=3600)
+class LeaderboardPushTests(TransactionTestCase):
+    def setUp(self):
+        self.gamers = [create_gamer(i, points=i * 10) for i in range(3)]
+        self.app = LeaderboardStreamApp(application=None)
+
+    async def open_stream(self, method='GET'):
+        disconnected = asyncio.Event()
+        messages = asyncio.Queue()
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        scope = {'type': 'http', 'path': PUSH_PATH, 'method': method, 'headers': []}
+        task = asyncio.ensure_future(self.app(scope, receive, messages.put))
+        start = await asyncio.wait_for(messages.get(), 1)
+        return task, messages, disconnected, start
+
+    async def next_events(self, messages):
+        body = (await asyncio.wait_for(messages.get(), 1))['body'].decode()
+        events = []
+        for frame in body.strip().split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in frame.split('\n') if ': ' in line)
+            events.append((fields['event'], json.loads(fields['data'])))
+        return events
+
+    def save_points(self, gamer, points):
+        gamer.points = points
+        gamer.save()
+
+    async def test_changes_are_batched_per_tick(self):
+        streams = [await self.open_stream() for _ in range(2)]
+        for _, messages, _, start in streams:
+            self.assertEqual(dict(start['headers'])[b'content-type'], b'text/event-stream')
+            self.assertEqual((await self.next_events(messages))[0][0], 'hello')
+
+        # Deux écritures dans le même tick: un seul message, identique pour tous les abonnés
+        await sync_to_async(self.save_points)(self.gamers[0], 500)
+        await sync_to_async(self.save_points)(self.gamers[1], 5)
+        for _, messages, _, _ in streams:
+            [(event, data)] = await self.next_events(messages)
+            self.assertEqual(event, 'changes')
+            self.assertEqual([(gamer['id'], gamer['points']) for gamer in data['gamers']], [
+                (self.gamers[0].id, 500), (self.gamers[1].id, 5),
+            ])
+
+        for task, _, disconnected, _ in streams:
+            disconnected.set()
+            await asyncio.wait_for(task, 1)
+        self.assertEqual(self.app.hub.subscribers, set())
+
+    async def test_rejects_other_methods_and_extra_connections(self):
+        task, _, _, start = await self.open_stream(method='POST')
+        self.assertEqual(start['status'], 405)
+        with override_settings(PUSH_MAX_CONNECTIONS=0):
+            task, _, _, start = await self.open_stream()
+        self.assertEqual(start['status'], 503)
+
+    async def test_lost_connection_is_replaced_on_next_tick(self):
+        calls = []
+
+        def flaky_load_changes(gamer_ids):
+            calls.append(gamer_ids)
+            if len(calls) == 1:
+                raise DatabaseError('server closed the connection unexpectedly')
+            return load_changes(gamer_ids)
+
+        hub = LeaderboardHub()
+        with mock.patch('gameur.push.close_old_connections') as close, \
+                mock.patch('gameur.push.load_changes', side_effect=flaky_load_changes):
+            self.assertEqual(await hub.changes_frame({self.gamers[0].id}), RESYNC_FRAME)
+            frame = await hub.changes_frame({self.gamers[0].id})
+        self.assertTrue(frame.startswith(b'event: changes'))
+        # Avant et après chaque chargement, y compris celui qui a échoué
+        self.assertEqual(close.call_count, 4)
+
+    def test_slow_subscriber_gets_resync(self):
+        subscriber = Subscriber()
+        for frame in (b'a', b'b', b'c'):
+            subscriber.offer(frame, limit=2)
+        self.assertEqual(list(subscriber.frames), [RESYNC_FRAME])
+        subscriber.offer(b'd', limit=2)
+        self.assertEqual(list(subscriber.frames), [RESYNC_FRAME, b'd'])
+
+
+class ContentNegotiationTests(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.gamer = create_gamer(0, points=10)
+        build_rank_snapshot()
+
+    def test_json_by_default_and_msgpack_on_request(self):
+        response = self.client.get('/api/gamers/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('Accept', response['Vary'])
+        # Même format qu'avant (isoformat), encodé par orjson
+        self.assertEqual(response.json()['results'][0]['created_at'], self.gamer.created_at.isoformat())
+
+        packed = self.client.get('/api/gamers/', HTTP_ACCEPT='application/msgpack, application/json;q=0.5')
+        self.assertEqual(packed['Content-Type'], 'application/msgpack')
+        data = msgpack.unpackb(packed.content, timestamp=3)
+        self.assertEqual(data['results'][0]['created_at'], self.gamer.created_at)
+        self.assertEqual(data['results'][0]['pseudo'], 'gamer0')
+        # Une représentation par format: ETags distincts
+        self.assertNotEqual(packed['ETag'], response['ETag'])
+        self.assertEqual(self.client.get('/api/gamers/', HTTP_ACCEPT='text/html').status_code, 200)
+
+    @override_settings(RATELIMIT_IP_RATE='1/m')
+    def test_errors_use_negotiated_format(self):
+        accept = {'HTTP_ACCEPT': 'application/msgpack'}
+        response = self.client.get('/api/user/', **accept)
+        self.assertEqual((response.status_code, response['Content-Type']), (401, 'application/msgpack'))
+        self.assertEqual(msgpack.unpackb(response.content), {'detail': 'Authentication credentials were not provided.'})
+        response = self.client.get('/api/user/', **accept)
+        self.assertEqual((response.status_code, response['Content-Type']), (429, 'application/msgpack'))
+
+        middleware = AdmissionControlMiddleware(lambda request: None)
+        response = middleware.shed(RequestFactory().get('/api/gamers/', **accept))
+        self.assertEqual((response.status_code, response['Content-Type']), (503, 'application/msgpack'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(Auth0StubMixin, TransactionTestCase):
+    # TransactionTestCase: l'alias miroir `replica` est une autre connexion, qui ne voit
+    # que les données validées
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        super().setUp()
+        db_router._health.clear()
+        self.addCleanup(db_router._health.clear)
+        create_gamer(0, points=10)
+
+    def search_queries(self):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get('/api/gamers/search/', {'q': 'gamer0'})
+        self.assertEqual(response.json()['results'][0]['pseudo'], 'gamer0')
+        return len(primary.captured_queries), len(replica.captured_queries)
+
+    def test_reads_use_replica_until_client_writes(self):
+        self.assertEqual(self.search_queries(), (0, 1))
+        # Les vues non marquées restent sur la base principale
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.client.get('/api/user/', **self.auth)
+        self.assertEqual(len(replica.captured_queries), 0)
+
+        gamer = Gamer.objects.get(auth0_id='auth0|test')
+        response = self.client.post(
+            f'/api/gamers/{gamer.id}/points/', json.dumps({'delta': 5, 'idempotency_key': 'k'}),
+            content_type='application/json', **self.auth,
+        )
+        self.assertEqual(response.cookies[db_router.PIN_COOKIE]['max-age'], 5)
+        self.assertEqual(self.search_queries(), (1, 0))
+
+        self.client.cookies.clear()
+        self.assertEqual(self.search_queries(), (0, 1))
+
+    def test_lagging_or_unreachable_replica_fails_over(self):
+        with override_settings(REPLICA_MAX_LAG_SECONDS=-1):
+            self.assertEqual(self.search_queries(), (1, 0))
+        # Résultat de la mesure conservé REPLICA_LAG_CHECK_INTERVAL secondes
+        self.assertEqual(self.search_queries(), (1, 0))
+
+        db_router._health.clear()
+        with mock.patch.object(db_router, 'replica_lag', side_effect=DatabaseError('down')):
+            self.assertEqual(self.search_queries(), (1, 0))
+        db_router._health.clear()
+        self.assertEqual(self.search_queries(), (0, 1))
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class GamerExportTests(TestCase):
+    def setUp(self):
+        game = Game.objects.create(name='Chess', category='Board')
+        for i in range(5):
+            create_gamer(i, points=i * 10, games=[(game, i)])
+
+    async def export(self, export_format='ndjson', headers=None):
+        response = await self.async_client.get('/api/gamers/export/', {'format': export_format}, headers=headers)
+        return response, b''.join([part async for part in response.streaming_content])
+
+    async def test_ndjson_export_is_ordered(self):
+        response, body = await self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([row['pseudo'] for row in rows], ['gamer4', 'gamer3', 'gamer2', 'gamer1', 'gamer0'])
+        self.assertEqual(rows[0]['topGames'], ['Chess'])
+
+    async def test_csv_export_with_gzip(self):
+        response, body = await self.export('csv', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(body).decode().splitlines()
+        self.assertEqual(lines[0].split(','), CSV_COLUMNS)
+        self.assertEqual(len(lines), 6)
+
+    def test_queries_per_chunk(self):
+        # Une requête (curseur) pour les gamers, puis les rangs de chacun des 3 lots
+        # (top games: index du catalogue en mémoire)
+        build_rank_snapshot()
+        get_catalog()
+        with CaptureQueriesContext(connection) as ctx:
+            async_to_sync(self.export)()
+        self.assertEqual(len(ctx.captured_queries), 1 + 3)
+
+
+class ImageVariantsTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, MEDIA_URL='/media/', IMAGE_VARIANT_SIZES=[32, 64])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.request = RequestFactory().get('/api/gamers/')
+
+        buffer = BytesIO()
+        Image.new('RGBA', (300, 200), (255, 0, 0, 128)).save(buffer, 'PNG')
+        self.gamer = create_gamer(0)
+        self.gamer.avatar.save('avatar.png', ContentFile(buffer.getvalue()), save=False)
+        Gamer.objects.filter(pk=self.gamer.pk).update(avatar=self.gamer.avatar.name)
+
+    def serialize(self):
+        return serialize_gamers(Gamer.objects.filter(pk=self.gamer.pk), self.request)[0]
+
+    def test_original_until_variants_exist(self):
+        data = self.serialize()
+        self.assertEqual(data['avatar_thumb'], data['avatar'])
+        self.assertIsNone(data['avatar_srcset'])
+
+        generate_image_variants('gamer', self.gamer.pk, 'avatar')
+        data = self.serialize()
+        self.assertRegex(data['avatar_thumb'], r'^http://testserver/media/avatars/variants/[0-9a-f]{16}_32\.webp$')
+        self.assertEqual(data['avatar_srcset']['jpeg'].count('w, '), 1)
+
+        # Même contenu -> mêmes noms (URLs cacheables indéfiniment)
+        variants = Gamer.objects.get(pk=self.gamer.pk).avatar_variants
+        generate_image_variants('gamer', self.gamer.pk, 'avatar')
+        self.assertEqual(Gamer.objects.get(pk=self.gamer.pk).avatar_variants, variants)
+
+    def test_new_upload_falls_back_to_original(self):
+        generate_image_variants('gamer', self.gamer.pk, 'avatar')
+        Gamer.objects.filter(pk=self.gamer.pk).update(avatar='avatars/other.png')
+        data = self.serialize()
+        self.assertEqual(data['avatar_thumb'], 'http://testserver/media/avatars/other.png')
+
+
+class MetricsTests(Auth0StubMixin, TestCase):
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_view_query_count_is_recorded(self):
+        create_gamer(1, points=10)
+        before = self.sample('gameur_view_sql_queries_count', view='gamer_list')
+        self.client.get('/api/gamers/')
+        self.assertEqual(self.sample('gameur_view_sql_queries_count', view='gamer_list'), before + 1)
+        self.assertGreater(self.sample('gameur_view_sql_queries_sum', view='gamer_list'), 0)
+
+    def test_auth_metrics_and_metrics_route(self):
+        before = self.sample('gameur_auth0_token_validation_seconds_count', outcome='valid')
+        self.client.get('/api/user/', **self.auth)
+        self.client.get('/api/user/', **self.auth)
+        self.assertEqual(self.sample('gameur_auth0_token_validation_seconds_count', outcome='valid'), before + 1)
+        self.assertGreaterEqual(self.sample('gameur_jwks_fetch_seconds_count', outcome='success'), 1)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'gameur_serialize_gamer_seconds_bucket', response.content)
+
+    def test_point_buffer_lag_is_measured_at_scrape(self):
+        self.assertEqual(self.sample('gameur_point_buffer_pending'), 0)
+        increment = PointIncrement.objects.create(gamer=create_gamer(1), idempotency_key='k', delta=5)
+        PointIncrement.objects.filter(pk=increment.pk).update(created_at=timezone.now() - datetime.timedelta(minutes=2))
+        self.assertEqual(self.sample('gameur_point_buffer_pending'), 1)
+        self.assertGreaterEqual(self.sample('gameur_point_buffer_lag_seconds'), 120)
+        self.assertIn(b'gameur_point_buffer_lag_seconds', self.client.get('/metrics').content)
+
+
+@query_budget(2)
+def budget_test_view(request):
+    for gamer in Gamer.objects.all():
+        gamer.user  # N+1 volontaire
+    return JsonResponse({})
+
+
+@query_budget(2)
+async def async_budget_test_view(request):
+    async for gamer in Gamer.objects.all():
+        await User.objects.aget(pk=gamer.user_id)  # N+1 volontaire
+    return JsonResponse({})
+
+
+urlpatterns = [path('budget/', budget_test_view), path('async-budget/', async_budget_test_view)]
+
+
+@override_settings(ROOT_URLCONF='gameur.tests')
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        for i in range(3):
+            create_gamer(i)
+
+    def test_over_budget_fails_in_strict_mode(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, '3x'):
+            self.client.get('/budget/')
+
+    @override_settings(SQL_QUERY_BUDGET_STRICT=False)
+    def test_over_budget_only_warns_otherwise(self):
+        response = self.client.get('/budget/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="4 SQL queries"$')
+
+    def test_async_views_are_counted(self):
+        # Requêtes ORM d'une vue async: exécutées dans le thread de sync_to_async
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'async_budget_test_view: 4 requêtes'):
+            async_to_sync(self.async_client.get)('/async-budget/')
+
+        with override_settings(ROOT_URLCONF='server_config.urls'):
+            response = async_to_sync(self.async_client.get)('/api/gamers/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* SQL queries"')
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'   LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?',
+        )
+
+
+class SeedGamersTests(TestCase):
+    def seed(self, seed):
+        call_command('seed_gamers', size='200', seed=seed, games=20, reset=True, stdout=StringIO())
+        return (
+            list(Gamer.objects.order_by('auth0_id').values_list('auth0_id', 'points')),
+            sorted(GamerGame.objects.values_list('gamer__auth0_id', 'game__name', 'skill_level', 'hours_played')),
+        )
+
+    def test_same_seed_same_data(self):
+        first = self.seed(42)
+        self.assertEqual(self.seed(42), first)
+        self.assertNotEqual(self.seed(7), first)
+        self.assertEqual(len(first[0]), 200)
+        self.assertGreater(len(first[1]), 200)
+        self.assertTrue(RankSnapshot.objects.filter(is_active=True, total_players=200).exists())
+
+
+class ImportGamerStatsTests(TestCase):
+    def setUp(self):
+        self.gamer = create_gamer(1, points=5)
+        self.game = Game.objects.create(name='Valorant', category='FPS')
+
+    def run_import(self, content, suffix):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('import_gamer_stats', f.name, '--chunk-size', '2', stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_csv_import(self):
+        GamerChange.objects.all().delete()
+        output = self.run_import(
+            'pseudo,points,level,game,skill_level,hours_played\n'
+            'gamer1,100,3,Valorant,2,10\n'
+            'gamer1,,,Valorant,4,50\n'
+            'unknown,10,,,,\n'
+            'gamer1,abc,,,,\n',
+            '.csv',
+        )
+        self.gamer.refresh_from_db()
+        self.assertEqual((self.gamer.points, self.gamer.level), (100, 3))
+        gamer_game = GamerGame.objects.get(gamer=self.gamer, game=self.game)
+        self.assertEqual((gamer_game.skill_level, gamer_game.hours_played), (4, 50))
+        self.assertIn('4 lignes lues, 1 rejetées, 1 sans gamer/jeu correspondant', output)
+        # Points/level et stats de jeu: une entrée de chaque type dans le flux
+        self.assertEqual(
+            sorted(GamerChange.objects.filter(gamer=self.gamer).values_list('kind', flat=True)),
+            [GamerChange.GAMES, GamerChange.PROFILE],
+        )
+
+    def test_change_log_written_last(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.run_import('pseudo,points,level,game,skill_level,hours_played\ngamer1,100,3,Valorant,2,10\n', '.csv')
+        statements = [query['sql'] for query in ctx.captured_queries if 'SAVEPOINT' not in query['sql']]
+        self.assertIn('INSERT INTO "gameur_gamerchange"', statements[-1])
+
+    def test_points_and_level_on_separate_rows(self):
+        # Même lot (--chunk-size 2): chaque colonne garde sa dernière valeur non vide
+        self.run_import(
+            'pseudo,points,level,game,skill_level,hours_played\n'
+            'gamer1,100,,,,\n'
+            'gamer1,,3,,,\n',
+            '.csv',
+        )
+        self.gamer.refresh_from_db()
+        self.assertEqual((self.gamer.points, self.gamer.level), (100, 3))
+
+    def test_loaders_agree_on_unknown_game(self):
+        # Gamer connu, jeu inconnu: la ligne entière est ignorée par les deux chargements
+        chunk = [
+            (1, 'gamer1', 100, 3, 'Unknown', 2, 10),
+            (2, 'gamer1', None, 4, 'Valorant', 3, 20),
+        ]
+        loaders = [OrmStatsLoader]
+        if connection.vendor == 'postgresql':
+            loaders.append(PostgresStatsLoader)
+        for loader in loaders:
+            with self.subTest(loader=loader.__name__):
+                Gamer.objects.filter(pk=self.gamer.pk).update(points=5, level=1)
+                GamerGame.objects.all().delete()
+                totals = loader().load(chunk)
+                self.assertEqual(totals, {'gamers_updated': 1, 'gamer_games_upserted': 1, 'unmatched': 1})
+                self.gamer.refresh_from_db()
+                self.assertEqual((self.gamer.points, self.gamer.level), (5, 4))
+
+    def test_ndjson_import(self):
+        self.run_import(
+            '{"pseudo": "gamer1", "points": 42}\n'
+            '{"pseudo": "gamer1", "game": "Valorant", "skill_level": 5, "hours_played": 7}\n',
+            '.ndjson',
+        )
+        self.gamer.refresh_from_db()
+        self.assertEqual(self.gamer.points, 42)
+        self.assertEqual(GamerGame.objects.get(gamer=self.gamer).skill_level, 5)
+
+
+class ConditionalGetTests(Auth0StubMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        create_gamer(1, points=10)
+
+    def test_leaderboard_not_modified(self):
+        response = self.client.get('/api/gamers/')
+        etag = response['ETag']
+        self.assertIn('public', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/gamers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Une modification des points change la version, donc l'ETag
+        with self.captureOnCommitCallbacks(execute=True):
+            Gamer.objects.get(pseudo='gamer1').save()
+        response = self.client.get('/api/gamers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_profile_not_modified(self):
+        response = self.client.get('/api/user/', **self.auth)
+        self.assertIn('private', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/user/', HTTP_IF_NONE_MATCH=response['ETag'], **self.auth)
+        self.assertEqual(response.status_code, 304)
+
+    async def test_versions_are_read_off_the_event_loop(self):
+        real_get = LocMemCache.get
+        in_loop = []
+
+        def get(cache_backend, key, *args, **kwargs):
+            if key.endswith(':version'):
+                try:
+                    asyncio.get_running_loop()
+                    in_loop.append(key)
+                except RuntimeError:
+                    pass
+            return real_get(cache_backend, key, *args, **kwargs)
+
+        with mock.patch.object(LocMemCache, 'get', autospec=True, side_effect=get):
+            for path in ('/api/gamers/', '/api/games/'):
+                response = await self.async_client.get(path)
+                self.assertEqual(response.status_code, 200)
+                response = await self.async_client.get(path, headers={'If-None-Match': response['ETag']})
+                self.assertEqual(response.status_code, 304)
+        self.assertEqual(in_loop, [])
+
+    async def test_not_modified_with_async_client(self):
+        response = await self.async_client.get('/api/gamers/')
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get('/api/gamers/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        response = await self.async_client.get('/api/user/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get('/api/user/', headers={**self.headers, 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
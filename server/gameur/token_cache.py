@@ -0,0 +1,82 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class VerifiedTokenCache:
+    """
+    Cache LRU borné des payloads de tokens déjà vérifiés (signature RS256, audience, issuer).
+    La clé est un hash SHA-256 du token: le token brut n'est jamais gardé en mémoire.
+    Une entrée n'est jamais servie après le claim `exp` du token.
+    """
+
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxsize(self):
+        if self._maxsize is not None:
+            return self._maxsize
+        return getattr(settings, 'AUTH0_TOKEN_CACHE_SIZE', 1024)
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        """
+        Retourne une copie du payload si le token est en cache et pas expiré, None sinon.
+        """
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, payload = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(payload)
+
+    def set(self, token, payload):
+        """
+        Met en cache un payload vérifié. Les tokens sans `exp` ne sont pas mis en cache.
+        """
+        expires_at = payload.get('exp')
+        if not isinstance(expires_at, (int, float)) or expires_at <= time.time():
+            return
+        maxsize = self.maxsize
+        if maxsize <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+# Instance partagée par tous les threads du process
+verified_token_cache = VerifiedTokenCache()
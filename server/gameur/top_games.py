@@ -0,0 +1,62 @@
+from .models import TOP_GAMES_COUNT, Gamer, GamerGame
+
+# Jeux les plus joués et jeu favori, dénormalisés sur Gamer (top_game_ids, favorite_game):
+# recalculés à chaque écriture de GamerGame (signaux pour les écritures unitaires, appel
+# explicite après les écritures en lot) plutôt que triés à chaque lecture du classement.
+# Le favori suit le jeu le plus joué, sauf s'il a été choisi par le joueur (favorite_game_pinned).
+# `manage.py rebuild_top_games` recalcule tous les gamers.
+
+# Lignes par UPDATE ... CASE de bulk_update (le coût d'un CASE croît avec sa taille)
+UPDATE_BATCH_SIZE = 500
+
+
+def rank_top_games(stats):
+    """
+    Id des TOP_GAMES_COUNT jeux les plus joués, à partir de paires (game_id, hours_played).
+    """
+    return [game_id for game_id, _ in sorted(stats, key=lambda s: (-s[1], s[0]))[:TOP_GAMES_COUNT]]
+
+
+def apply_top_games(gamers):
+    """
+    Recalcule top_game_ids et favorite_game des gamers donnés (instances chargées), sans
+    les enregistrer. Retourne les gamers modifiés.
+    """
+    if not gamers:
+        return []
+    stats = {gamer.id: [] for gamer in gamers}
+    rows = GamerGame.objects.filter(gamer_id__in=stats).values_list('gamer_id', 'game_id', 'hours_played')
+    for gamer_id, game_id, hours_played in rows:
+        stats[gamer_id].append((game_id, hours_played))
+
+    changed = []
+    for gamer in gamers:
+        top_game_ids = rank_top_games(stats[gamer.id])
+        if gamer.favorite_game_pinned:
+            favorite_game_id = gamer.favorite_game_id
+        else:
+            favorite_game_id = top_game_ids[0] if top_game_ids else None
+        if gamer.top_game_ids != top_game_ids or gamer.favorite_game_id != favorite_game_id:
+            gamer.top_game_ids = top_game_ids
+            gamer.favorite_game_id = favorite_game_id
+            changed.append(gamer)
+    return changed
+
+
+def update_top_games(gamers):
+    """
+    Comme apply_top_games, puis enregistre les gamers modifiés. Retourne leur nombre.
+    """
+    changed = apply_top_games(gamers)
+    Gamer.objects.bulk_update(changed, ['top_game_ids', 'favorite_game'], batch_size=UPDATE_BATCH_SIZE)
+    return len(changed)
+
+
+def refresh_top_games(gamer_ids):
+    """
+    Comme update_top_games, à partir d'id de gamers (les gamers supprimés sont ignorés).
+    """
+    gamers = list(
+        Gamer.objects.filter(id__in=set(gamer_ids)).only('id', 'top_game_ids', 'favorite_game', 'favorite_game_pinned')
+    )
+    return update_top_games(gamers)
@@ -5,6 +5,12 @@ from django.urls import path
 urlpatterns = [
     path('user/', views.user_profile_view, name='user_profile'),
     path('gamers/', views.gamer_list_view, name='gamer_list'),
+    path('gamers/changes/', views.gamer_changes_view, name='gamer_changes'),
+    path('gamers/search/', views.gamer_search_view, name='gamer_search'),
+    path('gamers/export/', views.gamer_export_view, name='gamer_export'),
     path('gamers/create/', views.gamer_create_update_view, name='gamer_create_update'),
+    path('gamers/<int:gamer_id>/points/', views.gamer_points_view, name='gamer_points'),
+    path('games/', views.game_list_view, name='game_list'),
+    path('games/<int:game_id>/leaderboard/', views.game_leaderboard_view, name='game_leaderboard'),
     
 ]
@@ -0,0 +1,97 @@
+import datetime
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+
+# Version du classement, partagée entre workers via le cache Django.
+# Elle change à chaque modification des points, des profils ou des GamerGame:
+# les vues s'en servent pour calculer un ETag sans toucher à la base.
+# La valeur est un horodatage en nanosecondes (strictement croissant), ce qui
+# donne aussi le Last-Modified et évite de réutiliser une ancienne version
+# si le cache est vidé.
+
+LEADERBOARD_VERSION_KEY = 'gameur:leaderboard:version'
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        # add() ne remplace pas une version posée entre-temps par un autre worker
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_leaderboard_version():
+    return _get_version(LEADERBOARD_VERSION_KEY)
+
+
+def bump_leaderboard_version():
+    version = max(time.time_ns(), (cache.get(LEADERBOARD_VERSION_KEY) or 0) + 1)
+    cache.set(LEADERBOARD_VERSION_KEY, version, None)
+    return version
+
+
+def bump_leaderboard_version_on_commit():
+    """
+    Incrémente la version une fois la transaction courante validée: sinon une
+    lecture concurrente pourrait associer la nouvelle version à l'ancien contenu.
+    """
+    transaction.on_commit(bump_leaderboard_version)
+
+
+def version_timestamp(version):
+    return datetime.datetime.fromtimestamp(version / 1e9, tz=datetime.timezone.utc)
+
+
+def leaderboard_last_modified():
+    return version_timestamp(get_leaderboard_version())
+
+
+# Version du classement de chaque jeu (/api/games/<id>/leaderboard/): la première page
+# est mise en cache sous une clé qui contient cette version, changée dès qu'un
+# GamerGame du jeu est modifié.
+
+def _game_leaderboard_version_key(game_id):
+    return f'gameur:game-leaderboard:{game_id}:version'
+
+
+def get_game_leaderboard_version(game_id):
+    return _get_version(_game_leaderboard_version_key(game_id))
+
+
+def bump_game_leaderboard_versions(game_ids):
+    version = time.time_ns()
+    cache.set_many({_game_leaderboard_version_key(game_id): version for game_id in set(game_ids)}, None)
+
+
+def bump_game_leaderboard_versions_on_commit(game_ids):
+    game_ids = set(game_ids)
+    if game_ids:
+        transaction.on_commit(lambda: bump_game_leaderboard_versions(game_ids))
+
+
+# Version du catalogue de jeux (gameur.catalog): changée à chaque modification d'un Game,
+# elle invalide l'index en mémoire de chaque process et l'ETag de /api/games/.
+
+GAME_CATALOG_VERSION_KEY = 'gameur:game-catalog:version'
+
+
+def get_game_catalog_version():
+    return _get_version(GAME_CATALOG_VERSION_KEY)
+
+
+def bump_game_catalog_version():
+    version = max(time.time_ns(), (cache.get(GAME_CATALOG_VERSION_KEY) or 0) + 1)
+    cache.set(GAME_CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+# Versions async (vues ASGI): l'aller-retour vers le cache partagé ne bloque pas la boucle
+# d'événements, et sans thread_sensitive n'attend pas le thread des vues sync (cf. gameur.ratelimit)
+aget_leaderboard_version = sync_to_async(get_leaderboard_version, thread_sensitive=False)
+aget_game_leaderboard_version = sync_to_async(get_game_leaderboard_version, thread_sensitive=False)
+aget_game_catalog_version = sync_to_async(get_game_catalog_version, thread_sensitive=False)
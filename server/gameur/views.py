@@ -1,35 +1,105 @@
-from django.http import JsonResponse
-from .auth_utils import auth0_required, serialize_gamer # Importe le décorateur et la fonction de sérialisation
-from .models import Gamer, Game, GamerGame
-from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
+from .auth_utils import aserialize_gamers, auth0_required, serialize_game, serialize_game_entry, serialize_search_result # Importe le décorateur et la fonction de sérialisation
+from .models import Gamer, GamerChange, GamerGame
+from .catalog import aget_catalog, get_catalog
+from .export import EXPORT_FORMATS, export_gamers, gzip_stream
+from .identity import invalidate_identity
+from .changes import ResyncRequired, change_log, head_cursor, read_changes, record_gamer_changes
+from .conditional import acondition
+from .db_router import read_replica
+from .middleware import query_budget
+from .pagination import InvalidCursor, apaginate_keyset, parse_limit
+from .points import IdempotencyConflict, record_increment
+from .ratelimit import rate_limit
+from .responses import ApiResponse, negotiate
+from .search import normalize_query, search_gamers
+from .top_games import apply_top_games
+from .versions import (
+    aget_game_catalog_version,
+    aget_game_leaderboard_version,
+    aget_leaderboard_version,
+    bump_game_leaderboard_versions_on_commit,
+    bump_leaderboard_version_on_commit,
+    version_timestamp,
+)
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+import hashlib
 from django.contrib.auth import get_user_model
 import json
 from django.views.decorators.csrf import csrf_exempt
 
 User = get_user_model()
 
+# Ordre du classement global, servi par l'index gamer_points_id_idx
+LEADERBOARD_ORDERING = ('-points', 'id')
+# Ordre du classement d'un jeu, servi par l'index gamergame_game_skill_idx
+GAME_LEADERBOARD_ORDERING = ('-skill_level', '-hours_played', 'id')
+
+
+def _versioned_etag(request, version, *parts):
+    """
+    ETag calculé à partir d'une version (classement, catalogue), sans requête SQL.
+    L'hôte fait partie de la clé car les URLs d'avatar sont absolues, et le format
+    négocié (JSON ou MessagePack) car chaque représentation a son propre ETag.
+    """
+    raw = ':'.join(str(part) for part in (version, request.get_host(), negotiate(request), *parts))
+    return '"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+
+
+# Fonctions de @acondition: coroutines, la version est lue dans le cache partagé
+async def leaderboard_etag(request):
+    return _versioned_etag(request, await aget_leaderboard_version(), request.get_full_path())
+
+
+async def profile_etag(request):
+    return _versioned_etag(request, await aget_leaderboard_version(), 'user', request.gamer_id)
+
+
+async def games_etag(request):
+    return _versioned_etag(request, await aget_game_catalog_version(), 'games')
+
+
+async def leaderboard_modified(request):
+    return version_timestamp(await aget_leaderboard_version())
+
+
 # Vue pour récupérer le profil de l'utilisateur connecté
+# Vue async: servie sans bloquer de worker sous ASGI (uvicorn)
+@query_budget(11) # Premier login compris (création du User, du Gamer et de son entrée de journal)
 @auth0_required # Protégé par Auth0
-def user_profile_view(request):
+@acondition(etag_func=profile_etag) # 304 si If-None-Match correspond, avant toute requête SQL
+async def user_profile_view(request):
     """
     Récupère et renvoie les données du profil Gamer de l'utilisateur authentifié.
     """
     try:
-        # request.user est l'utilisateur Django attaché par @auth0_required
-        # Récupère le Gamer lié à cet utilisateur
-        # Utilise get_object_or_404 pour renvoyer un 404 si le Gamer n'existe pas
-        gamer = get_object_or_404(Gamer, user=request.user)
+        # request.gamer_id est résolu par @auth0_required (sans requête si en cache)
+        gamer = await Gamer.objects.filter(pk=request.gamer_id).afirst()
+        if gamer is None:
+            # Identité périmée du cache local (profil supprimé par un autre process)
+            await sync_to_async(invalidate_identity, thread_sensitive=False)(sub=request.auth_payload['sub'])
+            return ApiResponse({'detail': 'Not found.'}, request, status=404)
 
         # Utilise la fonction de sérialisation
-        gamer_data = serialize_gamer(gamer, request)
+        gamer_data = (await aserialize_gamers([gamer], request))[0]
 
-        return JsonResponse(gamer_data)
+        response = ApiResponse(gamer_data, request)
+        # Réponse propre à l'utilisateur: pas de cache partagé, revalidation par ETag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
     except Exception as e:
-        # Gère les autres erreurs inattendues (hors Gamer.DoesNotExist géré par get_object_or_404)
+        # Gère les autres erreurs inattendues
         print(f"Erreur dans user_profile_view: {e}")
-        return JsonResponse({'detail': 'Internal server error.'}, status=500)
+        return ApiResponse({'detail': 'Internal server error.'}, request, status=500)
 
 # Exemple de vue pour créer/mettre à jour le profil gamer
+@rate_limit(sub='30/m') # Écriture transactionnelle: limite plus stricte que RATELIMIT_SUB_RATE
+@query_budget(12) # Premier login compris, + recalcul des top games dénormalisés
 @auth0_required # Protégé par Auth0
 # @csrf_exempt # Décommenter si tu ne gères pas le CSRF sur cet endpoint
 def gamer_create_update_view(request):
@@ -37,115 +107,397 @@ def gamer_create_update_view(request):
     Crée ou met à jour le profil Gamer de l'utilisateur authentifié.
     """
     if request.method not in ['POST', 'PUT']:
-        return JsonResponse({'detail': 'Method not allowed.'}, status=405)
+        return ApiResponse({'detail': 'Method not allowed.'}, request, status=405)
 
     try:
         try:
             data = json.loads(request.body)
         except json.JSONDecodeError:
-            return JsonResponse({'detail': 'Invalid JSON.'}, status=400)
+            return ApiResponse({'detail': 'Invalid JSON.'}, request, status=400)
 
-        # Récupère le Gamer lié à l'utilisateur authentifié
-        # Utilise get_object_or_404 pour vérifier si le Gamer existe déjà pour cet utilisateur
-        # Si tu veux permettre la création, tu dois gérer le Gamer.DoesNotExist ici
-        try:
-            gamer = Gamer.objects.get(user=request.user)
-            is_new = False
-        except Gamer.DoesNotExist:
-             # Si le Gamer n'existe pas, crée-le
-             gamer = Gamer(user=request.user)
-             is_new = True
-             # Tu peux initialiser des champs par défaut ici si c'est une création
-             gamer.pseudo = data.get('pseudo', request.user.username) # Pseudo par défaut
-             gamer.level = data.get('level', 1) # Niveau par défaut
-             gamer.points = data.get('points', 0) # Points par défaut
-
-
-        # Met à jour les champs du Gamer avec les données reçues
-        # Utilise .get() avec une valeur par défaut pour éviter les KeyErrors si un champ est manquant
-        # Ne met à jour que si la clé est présente dans les données reçues
-        if 'pseudo' in data:
-             gamer.pseudo = data['pseudo']
-        if 'level' in data:
-             gamer.level = data['level']
-        if 'points' in data:
-             gamer.points = data['points']
-        # Gère l'avatar si envoyé (peut nécessiter un traitement différent pour les fichiers)
-        # Si l'avatar est envoyé comme URL, tu peux le stocker directement
-        # if 'avatar' in data:
-        #     gamer.avatar = data['avatar'] # Attention: gérer le stockage de fichiers est plus complexe
-
-        gamer.save() # Sauvegarde le Gamer (pour avoir un ID si c'est une création)
-
-        # --- Gérer les relations GamerGame (jeux préférés, heures jouées, niveau) ---
         games_data = data.get('games', [])
-
-        # Optionnel: Supprime les relations GamerGame existantes si tu veux les remplacer complètement
-        # gamer.gamergame_set.all().delete() # Décommenter si tu veux remplacer
-
-        for game_data in games_data:
-            game_name = game_data.get('name')
-            skill_level = game_data.get('skill_level')
-            hours_played = game_data.get('hours_played')
-
-            if game_name and skill_level is not None and hours_played is not None:
-                try:
-                    game_obj = Game.objects.get(name=game_name)
-
-                    gamer_game, created = GamerGame.objects.get_or_create(
-                        gamer=gamer,
-                        game=game_obj,
-                        defaults={'skill_level': skill_level, 'hours_played': hours_played}
-                    )
-                    if not created:
-                        gamer_game.skill_level = skill_level
-                        gamer_game.hours_played = hours_played
-                        gamer_game.save()
-
-                except Game.DoesNotExist:
-                    print(f"Jeu '{game_name}' non trouvé dans la base de données Game. Ignoré.")
-                    # Tu peux choisir d'ignorer, de créer le jeu, ou de renvoyer une erreur spécifique
-
-        # --- Gérer le jeu favori (si envoyé séparément) ---
         favorite_game_name = data.get('favoriteGameName')
-        if favorite_game_name is not None: # Vérifie si la clé est présente, même si la valeur est None
-            if favorite_game_name: # Si le nom n'est pas vide
-                try:
-                    favorite_game_obj = Game.objects.get(name=favorite_game_name)
-                    gamer.favoriteGame = favorite_game_obj
-                except Game.DoesNotExist:
-                    gamer.favoriteGame = None # Si le jeu favori n'existe pas, le champ est mis à None
-                    print(f"Jeu favori '{favorite_game_name}' non trouvé dans la base de données Game.")
-            else: # Si favoriteGameName est vide ou None
-                 gamer.favoriteGame = None
-            gamer.save() # Sauvegarde après avoir potentiellement modifié favoriteGame
 
+        # Résout tous les noms de jeux (jeux envoyés + favori) via l'index du catalogue, sans SQL
+        names = {game_data.get('name') for game_data in games_data if game_data.get('name')}
+        if favorite_game_name:
+            names.add(favorite_game_name)
+        game_ids = resolve_game_names(names)
+        unknown_games = sorted(names - game_ids.keys())
+        if unknown_games:
+            print(f"Jeux non trouvés dans la base de données Game, ignorés: {unknown_games}")
+
+        # Tout le payload est appliqué dans une seule transaction, en un nombre constant de requêtes
+        # (journal du flux: un seul INSERT, en fin de transaction)
+        with transaction.atomic(), change_log():
+            # Récupère le Gamer lié à l'utilisateur authentifié
+            # Si tu veux permettre la création, tu dois gérer le Gamer.DoesNotExist ici
+            try:
+                gamer = Gamer.objects.get(pk=request.gamer_id)
+                is_new = False
+            except Gamer.DoesNotExist:
+                 # Si le Gamer n'existe pas, crée-le
+                 try:
+                     gamer = Gamer(user=request.user)
+                 except User.DoesNotExist:
+                     # Identité périmée du cache local: compte supprimé par un autre process.
+                     # La requête suivante résoudra (ou recréera) le profil
+                     invalidate_identity(sub=request.auth_payload['sub'])
+                     return ApiResponse({'detail': 'Not found.'}, request, status=404)
+                 is_new = True
+                 # Tu peux initialiser des champs par défaut ici si c'est une création
+                 gamer.pseudo = data.get('pseudo', request.user.username) # Pseudo par défaut
+                 gamer.level = data.get('level', 1) # Niveau par défaut
+                 gamer.points = data.get('points', 0) # Points par défaut
+
+            # Met à jour les champs du Gamer avec les données reçues
+            # Ne met à jour que si la clé est présente dans les données reçues
+            if 'pseudo' in data:
+                 gamer.pseudo = data['pseudo']
+            if 'level' in data:
+                 gamer.level = data['level']
+            if 'points' in data:
+                 gamer.points = data['points']
+            # Gère l'avatar si envoyé (peut nécessiter un traitement différent pour les fichiers)
+            # Si l'avatar est envoyé comme URL, tu peux le stocker directement
+            # if 'avatar' in data:
+            #     gamer.avatar = data['avatar'] # Attention: gérer le stockage de fichiers est plus complexe
+
+            # --- Gérer le jeu favori (si envoyé séparément) ---
+            if favorite_game_name is not None: # Vérifie si la clé est présente, même si la valeur est None
+                # Jeu choisi par le joueur (épinglé); nom vide ou jeu inconnu: le favori
+                # redevient automatiquement le jeu le plus joué (cf. gameur.top_games)
+                favorite_game_id = game_ids.get(favorite_game_name) if favorite_game_name else None
+                gamer.favorite_game_id = favorite_game_id
+                gamer.favorite_game_pinned = favorite_game_id is not None
+
+            if is_new:
+                gamer.save() # Sauvegarde le Gamer (pour avoir un ID si c'est une création)
+                update_fields = []
+            else:
+                # N'écrit que les champs envoyés: les points appliqués entre-temps par
+                # flush_point_increments ne sont pas écrasés par la valeur lue plus haut
+                update_fields = [field for field in ('pseudo', 'level', 'points') if field in data]
+                if favorite_game_name is not None:
+                    update_fields += ['favorite_game', 'favorite_game_pinned']
+
+            # --- Gérer les relations GamerGame (jeux préférés, heures jouées, niveau) ---
+            # Optionnel: Supprime les relations GamerGame existantes si tu veux les remplacer complètement
+            # gamer.gamergame_set.all().delete() # Décommenter si tu veux remplacer
+            gamer_games = upsert_gamer_games(gamer, games_data, game_ids)
+            # Top games et favori dénormalisés, écrits avec les autres champs (un seul UPDATE)
+            if (gamer_games or favorite_game_name is not None) and apply_top_games([gamer]):
+                update_fields += ['top_game_ids', 'favorite_game']
+            if update_fields:
+                gamer.save(update_fields=update_fields)
+            # bulk_create ne déclenche pas post_save: invalide explicitement les ETag
+            # et les classements par jeu concernés
+            bump_leaderboard_version_on_commit()
+            bump_game_leaderboard_versions_on_commit(gamer_game.game_id for gamer_game in gamer_games)
 
         status_code = 201 if is_new else 200
-        return JsonResponse({'id': gamer.id, 'pseudo': gamer.pseudo, 'detail': 'Gamer profile saved successfully.'}, status=status_code)
+        return ApiResponse({
+            'id': gamer.id,
+            'pseudo': gamer.pseudo,
+            'unknown_games': unknown_games,
+            'detail': 'Gamer profile saved successfully.',
+        }, request, status=status_code)
 
     except Exception as e:
         print(f"Erreur dans gamer_create_update_view: {e}")
-        return JsonResponse({'detail': 'Internal server error.'}, status=500)
+        return ApiResponse({'detail': 'Internal server error.'}, request, status=500)
+
+
+def resolve_game_names(names):
+    """
+    Retourne {nom: id} pour les jeux existants parmi `names`, via l'index du catalogue (sans SQL).
+    """
+    if not names:
+        return {}
+    return get_catalog().ids_for_names(names)
+
+
+def upsert_gamer_games(gamer, games_data, game_ids):
+    """
+    Insère ou met à jour les GamerGame du payload en un seul INSERT ... ON CONFLICT.
+    Les entrées incomplètes ou dont le jeu est inconnu sont ignorées.
+    """
+    rows = {}
+    for game_data in games_data:
+        game_id = game_ids.get(game_data.get('name'))
+        skill_level = game_data.get('skill_level')
+        hours_played = game_data.get('hours_played')
+        if game_id and skill_level is not None and hours_played is not None:
+            # Un même jeu présent deux fois: la dernière entrée gagne
+            # (ON CONFLICT ne peut pas toucher deux fois la même ligne)
+            rows[game_id] = GamerGame(
+                gamer=gamer,
+                game_id=game_id,
+                skill_level=skill_level,
+                hours_played=hours_played,
+            )
+    if rows:
+        GamerGame.objects.bulk_create(
+            rows.values(),
+            update_conflicts=True,
+            unique_fields=['gamer', 'game'],
+            update_fields=['skill_level', 'hours_played'],
+        )
+        # bulk_create ne déclenche pas post_save: journalisation explicite
+        record_gamer_changes([gamer.id], GamerChange.GAMES)
+    return list(rows.values())
+
+
+# Vue pour incrémenter les points d'un gamer (write-behind)
+@query_budget(8)
+@auth0_required
+def gamer_points_view(request, gamer_id):
+    """
+    Enregistre un incrément de points ({"delta": n}), appliqué par lot par Celery.
+    La clé d'idempotence (en-tête Idempotency-Key ou champ `idempotency_key`) est obligatoire:
+    un rejeu avec la même clé n'est compté qu'une fois.
+    """
+    if request.method != 'POST':
+        return ApiResponse({'detail': 'Method not allowed.'}, request, status=405)
+    if gamer_id != request.gamer_id:
+        return ApiResponse({'detail': 'You can only update your own points.'}, request, status=403)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return ApiResponse({'detail': 'Invalid JSON.'}, request, status=400)
+
+    delta = data.get('delta') if isinstance(data, dict) else None
+    if not isinstance(delta, int) or isinstance(delta, bool):
+        return ApiResponse({'detail': 'delta must be an integer.'}, request, status=400)
+    idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    if not isinstance(idempotency_key, str) or not 0 < len(idempotency_key) <= 255:
+        return ApiResponse({'detail': 'An idempotency key is required.'}, request, status=400)
+
+    try:
+        increment, created = record_increment(gamer_id, delta, idempotency_key)
+    except IdempotencyConflict:
+        return ApiResponse({'detail': 'Idempotency key already used with a different delta.'}, request, status=409)
+    except Exception as e:
+        print(f"Erreur dans gamer_points_view: {e}")
+        return ApiResponse({'detail': 'Internal server error.'}, request, status=500)
+
+    # 202: l'incrément sera visible dans les points après le prochain flush
+    return ApiResponse({
+        'id': gamer_id,
+        'delta': increment.delta,
+        'idempotency_key': increment.idempotency_key,
+        'duplicate': not created,
+        'applied': increment.applied_at is not None,
+        'detail': 'Increment accepted.',
+    }, request, status=202)
 
 
 # Exemple de vue pour la liste des gamers (classement)
 # Cette vue est appelée par la page de classement.
 # Elle ne nécessite pas forcément d'authentification si le classement est public.
 # Si tu veux qu'elle soit protégée, ajoute @auth0_required au-dessus de la fonction.
-def gamer_list_view(request):
+@read_replica
+@query_budget(6)
+@acondition(etag_func=leaderboard_etag, last_modified_func=leaderboard_modified)
+async def gamer_list_view(request):
     """
-    Récupère et renvoie la liste de tous les profils Gamer pour le classement.
+    Renvoie une page du classement des gamers (points DESC, id).
+    Paramètres: `limit` (borné par LEADERBOARD_MAX_PAGE_SIZE) et `cursor`
+    (curseur opaque renvoyé dans `next` / `previous`).
     """
     try:
-        gamers = Gamer.objects.all().order_by('-points')
-        # Utilise la fonction de sérialisation pour chaque gamer
-        gamers_data = [serialize_gamer(gamer, request) for gamer in gamers]
+        limit = parse_limit(
+            request,
+            default=settings.LEADERBOARD_PAGE_SIZE,
+            maximum=settings.LEADERBOARD_MAX_PAGE_SIZE,
+        )
+        gamers, next_cursor, prev_cursor = await apaginate_keyset(
+            Gamer.objects.all(),
+            ordering=LEADERBOARD_ORDERING,
+            cursor=request.GET.get('cursor'),
+            limit=limit,
+        )
+    except InvalidCursor as e:
+        return ApiResponse({'detail': str(e)}, request, status=400)
 
-        return JsonResponse(gamers_data, safe=False)
+    try:
+        # Sérialisation en lot: nombre de requêtes constant quelle que soit la taille de la page
+        gamers_data = await aserialize_gamers(gamers, request)
+
+        response = ApiResponse({
+            'results': gamers_data,
+            'next': next_cursor,
+            'previous': prev_cursor,
+            'limit': limit,
+        }, request)
+        # Classement public: micro-cache possible côté nginx et navigateur
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=settings.LEADERBOARD_CACHE_MAX_AGE,
+            stale_while_revalidate=settings.LEADERBOARD_CACHE_MAX_AGE,
+        )
+        return response
     except Exception as e:
         print(f"Erreur dans gamer_list_view: {e}")
-        return JsonResponse({'detail': 'Internal server error.'}, status=500)
+        return ApiResponse({'detail': 'Internal server error.'}, request, status=500)
+
+# Export complet du classement (analytics, partenaires)
+# Public comme le classement, mais jamais mis en cache: la réponse est produite en flux.
+@read_replica
+async def gamer_export_view(request):
+    """
+    Exporte tout le classement (points DESC, id) en NDJSON (par défaut) ou CSV (`?format=csv`).
+    La réponse est compressée en gzip à la volée si le client l'accepte.
+    """
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return ApiResponse({'detail': 'format must be one of: ' + ', '.join(EXPORT_FORMATS) + '.'}, request, status=400)
+
+    content = export_gamers(Gamer.objects.order_by(*LEADERBOARD_ORDERING), request, export_format)
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    if use_gzip:
+        content = gzip_stream(content)
+
+    # Générateur async: consommé tel quel sous ASGI, sans tout charger en mémoire
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="leaderboard.{export_format}"'
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+# Flux incrémental du classement (polling): seuls les gamers modifiés depuis le curseur.
+# Toujours lu sur la base principale: un réplica en retard ferait sauter des entrées du journal.
+@query_budget(6)
+async def gamer_changes_view(request):
+    """
+    Renvoie l'état courant des gamers modifiés depuis `since` (curseur de l'appel précédent)
+    et les id des gamers supprimés. Sans `since`: seulement le curseur courant, à demander
+    avant de charger le classement complet. 410 si le curseur est trop ancien (resync).
+    """
+    since = request.GET.get('since')
+    try:
+        if not since:
+            gamer_ids, cursor, has_more = [], await sync_to_async(head_cursor)(), False
+        else:
+            gamer_ids, cursor, has_more = await sync_to_async(read_changes)(since)
+    except InvalidCursor as e:
+        return ApiResponse({'detail': str(e)}, request, status=400)
+    except ResyncRequired:
+        return ApiResponse({'detail': 'Cursor too old, resync required.', 'resync_required': True}, request, status=410)
+
+    results = []
+    if gamer_ids:
+        results = await aserialize_gamers(Gamer.objects.filter(id__in=gamer_ids).order_by(*LEADERBOARD_ORDERING), request)
+    found = {gamer_data['id'] for gamer_data in results}
+    response = ApiResponse({
+        'results': results,
+        'removed': sorted(set(gamer_ids) - found),
+        'cursor': cursor,
+        'has_more': has_more,
+    }, request)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+# Recherche / autocomplétion de pseudos (publique)
+@read_replica
+@query_budget(1)
+async def gamer_search_view(request):
+    """
+    Recherche des gamers par pseudo (`?q=`, `limit` optionnel): préfixes puis
+    correspondances approchées. Les préfixes courts sont servis depuis le cache.
+    """
+    q = normalize_query(request.GET.get('q'))
+    if not q:
+        return ApiResponse({'detail': 'q is required.'}, request, status=400)
+    try:
+        limit = parse_limit(request, default=settings.SEARCH_RESULTS_LIMIT, maximum=settings.SEARCH_RESULTS_MAX_LIMIT)
+    except InvalidCursor as e:
+        return ApiResponse({'detail': str(e)}, request, status=400)
+
+    cache_key = None
+    results = None
+    if len(q) <= settings.SEARCH_CACHE_PREFIX_LENGTH:
+        # L'hôte fait partie de la clé car les URLs d'avatar sont absolues
+        digest = hashlib.sha1(f'{q}:{limit}:{request.get_host()}'.encode()).hexdigest()
+        cache_key = f'gameur:search:{digest}'
+        results = await cache.aget(cache_key)
+
+    if results is None:
+        gamers = await sync_to_async(search_gamers)(q, limit)
+        results = [serialize_search_result(gamer, request) for gamer in gamers]
+        if cache_key:
+            await cache.aset(cache_key, results, settings.SEARCH_CACHE_TTL)
+
+    response = ApiResponse({'q': q, 'results': results}, request)
+    patch_cache_control(response, public=True, max_age=settings.SEARCH_CACHE_TTL)
+    return response
+
+
+# Vue pour le classement d'un jeu (public, comme le classement global)
+@read_replica
+@query_budget(3)
+async def game_leaderboard_view(request, game_id):
+    """
+    Renvoie une page du classement des joueurs d'un jeu (skill_level DESC, hours_played DESC, id).
+    Mêmes paramètres `limit` / `cursor` que /api/gamers/. La première page de taille
+    par défaut (top-N) est servie depuis le cache jusqu'au prochain changement d'un GamerGame du jeu.
+    """
+    try:
+        limit = parse_limit(
+            request,
+            default=settings.LEADERBOARD_PAGE_SIZE,
+            maximum=settings.LEADERBOARD_MAX_PAGE_SIZE,
+        )
+    except InvalidCursor as e:
+        return ApiResponse({'detail': str(e)}, request, status=400)
+    cursor = request.GET.get('cursor')
+
+    data = None
+    cache_key = None
+    if cursor is None and limit == settings.LEADERBOARD_PAGE_SIZE:
+        # L'hôte fait partie de la clé car les URLs d'avatar sont absolues
+        version = await aget_game_leaderboard_version(game_id)
+        cache_key = f'gameur:game-leaderboard:{game_id}:{version}:{request.get_host()}'
+        data = await cache.aget(cache_key)
+
+    if data is None:
+        try:
+            # select_related: la page (GamerGame + Gamer) est chargée en une seule requête
+            entries, next_cursor, prev_cursor = await apaginate_keyset(
+                GamerGame.objects.filter(game_id=game_id).select_related('gamer'),
+                ordering=GAME_LEADERBOARD_ORDERING,
+                cursor=cursor,
+                limit=limit,
+            )
+        except InvalidCursor as e:
+            return ApiResponse({'detail': str(e)}, request, status=400)
+        if not entries and game_id not in (await aget_catalog()).by_id:
+            return ApiResponse({'detail': 'Not found.'}, request, status=404)
+
+        data = {
+            'game': game_id,
+            'results': [serialize_game_entry(entry, request) for entry in entries],
+            'next': next_cursor,
+            'previous': prev_cursor,
+            'limit': limit,
+        }
+        if cache_key:
+            await cache.aset(cache_key, data, settings.GAME_LEADERBOARD_CACHE_TTL)
+
+    response = ApiResponse(data, request)
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=settings.LEADERBOARD_CACHE_MAX_AGE,
+        stale_while_revalidate=settings.LEADERBOARD_CACHE_MAX_AGE,
+    )
+    return response
 
 # Optionnel: Exemple de vue pour un profil gamer spécifique par ID
 # def gamer_detail_view(request, pk):
@@ -153,4 +505,17 @@ def gamer_list_view(request):
 
 # Optionnel: Exemple de vue pour un profil gamer spécifique par pseudo
 # def gamer_detail_view_by_pseudo(request, pseudo):
-#     pass # À implémenter
\ No newline at end of file
+#     pass # À implémenter
+
+
+# Catalogue des jeux: servi depuis l'index en mémoire du process (gameur.catalog)
+@query_budget(1) # Rechargement de l'index après une modification de Game
+@acondition(etag_func=games_etag) # 304 sans toucher à l'index ni à la base
+async def game_list_view(request):
+    """
+    Renvoie tous les jeux, triés par nom.
+    """
+    catalog = await aget_catalog()
+    response = ApiResponse({'results': catalog.serialized(request, serialize_game)}, request)
+    patch_cache_control(response, public=True, max_age=settings.GAME_CATALOG_CACHE_MAX_AGE)
+    return response
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server_config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importé après l'initialisation de Django (modèles chargés)
+from gameur.push import LeaderboardStreamApp  # noqa: E402
+
+# Push du classement (SSE, /api/gamers/stream/) servi hors de la pile Django, le reste par Django
+application = LeaderboardStreamApp(django_application)
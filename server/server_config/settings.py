@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 # import environ
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -24,6 +25,9 @@ CELERY_RESULT_BACKEND = "django-db"
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
+# Événements des tâches, lus par celery-exporter (métriques Prometheus du worker)
+CELERY_WORKER_SEND_TASK_EVENTS = True
+CELERY_TASK_SEND_SENT_EVENT = True
 
 # Exemple avec os.getenv
 AUTH0_DOMAIN = os.getenv('AUTH0_DOMAIN') # <-- Assure-toi que le nom de la variable correspond
@@ -65,6 +69,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # Lookups pg_trgm (recherche de pseudos), sans effet sur les autres bases
+    'django.contrib.postgres',
     'django_prometheus',
     'django_celery_results',
     'django_celery_beat',
@@ -73,7 +79,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Doit rester en premier (et PrometheusAfterMiddleware en dernier) pour mesurer toute la requête
+    'django_prometheus.middleware.PrometheusBeforeMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    # Délestage au-delà de ADMISSION_MAX_IN_FLIGHT requêtes en cours (après CORS: le 503 reste lisible par le SPA)
+    'gameur.middleware.AdmissionControlMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +91,11 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Lectures des vues @read_replica sur les réplicas, base principale après une écriture
+    'gameur.db_router.ReplicaRoutingMiddleware',
+    # Nombre de requêtes SQL par vue (gameur_view_sql_queries, Server-Timing, budget @query_budget)
+    'gameur.middleware.QueryCountMiddleware',
+    'django_prometheus.middleware.PrometheusAfterMiddleware',
 ]
 
 ROOT_URLCONF = 'server_config.urls'
@@ -107,7 +122,8 @@ WSGI_APPLICATION = 'server_config.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # Backend instrumenté: nombre, durée et erreurs des requêtes exposés sur /metrics
+        'ENGINE': 'django_prometheus.db.backends.postgresql',
         'NAME': os.getenv('POSTGRES_DB'),
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
@@ -147,6 +163,9 @@ CORS_ALLOW_CREDENTIALS = True
 AUTH0_DOMAIN = os.getenv('VITE_AUTH0_DOMAIN') # Ton domaine Auth0
 AUTH0_API_AUDIENCE = os.getenv('VITE_AUTH0_AUDIENCE') # L'audience de ton API
 AUTH0_JWKS_URL = f'https://{AUTH0_DOMAIN}/.well-known/jwks.json' # URL JWKSw
+# JWKS local (ex: benchmarks/auth_stub.py pour les tests de charge)
+if os.getenv('AUTH0_JWKS_URL'):
+    AUTH0_JWKS_URL = os.getenv('AUTH0_JWKS_URL')
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -175,4 +194,138 @@ STATICFILES_DIRS = [
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Pagination du classement (/api/gamers/)
+LEADERBOARD_PAGE_SIZE = int(os.getenv('LEADERBOARD_PAGE_SIZE', 50))
+LEADERBOARD_MAX_PAGE_SIZE = int(os.getenv('LEADERBOARD_MAX_PAGE_SIZE', 100))
+
+# Cache des tokens Auth0 déjà vérifiés (évite une vérification RS256 par requête)
+AUTH0_TOKEN_CACHE_ENABLED = os.getenv('AUTH0_TOKEN_CACHE_ENABLED', 'True') == 'True'
+AUTH0_TOKEN_CACHE_SIZE = int(os.getenv('AUTH0_TOKEN_CACHE_SIZE', 1024))
+
+# Clés JWKS: rafraîchies en arrière-plan après AUTH0_JWKS_TTL secondes,
+# au plus un refetch forcé (kid inconnu) par AUTH0_JWKS_MIN_REFRESH_INTERVAL secondes
+AUTH0_JWKS_TTL = int(os.getenv('AUTH0_JWKS_TTL', 600))
+AUTH0_JWKS_MIN_REFRESH_INTERVAL = int(os.getenv('AUTH0_JWKS_MIN_REFRESH_INTERVAL', 30))
+
+# Cache Django partagé entre workers (LocMem par défaut: à remplacer en production,
+# ex: DJANGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'gameur-default'),
+    }
+}
+
+# Mapping identité Auth0 (sub) -> (user_id, gamer_id)
+IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', 3600))
+IDENTITY_LOCAL_CACHE_TTL = int(os.getenv('IDENTITY_LOCAL_CACHE_TTL', 60))
+IDENTITY_LOCAL_CACHE_SIZE = int(os.getenv('IDENTITY_LOCAL_CACHE_SIZE', 4096))
+
+# Durée (secondes) pendant laquelle le classement public peut être servi depuis un cache (nginx, navigateur)
+LEADERBOARD_CACHE_MAX_AGE = int(os.getenv('LEADERBOARD_CACHE_MAX_AGE', 5))
+
+# Snapshot des rangs: planifié par celery beat (django_celery_beat, planning modifiable dans l'admin)
+RANK_SNAPSHOT_INTERVAL = int(os.getenv('RANK_SNAPSHOT_INTERVAL', 300))
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'refresh-rank-snapshot': {
+        'task': 'gameur.tasks.refresh_rank_snapshot',
+        'schedule': RANK_SNAPSHOT_INTERVAL,
+    },
+}
+
+# Incréments de points (POST /api/gamers/<id>/points/): appliqués par lot toutes les
+# POINTS_FLUSH_INTERVAL secondes; clés d'idempotence conservées POINTS_IDEMPOTENCY_TTL secondes
+POINTS_FLUSH_INTERVAL = int(os.getenv('POINTS_FLUSH_INTERVAL', 2))
+POINTS_FLUSH_BATCH_SIZE = int(os.getenv('POINTS_FLUSH_BATCH_SIZE', 1000))
+POINTS_IDEMPOTENCY_TTL = int(os.getenv('POINTS_IDEMPOTENCY_TTL', 86400))
+CELERY_BEAT_SCHEDULE['flush-point-increments'] = {
+    'task': 'gameur.tasks.flush_point_increments_task',
+    'schedule': POINTS_FLUSH_INTERVAL,
+}
+
+# Première page du classement de chaque jeu: gardée en cache (invalidée à chaque changement de GamerGame)
+GAME_LEADERBOARD_CACHE_TTL = int(os.getenv('GAME_LEADERBOARD_CACHE_TTL', 300))
+
+# Export en flux (/api/gamers/export/): nombre de gamers lus et sérialisés par lot
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# Tailles (px, carrés) des variantes WebP/JPEG générées pour les avatars et icônes de jeux
+IMAGE_VARIANT_SIZES = [int(size) for size in os.getenv('IMAGE_VARIANT_SIZES', '64,128,256').split(',')]
+
+# Budget de requêtes SQL par vue (@query_budget): exception pendant les tests, simple avertissement sinon.
+# SQL_QUERY_BUDGET_DEFAULT s'applique aux vues sans décorateur (vide: pas de budget)
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+SQL_QUERY_BUDGET_STRICT = os.getenv('SQL_QUERY_BUDGET_STRICT', str(TESTING)) == 'True'
+SQL_QUERY_BUDGET_DEFAULT = int(os.getenv('SQL_QUERY_BUDGET_DEFAULT')) if os.getenv('SQL_QUERY_BUDGET_DEFAULT') else None
+
+# Recherche de pseudos (/api/gamers/search/): nombre de résultats, et cache des préfixes
+# courts (les plus fréquents pendant la saisie dans l'autocomplétion)
+SEARCH_RESULTS_LIMIT = int(os.getenv('SEARCH_RESULTS_LIMIT', 10))
+SEARCH_RESULTS_MAX_LIMIT = int(os.getenv('SEARCH_RESULTS_MAX_LIMIT', 25))
+SEARCH_CACHE_PREFIX_LENGTH = int(os.getenv('SEARCH_CACHE_PREFIX_LENGTH', 3))
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 30))
+
+# Réplicas en lecture (POSTGRES_REPLICA_HOSTS, hôtes séparés par des virgules, mêmes
+# identifiants que la base principale), utilisés par les vues @read_replica (gameur.db_router).
+# Après une écriture, un client lit sur la base principale pendant REPLICA_STICKY_SECONDS ;
+# un réplica en retard de plus de REPLICA_MAX_LAG_SECONDS est écarté.
+DATABASE_REPLICAS = []
+for _index, _host in enumerate(host.strip() for host in os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',') if host.strip()):
+    DATABASES[f'replica_{_index}'] = {**DATABASES['default'], 'HOST': _host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{_index}')
+if TESTING:
+    # Alias miroir de la base principale: tests du routage sans réplica réel
+    DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['gameur.db_router.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+REPLICA_MAX_LAG_SECONDS = int(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_LAG_CHECK_INTERVAL = int(os.getenv('REPLICA_LAG_CHECK_INTERVAL', 5))
+
+# Flux incrémental /api/gamers/changes/ (journal GamerChange): entrées lues après
+# CHANGE_FEED_SETTLE_SECONDS (une entrée validée plus de la moitié de ce délai après son
+# insertion est réécrite, cf. gameur.changes), conservées CHANGE_LOG_RETENTION secondes (au-delà le
+# client doit tout recharger), compactées toutes les CHANGE_LOG_COMPACT_INTERVAL secondes
+CHANGE_FEED_SETTLE_SECONDS = int(os.getenv('CHANGE_FEED_SETTLE_SECONDS', 1))
+CHANGE_FEED_PAGE_SIZE = int(os.getenv('CHANGE_FEED_PAGE_SIZE', 500))
+CHANGE_LOG_RETENTION = int(os.getenv('CHANGE_LOG_RETENTION', 86400))
+CHANGE_LOG_COMPACT_INTERVAL = int(os.getenv('CHANGE_LOG_COMPACT_INTERVAL', 600))
+CELERY_BEAT_SCHEDULE['compact-change-log'] = {
+    'task': 'gameur.tasks.compact_change_log_task',
+    'schedule': CHANGE_LOG_COMPACT_INTERVAL,
+}
+
+# Push temps réel du classement (SSE sur /api/gamers/stream/, cf. gameur.push): changements
+# diffusés par lot toutes les PUSH_TICK_SECONDS; un client avec plus de PUSH_CLIENT_BUFFER
+# messages en attente reçoit `resync`. PUSH_BROKER relie les process web et celery
+PUSH_BROKER = os.getenv('PUSH_BROKER', 'gameur.push.InMemoryBroker' if TESTING else 'gameur.push.KombuBroker')
+PUSH_BROKER_URL = os.getenv('PUSH_BROKER_URL', CELERY_BROKER_URL)
+PUSH_TICK_SECONDS = float(os.getenv('PUSH_TICK_SECONDS', 1))
+PUSH_HEARTBEAT_SECONDS = int(os.getenv('PUSH_HEARTBEAT_SECONDS', 15))
+PUSH_CLIENT_BUFFER = int(os.getenv('PUSH_CLIENT_BUFFER', 16))
+PUSH_MAX_CONNECTIONS = int(os.getenv('PUSH_MAX_CONNECTIONS', 10000))
+
+# Limitation de débit des vues authentifiées (gameur.ratelimit): seaux de jetons '<nombre>/<s|m|h|d>'
+# par IP (avant la validation du token) et par sub Auth0, partagés via le cache RATELIMIT_CACHE
+# (un cache partagé entre workers, ex: Redis, est nécessaire pour des limites globales).
+# RATELIMIT_CLIENT_IP_HEADER: en-tête de l'IP client posé par un proxy (ex: HTTP_X_REAL_IP derrière
+# nginx), lu seulement si REMOTE_ADDR est dans RATELIMIT_TRUSTED_PROXIES (IP ou réseaux, séparés par
+# des virgules). Sans les deux, REMOTE_ADDR: web est publié directement, l'en-tête serait falsifiable.
+RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'True') == 'True'
+RATELIMIT_CACHE = os.getenv('RATELIMIT_CACHE', 'default')
+RATELIMIT_SUB_RATE = os.getenv('RATELIMIT_SUB_RATE', '120/m')
+RATELIMIT_IP_RATE = os.getenv('RATELIMIT_IP_RATE', '600/m')
+RATELIMIT_CLIENT_IP_HEADER = os.getenv('RATELIMIT_CLIENT_IP_HEADER', '')
+RATELIMIT_TRUSTED_PROXIES = [proxy.strip() for proxy in os.getenv('RATELIMIT_TRUSTED_PROXIES', '').split(',') if proxy.strip()]
+
+# Délestage (gameur.middleware.AdmissionControlMiddleware): au-delà de ADMISSION_MAX_IN_FLIGHT
+# requêtes en cours par process, réponse 503 immédiate (0: désactivé)
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', 200))
+ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 1))
+ADMISSION_EXEMPT_PATHS = ['/metrics', '/admin/']
+
+# Catalogue des jeux (/api/games/, servi depuis l'index en mémoire gameur.catalog):
+# durée pendant laquelle navigateur et nginx peuvent le réutiliser sans revalidation
+GAME_CATALOG_CACHE_MAX_AGE = int(os.getenv('GAME_CATALOG_CACHE_MAX_AGE', 60))
@@ -7,6 +7,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     # Inclut les URLs de l'application 'gameur' sous le préfixe /api/
     path('api/', include('gameur.urls')),
+    # Métriques Prometheus (/metrics), scrapées directement sur web:8000 (non exposé par nginx)
+    path('', include('django_prometheus.urls')),
     # Si tu as d'autres applications avec des APIs, inclus-les aussi sous /api/
     # path('api/', include('autre_app.urls')),
     # Si tu as des vues non-API à la racine, définis-les ici